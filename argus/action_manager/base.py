@@ -181,3 +181,17 @@ class BaseActionManager(object):
             Cloudbase-Init Unattend config file.
         """
         pass
+
+    @abc.abstractmethod
+    def get_checkpoints(self):
+        """Get the names of the recipe steps marked as finished."""
+        pass
+
+    @abc.abstractmethod
+    def add_checkpoint(self, name):
+        """Mark the recipe step with the given name as finished.
+
+        :param name:
+            The name of the finished step.
+        """
+        pass
@@ -55,6 +55,7 @@ class WindowsActionManager(base.BaseActionManager):
     WINDOWS_MANAGEMENT_CMDLET = "Get-WmiObject"
     _INSTALL_SCRIPT = r"C:\installCBinit.ps1"
     _ARGUS_AGENT_SCRIPT = r"C:\argusagent.py"
+    _CHECKPOINTS_FILE = r"C:\argus_checkpoints.txt"
 
     def __init__(self, client, os_type=util.WINDOWS):
         super(WindowsActionManager, self).__init__(client, os_type)
@@ -89,6 +90,73 @@ class WindowsActionManager(base.BaseActionManager):
             LOG.debug("Could not archive %s: %s", file_path, exc)
             return file_path
 
+    def pack_files(self, members, archive_path):
+        """Pack the given files in an archive and return it.
+
+        The archive is created and sent back through a single command.
+
+        :param members:
+            A list of (remote file path, name in the archive) pairs.
+            The missing files are skipped.
+        :param archive_path:
+            The remote path where the archive will be created.
+        :returns: The archive, as a base64 encoded string.
+        """
+        LOG.info("Packing %d files in %s.", len(members), archive_path)
+        python_dir = introspection.get_python_dir(self._execute)
+        arguments = " ".join('"{}" "{}"'.format(path, name)
+                             for path, name in members)
+        cmd = (r'& "{pydir}\python.exe" {agent_path} --pack "{archive}" '
+               '{arguments}'.format(pydir=python_dir,
+                                    agent_path=self._ARGUS_AGENT_SCRIPT,
+                                    archive=archive_path,
+                                    arguments=arguments))
+        stdout, _, _ = self._client.run_remote_cmd(
+            cmd, command_type=util.POWERSHELL,
+            upper_timeout=CONFIG.argus.io_upper_timeout)
+        return stdout
+
+    def get_file_sha256(self, file_path):
+        """Get the SHA-256 hexadecimal digest of a remote file."""
+        cmd = ("$stream = [System.IO.File]::OpenRead('{path}');"
+               "try {{$hash = [System.Security.Cryptography.SHA256]::"
+               "Create().ComputeHash($stream)}} "
+               "finally {{$stream.Close()}};"
+               "[System.BitConverter]::ToString($hash).Replace('-', '')"
+               .format(path=file_path))
+        stdout, _, _ = self._client.run_command_with_retry(
+            cmd, command_type=util.POWERSHELL)
+        return stdout.strip().lower()
+
+    def get_files_sha256(self, file_paths):
+        """Get the SHA-256 hexadecimal digests of many remote files.
+
+        The digests are computed with a single command.
+
+        :returns:
+            A dictionary between the given paths and their digests.
+            The paths of the missing files have the digest ``None``.
+        """
+        paths = ", ".join("'{}'".format(path) for path in file_paths)
+        cmd = ("foreach ($path in @({paths})) {{"
+               "if (Test-Path -PathType Leaf -LiteralPath $path) {{"
+               "$stream = [System.IO.File]::OpenRead($path);"
+               "try {{$hash = [System.Security.Cryptography.SHA256]::"
+               "Create().ComputeHash($stream)}} "
+               "finally {{$stream.Close()}};"
+               "[System.BitConverter]::ToString($hash).Replace('-', '')"
+               "}} else {{'-'}}}}".format(paths=paths))
+        stdout, _, _ = self._client.run_command_with_retry(
+            cmd, command_type=util.POWERSHELL)
+        digests = [line.strip().lower() for line in stdout.splitlines()
+                   if line.strip()]
+        if len(digests) != len(file_paths):
+            raise exceptions.ArgusError(
+                "Expected {} digests, got {!r}.".format(len(file_paths),
+                                                        stdout))
+        return {path: None if digest == "-" else digest
+                for path, digest in zip(file_paths, digests)}
+
     def encode_file_to_base64_str(self, file_path):
         """Returns a base64 encoded string resulted from the given file."""
         LOG.debug("Encoding %s to base64.", file_path)
@@ -475,6 +543,27 @@ class WindowsActionManager(base.BaseActionManager):
         else:
             self.mkfile(path)
 
+    def get_checkpoints(self):
+        """Get the names of the recipe steps marked as finished."""
+        cmd = ("If (Test-Path -PathType Leaf -Path '{path}') "
+               "{{Get-Content -Path '{path}'}}".format(
+                   path=self._CHECKPOINTS_FILE))
+        stdout, _, _ = self._client.run_command_with_retry(
+            cmd=cmd, command_type=util.POWERSHELL)
+        return [line.strip() for line in stdout.splitlines()
+                if line.strip()]
+
+    def add_checkpoint(self, name):
+        """Mark the recipe step with the given name as finished.
+
+        :param name:
+            The name of the finished step.
+        """
+        LOG.debug("Add the checkpoint %s", name)
+        cmd = "Add-Content -Path '{}' -Value '{}'".format(
+            self._CHECKPOINTS_FILE, name)
+        self._client.run_command_with_retry(cmd, command_type=util.POWERSHELL)
+
     # pylint: disable=unused-argument
     def prepare_config(self, cbinit_conf, cbinit_unattend_conf):
         """Prepare Cloudbase-Init config for every OS.
@@ -15,6 +15,7 @@
 
 import abc
 import os
+import shutil
 
 import six
 
@@ -26,6 +27,12 @@ CONFIG = argus_config.CONFIG
 LOG = argus_log.LOG
 
 
+def _encode(content):
+    if isinstance(content, six.text_type):
+        return content.encode("utf-8")
+    return content
+
+
 @six.add_metaclass(abc.ABCMeta)
 class BaseBackend(object):
     """Class for managing instances
@@ -73,6 +80,17 @@ class BaseBackend(object):
     def remote_client(self):
         """An abstract property which should return the default client."""
 
+    # Tells if the instance was booted from a golden image,
+    # which already has Cloudbase-Init installed.
+    from_golden_image = False
+
+    def create_golden_image(self):
+        """Snapshot the instance into a golden image.
+
+        The back-ends which can't snapshot their instances
+        don't do anything.
+        """
+
 
 class CloudBackend(BaseBackend):
     """Base back-end for cloud related tasks."""
@@ -94,27 +112,55 @@ class CloudBackend(BaseBackend):
         template = "{}{}.log".format("{}", "-" + suffix if suffix else "")
         return template
 
+    def _get_serial_log_path(self, suffix=None):
+        template = self._get_log_template(suffix)
+        return os.path.join(CONFIG.argus.output_directory,
+                            argus_log.get_log_extra_item(LOG, 'scenario') +
+                            "-serial-logging-" + template.format(
+                                self.internal_instance_id()))
+
+    def follow_instance_output(self):
+        """Get the lines of the output written since the previous call.
+
+        The back-ends which can't follow the output return None.
+        """
+
     def save_instance_output(self, suffix=None):
         """Retrieve and save all data written through the COM port.
 
         If a `suffix` is provided, then the log name is preceded by it.
+        The back-ends which can follow the output append only the new
+        lines to the serial log of the instance and the log with the
+        given `suffix` is a copy of it.
         """
         if not CONFIG.argus.output_directory:
             return
 
-        template = self._get_log_template(suffix)
-        path = os.path.join(CONFIG.argus.output_directory,
-                            argus_log.get_log_extra_item(LOG, 'scenario') +
-                            "-serial-logging-" + template.format(
-                                self.internal_instance_id()))
-        content = self.instance_output()
-        if not content.strip():
+        path = self._get_serial_log_path(suffix)
+        lines = self.follow_instance_output()
+        if lines is None:
+            content = self.instance_output()
+            if not content.strip():
+                LOG.warning("Empty console output; nothing to save.")
+                return
+
+            LOG.info("Saving instance console output to: %s", path)
+            with open(path, "wb") as stream:
+                stream.write(_encode(content))
+            return
+
+        serial_log_path = self._get_serial_log_path()
+        with open(serial_log_path, "ab") as stream:
+            for line in lines:
+                stream.write(_encode(line))
+        if not os.path.getsize(serial_log_path):
             LOG.warning("Empty console output; nothing to save.")
+            os.remove(serial_log_path)
             return
 
         LOG.info("Saving instance console output to: %s", path)
-        with open(path, "wb") as stream:
-            stream.write(content)
+        if path != serial_log_path:
+            shutil.copyfile(serial_log_path, path)
 
     @abc.abstractmethod
     def instance_output(self, limit=None):
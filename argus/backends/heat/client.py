@@ -13,6 +13,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+"""Create the Heat clients used by the Heat back-ends.
+
+The Keystone session, the discovered Identity API versions, the
+authentication plugins and the Heat endpoints are shared by all the
+clients of a process, so that only the first client created for some
+credentials talks to Keystone. Since the session keeps its HTTP
+connections open, the clients reuse them as well.
+"""
+
+import hashlib
+import threading
+
 from heatclient import client
 from heatclient.common import utils
 from heatclient import exc
@@ -23,6 +35,22 @@ from keystoneclient import exceptions as ks_exc
 from keystoneclient import session as kssession
 from six.moves import urllib_parse as urlparse
 
+SERVICE_TYPE = 'orchestration'
+
+_SESSION = None
+_AUTH_VERSIONS = {}
+_AUTHS = {}
+_LOCK = threading.Lock()
+
+
+def _get_session():
+    """Get the Keystone session shared by the Heat clients."""
+    global _SESSION    # pylint: disable=global-statement
+    with _LOCK:
+        if _SESSION is None:
+            _SESSION = kssession.Session(verify=True)
+        return _SESSION
+
 
 def _discover_auth_versions(session, auth_url):
     # discover the API versions the server is supporting base on the
@@ -78,11 +106,18 @@ def _get_keystone_v2_auth(v2_auth_url, **kwargs):
                                 tenant_name=tenant_name)
 
 
+def _get_auth_versions(session, auth_url):
+    """Discover the Identity API versions once for every URL."""
+    versions = _AUTH_VERSIONS.get(auth_url)
+    if versions is None:
+        versions = _AUTH_VERSIONS[auth_url] = _discover_auth_versions(
+            session=session, auth_url=auth_url)
+    return versions
+
+
 def _get_keystone_auth(session, auth_url, **kwargs):
     # discover the supported keystone versions using the given URL
-    (v2_auth_url, v3_auth_url) = _discover_auth_versions(
-        session=session,
-        auth_url=auth_url)
+    (v2_auth_url, v3_auth_url) = _get_auth_versions(session, auth_url)
 
     # Determine which authentication plugin to use. First inspect the
     # auth_url to see the supported version. If both v3 and v2 are
@@ -113,11 +148,29 @@ def _get_keystone_auth(session, auth_url, **kwargs):
                            'auth_url.')
 
 
+def _get_auth(session, auth_url, **kwargs):
+    """Get the authentication plugin and the Heat endpoint.
+
+    They are created once for every Identity URL and credentials.
+    """
+    key = (auth_url, ) + tuple(
+        (name, value) for name, value in sorted(kwargs.items())
+        if name != 'password')
+    key += (hashlib.sha256(
+        (kwargs.get('password') or '').encode('utf-8')).hexdigest(), )
+    auth = _AUTHS.get(key)
+    if auth is None:
+        keystone_auth = _get_keystone_auth(session, auth_url, **kwargs)
+        endpoint = keystone_auth.get_endpoint(session,
+                                              service_type=SERVICE_TYPE,
+                                              region_name=None)
+        auth = _AUTHS[key] = (keystone_auth, endpoint)
+    return auth
+
+
 def heat_client(credentials, api_version=1):
     """Get a new Heat client using the given credentials."""
-    endpoint = ''
-    service_type = 'orchestration'
-    keystone_session = kssession.Session(verify=True)
+    keystone_session = _get_session()
     os_auth_url = utils.env('OS_AUTH_URL')
     kwargs = {
         'username': credentials.username,
@@ -126,18 +179,15 @@ def heat_client(credentials, api_version=1):
         'project_id': credentials.tenant_id,
         'project_name': credentials.tenant_name,
     }
-    keystone_auth = _get_keystone_auth(keystone_session,
-                                       os_auth_url, **kwargs)
-    endpoint = keystone_auth.get_endpoint(keystone_session,
-                                          service_type=service_type,
-                                          region_name=None)
+    keystone_auth, endpoint = _get_auth(keystone_session,
+                                        os_auth_url, **kwargs)
 
     endpoint_type = 'publicURL'
     kwargs = {
         'auth_url': os_auth_url,
         'session': keystone_session,
         'auth': keystone_auth,
-        'service_type': service_type,
+        'service_type': SERVICE_TYPE,
         'endpoint_type': endpoint_type,
         'username': credentials.username,
         'password': credentials.password,
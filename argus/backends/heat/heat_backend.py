@@ -14,6 +14,10 @@
 #    under the License.
 
 import abc
+import atexit
+import collections
+import copy
+import threading
 import time
 
 from heatclient import exc
@@ -22,23 +26,129 @@ import six
 from argus.backends import base
 from argus.backends.heat import client
 from argus.backends.tempest import manager as api_manager
+from argus.backends.tempest import resource_pool
+from argus.backends.tempest import tempest_backend
+from argus.backends import waiters
 from argus.backends import windows
 from argus import config as argus_config
 from argus import exceptions
+from argus import log as argus_log
 from argus import util
 
 CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
 
 OS_NOVA_RESOURCE = 'OS::Nova::Server'
 OS_NEUTRON_FLOATING_IP = "OS::Neutron::FloatingIP"
 RESOURCE_COMPLETED_STATUS = "CREATE_COMPLETE"
-RESOURCE_DELETED_STATUS = "DELETE_CREATE"
+STACK_DELETED_STATUS = "DELETE_COMPLETE"
+STACK_DELETE_FAILED_STATUS = "DELETE_FAILED"
+# The resources awaited before the instance is used.
+AWAITED_RESOURCES = (OS_NOVA_RESOURCE, OS_NEUTRON_FLOATING_IP)
 HEAT_RESOURCE_LIMIT = 10
 HEAT_RESOURCE_TIMEOUT = 0.5
 
 RETRY_COUNT = 50
 RETRY_DELAY = 10
 
+BATCH_NAME = "argus-batch"
+BATCH_SERVER = "server"
+
+_BATCHES = {}
+_BATCHES_LOCK = threading.Lock()
+
+
+def _stack_deleted(heat_client, stack_name):
+    try:
+        stack = heat_client.stacks.get(stack_name)
+    except exc.HTTPNotFound:
+        return True
+    if stack.stack_status == STACK_DELETE_FAILED_STATUS:
+        raise exceptions.ArgusHeatTeardown(
+            "The stack %s failed to be deleted: %s"
+            % (stack_name, stack.stack_status_reason))
+    return True if stack.stack_status == STACK_DELETED_STATUS else None
+
+
+def wait_stack_deleted(heat_client, stack_name, retry_count=RETRY_COUNT,
+                       retry_delay=RETRY_DELAY):
+    """Wait until the given stack is deleted.
+
+    The stack is polled often at first and then up to every
+    `retry_delay` seconds, for at most `retry_count` times
+    `retry_delay` seconds.
+    """
+    try:
+        waiters.wait_until(lambda: _stack_deleted(heat_client, stack_name),
+                           timeout=retry_count * retry_delay,
+                           maximum=retry_delay)
+    except exceptions.ArgusTimeoutError:
+        raise exceptions.ArgusHeatTeardown(
+            "The stack %s failed to be deleted in time!" % stack_name)
+
+
+class StackBatch(object):
+    """A stack with many instances, claimed by the scenarios.
+
+    The stack is deleted when all its instances are released, or
+    when the process exits, if some instances were never claimed.
+
+    :param heat_client: The Heat client which creates the stack.
+    :param name: The name of the stack.
+    :param size: The number of instances of the stack.
+    """
+
+    def __init__(self, heat_client, name, size):
+        self.name = name
+        self._heat_client = heat_client
+        self._size = size
+        self._claimed = 0
+        self._released = 0
+        self._deleted = False
+        self._lock = threading.Lock()
+
+    @property
+    def full(self):
+        """Check if all the instances of the stack were claimed."""
+        with self._lock:
+            return self._claimed >= self._size
+
+    def claim(self):
+        """Claim an instance of the stack.
+
+        :returns: The index of the claimed instance.
+        """
+        with self._lock:
+            slot = self._claimed
+            self._claimed += 1
+            return slot
+
+    def release(self):
+        """Release a claimed instance.
+
+        :returns:
+            True if this was the last instance of the stack,
+            which means that the stack should be deleted.
+        """
+        with self._lock:
+            self._released += 1
+            if self._released < self._size:
+                return False
+            self._deleted = True
+            return True
+
+    def delete(self):
+        """Delete the stack, unless it was already deleted."""
+        with self._lock:
+            if self._deleted:
+                return
+            self._deleted = True
+        try:
+            self._heat_client.stacks.delete(stack_id=self.name)
+            wait_stack_deleted(self._heat_client, self.name)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.warning("Could not delete the stack %s: %s", self.name, exc)
+
 
 # pylint: disable=abstract-method
 @six.add_metaclass(abc.ABCMeta)
@@ -55,11 +165,65 @@ class BaseHeatBackend(base.CloudBackend):
         self._heat_client = client.heat_client(
             self._manager.primary_credentials())
         self._keypair = None
+        self._shared_resources = []
+        self._batch = None
+        self._batch_slot = None
 
-    @staticmethod
-    def _build_template(instance_name, key,
+    @classmethod
+    def _build_template(cls, instance_name, key,
                         image_name, flavor_name, user_data,
-                        floating_network_id, private_net_id):
+                        floating_network_id, private_net_id,
+                        security_group_id=None):
+        """Build the template of the stack.
+
+        When a security group is given, the server uses it instead
+        of creating its own.
+        """
+        template = cls._build_base_template(
+            instance_name, key, image_name, flavor_name, user_data,
+            floating_network_id, private_net_id)
+        if security_group_id:
+            resources = template[u'resources']
+            del resources[u'server_security_group']
+            resources[u'server_port'][u'properties'][u'security_groups'] = [
+                security_group_id]
+        return template
+
+    @classmethod
+    def _build_batch_template(cls, size, key,
+                              image_name, flavor_name, user_data,
+                              floating_network_id, private_net_id,
+                              security_group_id=None):
+        """Build the template of a stack with `size` instances.
+
+        The resources of each instance have the index of the instance
+        as suffix and all the instances use the same security group.
+        """
+        template = cls._build_template(
+            BATCH_SERVER, key, image_name, flavor_name, user_data,
+            floating_network_id, private_net_id, security_group_id)
+        resources = template[u'resources']
+        server = resources.pop(BATCH_SERVER)
+        port = resources.pop(u'server_port')
+        floating_ip = resources.pop(u'server_floating_ip')
+        for index in range(size):
+            suffix = u'_{}'.format(index)
+            server_port = u'server_port' + suffix
+
+            resources[BATCH_SERVER + suffix] = copy.deepcopy(server)
+            resources[BATCH_SERVER + suffix][u'properties'][u'networks'] = [
+                {u'port': {u'get_resource': server_port}}]
+            resources[server_port] = copy.deepcopy(port)
+            resources[u'server_floating_ip' + suffix] = copy.deepcopy(
+                floating_ip)
+            resources[u'server_floating_ip' + suffix][u'properties'][
+                u'port_id'] = {u'get_resource': server_port}
+        return template
+
+    @staticmethod
+    def _build_base_template(instance_name, key,
+                             image_name, flavor_name, user_data,
+                             floating_network_id, private_net_id):
         return {
             u'heat_template_version': u'2013-05-23',
             u'description': u'argus',
@@ -134,8 +298,16 @@ class BaseHeatBackend(base.CloudBackend):
             CONFIG.openstack.image_ref)['name']
         flavor_name = self._manager.flavors_client.show_flavor(
             CONFIG.openstack.flavor_ref)['flavor']['name']
-        self._keypair = self._manager.create_keypair(
-            name=self.__class__.__name__)
+        security_group_id = None
+        if resource_pool.is_enabled():
+            self._keypair = resource_pool.acquire_keypair(self._manager)
+            self._shared_resources.append(resource_pool.KEYPAIR)
+            security_group_id = resource_pool.acquire_security_group(
+                self._manager, tempest_backend.SECURITY_GROUP_RULESETS)['id']
+            self._shared_resources.append(resource_pool.SECURITY_GROUP)
+        else:
+            self._keypair = self._manager.create_keypair(
+                name=self.__class__.__name__)
 
         # Get network info.
         credentials = self._manager.primary_credentials()
@@ -144,10 +316,16 @@ class BaseHeatBackend(base.CloudBackend):
         floating_network_id = gateway['network_id']
         private_net_id = credentials.network['id']
 
+        if CONFIG.argus.heat_batch_size and resource_pool.is_enabled():
+            self._claim_batch_instance(
+                image_name, flavor_name, floating_network_id,
+                private_net_id, security_group_id)
+            return
+
         template = self._build_template(
             self._name, self._keypair.name,
             image_name, flavor_name, self.userdata,
-            floating_network_id, private_net_id)
+            floating_network_id, private_net_id, security_group_id)
         fields = {
             'stack_name': self._name,
             'disable_rollback': True,
@@ -159,40 +337,86 @@ class BaseHeatBackend(base.CloudBackend):
 
         self._heat_client.stacks.create(**fields)
 
+    def _claim_batch_instance(self, image_name, flavor_name,
+                              floating_network_id, private_net_id,
+                              security_group_id):
+        """Claim an instance from the stack batch of the back-end.
+
+        A new batch is created when there is no batch for the same
+        credentials, image, flavor and user-data, or when all the
+        instances of the current batch were claimed.
+        """
+        key = (resource_pool.credentials_key(self._manager), image_name,
+               flavor_name, self.userdata)
+        with _BATCHES_LOCK:
+            batch = _BATCHES.get(key)
+            if batch is None or batch.full:
+                size = CONFIG.argus.heat_batch_size
+                batch = StackBatch(self._heat_client,
+                                   util.rand_name(BATCH_NAME), size)
+                template = self._build_batch_template(
+                    size, self._keypair.name, image_name, flavor_name,
+                    self.userdata, floating_network_id, private_net_id,
+                    security_group_id)
+                self._heat_client.stacks.create(
+                    stack_name=batch.name, disable_rollback=True,
+                    parameters={}, template=template, files={},
+                    environment={})
+                if CONFIG.argus.delete_instance:
+                    # Delete the instances which were never claimed.
+                    atexit.register(batch.delete)
+                _BATCHES[key] = batch
+            self._batch_slot = batch.claim()
+
+        self._batch = batch
+        LOG.info("Using the instance %d of the stack %s.",
+                 self._batch_slot, batch.name)
+
     def cleanup(self):
-        if self._keypair:
+        if (self._keypair and
+                resource_pool.KEYPAIR not in self._shared_resources):
             self._keypair.destroy()
+        for kind in self._shared_resources:
+            resource_pool.release(kind, self._manager)
+        self._shared_resources = []
+
+        if self._batch is not None:
+            try:
+                # The last scenario of a batch deletes its stack.
+                if self._batch.release():
+                    self._heat_client.stacks.delete(
+                        stack_id=self._stack_name)
+                    self._wait_stack_deleted()
+            finally:
+                self._manager.cleanup_credentials()
+            return
 
         # if no stack was created
-        if not six.functools.reduce(lambda a, b: a + 1,
-                                    self._heat_client.stacks.list(), 0):
+        if not self._stack_exists():
             return
         try:
             self._delete_floating_ip()
             self._heat_client.stacks.delete(stack_id=self._name)
-            self._wait_stacks()
+            self._wait_stack_deleted()
         finally:
             self._manager.cleanup_credentials()
 
-    def _get_stacks(self):
-        """Return the number of heat stacks."""
-        iterator = self._heat_client.stacks.list()
-        return six.functools.reduce(lambda acc, e: acc + 1, iterator, 0)
-
-    def _wait_stacks(self, retry_count=RETRY_COUNT,
-                     retry_delay=RETRY_DELAY):
-        """We are going to wait until all stacks are deleted."""
-        stacks = self._get_stacks()
-        retry_count = stacks * retry_count
-        retry_delay = stacks * retry_delay
-        while retry_count > 0:
-            if not self._get_stacks():
-                return
-            else:
-                retry_count -= 1
-            time.sleep(retry_delay)
-        raise exceptions.ArgusHeatTeardown(
-            "All stacks failed to be deleted in time!")
+    @property
+    def _stack_name(self):
+        """The name of the stack which holds the instance."""
+        return self._batch.name if self._batch else self._name
+
+    def _stack_exists(self):
+        """Check if the stack of the back-end was created."""
+        stacks = self._heat_client.stacks.list(
+            filters={'name': self._stack_name}, limit=1)
+        return next(iter(stacks), None) is not None
+
+    def _wait_stack_deleted(self, retry_count=RETRY_COUNT,
+                            retry_delay=RETRY_DELAY):
+        """Wait until the stack of the back-end is deleted."""
+        wait_stack_deleted(self._heat_client, self._stack_name,
+                           retry_count, retry_delay)
 
     def _delete_floating_ip(self):
         # The floating IP in the new version is deleted when the
@@ -200,46 +424,79 @@ class BaseHeatBackend(base.CloudBackend):
         # In the new scenarios this code is not called but I keep
         # it to preserve the logic if more complicated back-ends are
         # needed
+        # The stack is deleted right after, so there is no need
+        # to wait for its floating IP resource.
         self._manager.floating_ips_client.delete_floating_ip(
             self._floating_ip_resource['id'])
+
+    def _list_resources(self):
+        """Index the resources of the stack by their type."""
         try:
-            self._search_resource_until_status(OS_NEUTRON_FLOATING_IP,
-                                               status=RESOURCE_DELETED_STATUS)
-        except exceptions.ArgusError:
-            # Can't find it, just quit.
-            return
+            resources = self._heat_client.resources.list(
+                stack_id=self._stack_name, nested_depth=1)
+        except exc.HTTPNotFound:
+            raise exceptions.ArgusError(
+                'Stack not found: %s' % self._stack_name)
+
+        suffix = None
+        if self._batch_slot is not None:
+            # Only the resources of the claimed instance are indexed.
+            suffix = "_{}".format(self._batch_slot)
+        index = collections.defaultdict(list)
+        for resource in resources:
+            if suffix and not resource.resource_name.endswith(suffix):
+                continue
+            index[resource.resource_type].append(resource)
+        return index
+
+    def _wait_for_resources(self, resource_types,
+                            limit=HEAT_RESOURCE_LIMIT,
+                            status=RESOURCE_COMPLETED_STATUS):
+        """Wait until the resources of the given types reach `status`.
+
+        All the resources of the stack are listed with a single call
+        for every poll, so waiting for more types of resources doesn't
+        take more calls.
+
+        :returns: The resources of the stack, indexed by their type.
+        """
+        pending = resource_types
+        delays = waiters.backoff(initial=HEAT_RESOURCE_TIMEOUT)
+        while limit > 0:
+            resources = self._list_resources()
+            if not all(resource_type in resources
+                       for resource_type in resource_types):
+                pending = [resource_type for resource_type in resource_types
+                           if resource_type not in resources]
+                break
+
+            pending = [resource_type for resource_type in resource_types
+                       if any(resource.resource_status != status
+                              for resource in resources[resource_type])]
+            if not pending:
+                return resources
+            limit -= 1
+            time.sleep(next(delays))
+
+        raise exceptions.ArgusError("No resource %s found with name %s"
+                                    % (", ".join(map(str, pending)),
+                                       self._name))
 
     def _search_resource_until_status(self, resource_name,
                                       limit=HEAT_RESOURCE_LIMIT,
                                       status=RESOURCE_COMPLETED_STATUS):
-        fields = {
-            'stack_id': self._name,
-            'nested_depth': 1,
-        }
-        while limit > 0:
-            try:
-                resources = self._heat_client.resources.list(**fields)
-            except exc.HTTPNotFound:
-                raise exceptions.ArgusError('Stack not found: %s' % self._name)
-            else:
-                for resource in resources:
-                    if resource.resource_type == resource_name:
-                        # Found the resource we were needing
-                        if resource.resource_status == status:
-                            return resource.physical_resource_id
-                        else:
-                            limit -= 1
-                            time.sleep(HEAT_RESOURCE_TIMEOUT)
-                            break
-                else:
-                    break
+        resources = self._wait_for_resources((resource_name, ), limit,
+                                             status)
+        return resources[resource_name][0].physical_resource_id
 
-        raise exceptions.ArgusError("No resource %s found with name %s"
-                                    % (resource_name, self._name))
+    @util.cached_property
+    def _resources(self):
+        """The resources of the stack, once they are all created."""
+        return self._wait_for_resources(AWAITED_RESOURCES)
 
     @util.cached_property
     def _internal_id(self):
-        return self._search_resource_until_status(OS_NOVA_RESOURCE)
+        return self._resources[OS_NOVA_RESOURCE][0].physical_resource_id
 
     def internal_instance_id(self):
         """Get the underlying instance ID.
@@ -250,7 +507,8 @@ class BaseHeatBackend(base.CloudBackend):
 
     @util.cached_property
     def _floating_ip_resource(self):
-        resource = self._search_resource_until_status(OS_NEUTRON_FLOATING_IP)
+        resource = self._resources[
+            OS_NEUTRON_FLOATING_IP][0].physical_resource_id
         floating_ip = self._manager.floating_ips_client.show_floating_ip(
             resource)
         return floating_ip['floating_ip']
@@ -265,6 +523,11 @@ class BaseHeatBackend(base.CloudBackend):
             self.internal_instance_id(),
             limit)
 
+    def follow_instance_output(self):
+        """Get the console output written since the previous call."""
+        return self._manager.follow_instance_output(
+            self.internal_instance_id())
+
     def reboot_instance(self):
         """Reboot the underlying instance."""
         return self._manager.reboot_instance(self.internal_instance_id())
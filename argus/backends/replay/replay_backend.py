@@ -0,0 +1,133 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run the scenarios offline, from their recorded transcripts.
+
+Besides the output of the remote commands, the transcript of a scenario
+holds the values which the recipes and the tests get from the back-end,
+such as the floating IP, the keys or the details of the server. These
+values are recorded after the instance is prepared, so the replay
+back-end can answer them without creating any instance.
+"""
+
+import json
+
+from argus.backends import base as base_backend
+from argus.backends import windows as windows_backend
+from argus.client import transcript
+from argus import exceptions
+from argus import log as argus_log
+
+LOG = argus_log.LOG
+
+# The values of the back-end which are kept in the transcript.
+RECORDED_VALUES = (
+    "floating_ip",
+    "from_golden_image",
+    "get_image_by_ref",
+    "get_mtu",
+    "get_network_interfaces",
+    "instance_output",
+    "instance_password",
+    "instance_server",
+    "internal_instance_id",
+    "private_key",
+    "public_key",
+)
+
+
+def record_backend(backend, scenario_transcript):
+    """Record the values of the back-end in the given transcript.
+
+    The values which the back-end doesn't have or which
+    can't be serialized are skipped.
+    """
+    for name in RECORDED_VALUES:
+        value = getattr(backend, name, None)
+        if value is None:
+            continue
+        try:
+            if callable(value):
+                value = value()
+            json.dumps(value)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.debug("Not recording the value %s of the back-end: %s",
+                      name, exc)
+            continue
+        scenario_transcript.record_value(name, value)
+
+
+class ReplayBackend(windows_backend.WindowsBackendMixin,
+                    windows_backend.BaseMetadataProviderMixin,
+                    base_backend.CloudBackend):
+    """A back-end which answers from the transcript of the scenario.
+
+    No instance is created, so the remote client of this back-end
+    must replay its commands from the same transcript.
+    """
+
+    def __init__(self, name=None, userdata=None, metadata=None,
+                 availability_zone=None):
+        super(ReplayBackend, self).__init__(
+            name=name, userdata=userdata, metadata=metadata,
+            availability_zone=availability_zone)
+        self._transcript = transcript.get_scenario_transcript()
+
+    def _replay(self, name):
+        return self._transcript.replay_value(name)
+
+    def setup_instance(self):
+        LOG.info("Replaying the instance from the transcript %s.",
+                 self._transcript.path)
+        try:
+            self.from_golden_image = self._replay("from_golden_image")
+        except exceptions.ArgusTranscriptError:
+            self.from_golden_image = False
+
+    def cleanup(self):
+        pass
+
+    def reboot_instance(self):
+        pass
+
+    def floating_ip(self):
+        return self._replay("floating_ip")
+
+    def internal_instance_id(self):
+        return self._replay("internal_instance_id")
+
+    def instance_output(self, limit=None):
+        return self._replay("instance_output")
+
+    def instance_password(self):
+        return self._replay("instance_password")
+
+    def private_key(self):
+        return self._replay("private_key")
+
+    def public_key(self):
+        return self._replay("public_key")
+
+    def instance_server(self):
+        return self._replay("instance_server")
+
+    def get_image_by_ref(self):
+        return self._replay("get_image_by_ref")
+
+    def get_mtu(self):
+        return self._replay("get_mtu")
+
+    def get_network_interfaces(self):
+        return self._replay("get_network_interfaces")
@@ -0,0 +1,150 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Share the listings of the servers between the processes of a run.
+
+When the scenarios run in parallel, each worker process polls the
+status of its own servers. With the status cache, the servers are
+listed by a single worker at a time and the listing is written to a
+file, from where the other workers read it, as long as it is recent
+enough. The file is guarded by a lock, which is held while the
+servers are listed, so that the workers don't list them at the same
+time.
+
+Since the servers are listed for a project, the listing is shared
+only by the workers using the same project.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from argus import config as argus_config
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+CACHE_PREFIX = "argus-status-cache-"
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+__all__ = (
+    'StatusCache',
+    'get_cache',
+    'is_enabled',
+)
+
+
+def is_enabled():
+    """Check if the listings of the servers should be shared."""
+    if not CONFIG.argus.share_status_polls:
+        return False
+    if fcntl is None:
+        LOG.warning("The listings of the servers can't be shared "
+                    "on this platform.")
+        return False
+    return True
+
+
+class StatusCache(object):
+    """The latest listing of the servers of a project.
+
+    :param path: The file which holds the listing.
+    :param max_age:
+        The number of seconds after which the listing is refreshed,
+        unless the caller gives its own.
+    """
+
+    def __init__(self, path, max_age):
+        self._path = path
+        self._max_age = max_age
+        # The lock of the file doesn't guard the threads of a process.
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self._path) as stream:
+                return json.load(stream)
+        except (IOError, ValueError):
+            return {"time": 0, "changes_since": None, "servers": {}}
+
+    def _save(self, data):
+        temporary_path = "{}.{}.tmp".format(self._path, os.getpid())
+        with open(temporary_path, "w") as stream:
+            json.dump(data, stream)
+        os.rename(temporary_path, self._path)
+
+    def _refresh(self, servers_client, data):
+        params = {}
+        if data["changes_since"]:
+            params["changes-since"] = data["changes_since"]
+        servers = servers_client.list_servers(
+            detail=True, **params)["servers"]
+        for server in servers:
+            data["servers"][server["id"]] = server
+            updated = server.get("updated")
+            if updated and updated > (data["changes_since"] or ""):
+                data["changes_since"] = updated
+        data["time"] = time.time()
+        self._save(data)
+
+    def list_servers(self, servers_client, max_age=None):
+        """Get the servers, listing them only if needed.
+
+        The servers changed since the previous listing, including
+        the deleted ones, are merged into the cached listing.
+
+        :param max_age:
+            The number of seconds after which the listing is
+            refreshed, such as the current delay between the
+            polls of the caller.
+        """
+        if max_age is None:
+            max_age = self._max_age
+        with self._lock, open(self._path + ".lock", "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                data = self._load()
+                if time.time() - data["time"] >= max_age:
+                    self._refresh(servers_client, data)
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+        return list(data["servers"].values())
+
+
+def get_cache(servers_client):
+    """Get the status cache for the project of a compute client."""
+    project = hashlib.sha1(
+        str(servers_client.tenant_id).encode("utf-8")).hexdigest()
+    directory = CONFIG.argus.output_directory or tempfile.gettempdir()
+    path = os.path.join(directory, CACHE_PREFIX + project + ".json")
+    with _CACHES_LOCK:
+        cache = _CACHES.get(path)
+        if cache is None:
+            # The pollers back off up to this interval, so a listing
+            # this recent is shared by all of them.
+            cache = _CACHES[path] = StatusCache(
+                path, CONFIG.argus.max_poll_interval)
+        return cache
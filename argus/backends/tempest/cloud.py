@@ -14,13 +14,13 @@
 #    under the License.
 
 from argus.backends.tempest import tempest_backend
+from argus.backends import waiters
 from argus import config as argus_config
 from argus import exceptions
 from argus import util
 
 with util.restore_excepthook():
     from tempest.common import dynamic_creds
-    from tempest.common import waiters
 
 CONFIG = argus_config.CONFIG
 
@@ -0,0 +1,200 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache images which already have Cloudbase-Init installed.
+
+A golden image is a snapshot of an instance taken right after
+Cloudbase-Init was installed and patched, but before it was configured
+and sysprepped. The scenarios sharing the same installation can boot
+from it, instead of installing Cloudbase-Init again.
+"""
+
+import datetime
+import hashlib
+import json
+import threading
+import time
+
+import requests
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+GOLDEN_IMAGE_PREFIX = "argus-golden-"
+GOLDEN_IMAGE_METADATA = "argus_golden_image"
+# The MSI installer downloaded by the action managers.
+INSTALLER_NAME = "CloudbaseInitSetup_{build}_{arch}.msi"
+# The number of seconds to wait for the identity of a download.
+IDENTITY_TIMEOUT = 10
+
+# The golden images found or created by this process and the locks
+# which prevent creating the same golden image more than once.
+_IMAGES = {}
+_LOCKS = {}
+_LOCKS_LOCK = threading.Lock()
+# The identities of the downloads, found once per process.
+_IDENTITIES = {}
+
+__all__ = (
+    'GoldenImageCache',
+    'golden_image_name',
+)
+
+
+def _download_identity(url):
+    """Get what identifies the current content of a download.
+
+    This is the ETag or the modification time given by the server. When
+    neither is available, the current day is used instead, so that the
+    golden images built from the download expire daily.
+    """
+    if url in _IDENTITIES:
+        return _IDENTITIES[url]
+
+    identity = None
+    try:
+        response = requests.head(url, allow_redirects=True,
+                                 timeout=IDENTITY_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        LOG.warning("Could not identify the download %s: %s", url, exc)
+    else:
+        identity = (response.headers.get("ETag") or
+                    response.headers.get("Last-Modified"))
+    if not identity:
+        LOG.warning("The download %s has no identity, the golden images "
+                    "built from it will expire daily.", url)
+        identity = datetime.date.today().isoformat()
+
+    _IDENTITIES[url] = identity
+    return identity
+
+
+def golden_image_name(image_ref):
+    """Get the name of the golden image for the current installation.
+
+    The name depends on the base image, on every option which changes
+    the installed Cloudbase-Init and on the identity of the downloaded
+    installer and patch, since they can be republished at the same URL.
+    """
+    installer_url = "{}/{}".format(
+        CONFIG.argus.installer_root_url.rstrip("/"),
+        INSTALLER_NAME.format(build=CONFIG.argus.build,
+                              arch=CONFIG.argus.arch))
+    parts = [
+        image_ref,
+        CONFIG.argus.build,
+        CONFIG.argus.arch,
+        CONFIG.argus.installer_root_url,
+        CONFIG.argus.patch_install,
+        CONFIG.argus.git_command,
+        _download_identity(installer_url),
+    ]
+    patch_install = CONFIG.argus.patch_install
+    if patch_install and patch_install.startswith(("http://", "https://")):
+        parts.append(_download_identity(patch_install))
+    digest = hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+    return GOLDEN_IMAGE_PREFIX + digest[:16]
+
+
+def _get_lock(name):
+    with _LOCKS_LOCK:
+        return _LOCKS.setdefault(name, threading.Lock())
+
+
+class GoldenImageCache(object):
+    """Find and create golden images.
+
+    :param images_client:
+        The compute client for the images, used for finding them.
+    :param servers_client:
+        The compute client for the servers, used for snapshots.
+    :param interval:
+        The number of seconds between two checks of a new image.
+    :param timeout:
+        The number of seconds to wait for a new image to become active.
+    """
+
+    def __init__(self, images_client, servers_client,
+                 interval=None, timeout=None):
+        self._images_client = images_client
+        self._servers_client = servers_client
+        self._interval = interval or CONFIG.argus.retry_delay
+        self._timeout = timeout or CONFIG.argus.io_upper_timeout
+
+    def find(self, name):
+        """Get the ID of the active image with the given name, if any."""
+        if name in _IMAGES:
+            return _IMAGES[name]
+
+        images = self._images_client.list_images(
+            detail=True, name=name)["images"]
+        for image in images:
+            if image["name"] == name and image["status"] == "ACTIVE":
+                _IMAGES[name] = image["id"]
+                return image["id"]
+        return None
+
+    @staticmethod
+    def _get_image_id(response):
+        # Newer compute API versions return the ID in the body,
+        # the older ones only in the location header.
+        image_id = response.get("image_id")
+        if not image_id:
+            location = response.response["location"]
+            image_id = location.rstrip("/").rsplit("/", 1)[-1]
+        return image_id
+
+    def _wait_active(self, image_id):
+        deadline = time.time() + self._timeout
+        while True:
+            image = self._images_client.show_image(image_id)["image"]
+            if image["status"] == "ACTIVE":
+                return
+            if image["status"] == "ERROR":
+                raise exceptions.ArgusError(
+                    "The golden image {} failed to build.".format(image_id))
+            if time.time() > deadline:
+                raise exceptions.ArgusTimeoutError(
+                    "The golden image {} is still {} after {} seconds."
+                    .format(image_id, image["status"], self._timeout))
+            time.sleep(self._interval)
+
+    def create(self, server_id, name):
+        """Create the golden image with the given name from a server.
+
+        If the image already exists, it is returned instead.
+
+        :returns: The ID of the golden image.
+        """
+        with _get_lock(name):
+            image_id = self.find(name)
+            if image_id:
+                LOG.info("The golden image %s already exists.", name)
+                return image_id
+
+            LOG.info("Creating the golden image %s from the server %s.",
+                     name, server_id)
+            response = self._servers_client.create_image(
+                server_id, name=name,
+                metadata={GOLDEN_IMAGE_METADATA: "true"})
+            image_id = self._get_image_id(response)
+            self._wait_active(image_id)
+            _IMAGES[name] = image_id
+            return image_id
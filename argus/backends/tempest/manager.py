@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+
+from argus.backends import waiters
 from argus import exceptions
 from argus import log as argus_log
 from argus import util
@@ -20,7 +23,7 @@ from argus import util
 with util.restore_excepthook():
     from tempest import clients
     from tempest.common import credentials_factory as credentials
-    from tempest.common import waiters
+    from tempest.lib import exceptions as lib_exceptions
 
 
 OUTPUT_STATUS_OK = 200
@@ -28,6 +31,16 @@ OUTPUT_SIZE = 128
 OUTPUT_EPSILON = int(OUTPUT_SIZE / 10)
 LOG = argus_log.LOG
 
+# The errors of the API calls which are worth retrying, since they
+# are caused by a busy or an unreachable cloud.
+TRANSIENT_ERRORS = (
+    lib_exceptions.ServerFault,
+    lib_exceptions.OverLimit,
+    lib_exceptions.RateLimitExceeded,
+    lib_exceptions.TimeoutException,
+    IOError,
+)
+
 
 class APIManager(object):
     """The APIManager for interacting between modules.
@@ -73,6 +86,8 @@ class APIManager(object):
         # Heat client
         self.orchestration_client = self._manager.orchestration_client
 
+        self._console_tails = {}
+
     def cleanup_credentials(self):
         """Cleanup any credentials created during the initialization."""
         self.isolated_creds.clear_creds()
@@ -99,6 +114,29 @@ class APIManager(object):
                        name=keypair['name'],
                        manager=self)
 
+    def create_security_group_rule(self, secgroup_id, **ruleset):
+        """Create a rule in the given security group.
+
+        Creating a rule isn't idempotent, so when the rule already
+        exists, such as when a previous attempt created it before
+        timing out, the existing rule is returned instead.
+        """
+        client = self.security_group_rules_client
+        try:
+            return client.create_security_group_rule(
+                parent_group_id=secgroup_id, **ruleset)['security_group_rule']
+        except lib_exceptions.Conflict:
+            secgroup = self.security_groups_client.show_security_group(
+                secgroup_id)['security_group']
+            for rule in secgroup['rules']:
+                if (rule['ip_protocol'] == ruleset['ip_protocol'] and
+                        rule['from_port'] == ruleset['from_port'] and
+                        rule['to_port'] == ruleset['to_port'] and
+                        rule['ip_range'].get('cidr') == ruleset['cidr']):
+                    LOG.debug("The rule %s already exists.", rule['id'])
+                    return rule
+            raise
+
     def reboot_instance(self, instance_id):
         """Reboot the instance with the given id."""
         self.servers_client.reboot_server(
@@ -141,6 +179,19 @@ class APIManager(object):
                 break
         return content
 
+    def follow_instance_output(self, instance_id):
+        """Get the console output lines written since the previous call.
+
+        :param instance_id:
+            The id of the instance for which the output will
+            be retrieved.
+        """
+        tail = self._console_tails.get(instance_id)
+        if tail is None:
+            tail = self._console_tails[instance_id] = ConsoleTail(
+                functools.partial(self._instance_output, instance_id))
+        return tail.read()
+
     def instance_server(self, instance_id):
         """Get more details about the given instance id."""
         return self.servers_client.show_server(instance_id)['server']
@@ -154,6 +205,61 @@ class APIManager(object):
                                         'tempest backend: %s' % exc)
 
 
+class ConsoleTail(object):
+    """Follow the console output of an instance.
+
+    The console log can only be fetched from its end, so the last lines
+    seen are kept and only the lines which follow them are returned.
+    The log is fetched from further back only until these lines are
+    found in it.
+
+    :param fetch:
+        A callable which receives the number of lines and returns
+        that many lines from the end of the console log.
+    :param anchor_size:
+        The number of lines kept for finding where the previously
+        seen output ends.
+    """
+
+    def __init__(self, fetch, anchor_size=OUTPUT_EPSILON):
+        self._fetch = fetch
+        self._anchor_size = anchor_size
+        self._anchor = []
+
+    def _after_anchor(self, lines):
+        """Get the lines following the anchor, if they contain it."""
+        if not self._anchor:
+            return None
+        size = len(self._anchor)
+        for index in range(len(lines) - size, -1, -1):
+            if lines[index:index + size] == self._anchor:
+                return lines[index + size:]
+        return None
+
+    def read(self, limit=OUTPUT_SIZE):
+        """Get the complete lines written since the previous call.
+
+        A line which isn't complete yet is returned
+        once it is completed.
+        """
+        while True:
+            lines = self._fetch(limit).splitlines(True)
+            complete = len(lines) < (limit - OUTPUT_EPSILON)
+            new_lines = self._after_anchor(lines)
+            if new_lines is not None:
+                break
+            if complete:
+                # Either this is the first read, or the log was reset.
+                new_lines = lines
+                break
+            limit *= 2
+
+        if new_lines and not new_lines[-1].endswith("\n"):
+            new_lines.pop()
+        self._anchor = (self._anchor + new_lines)[-self._anchor_size:]
+        return new_lines
+
+
 class Keypair(object):
     """A key-pair container."""
 
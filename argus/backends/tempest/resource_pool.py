@@ -0,0 +1,300 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Share the keypairs and the security groups between the scenarios.
+
+The resources are created on their first use, handed to every scenario
+using the same credentials and destroyed when the run is over. Since
+these resources belong to the project of the credentials, sharing them
+makes sense only when Tempest doesn't create new credentials for each
+scenario.
+
+The resources created by a run are recorded in a file, which is
+removed when the resources are destroyed. If the run crashes, the
+next run finds the file and destroys the leftover resources.
+"""
+
+import atexit
+import collections
+import errno
+import functools
+import glob
+import json
+import os
+import threading
+
+from argus.backends.tempest import manager as api_manager
+from argus import config as argus_config
+from argus import log as argus_log
+from argus import util
+
+with util.restore_excepthook():
+    from tempest import config as tempest_config
+    from tempest.lib import exceptions as lib_exceptions
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+KEYPAIR = "keypair"
+SECURITY_GROUP = "security_group"
+RECORDS_PREFIX = "argus-shared-resources-"
+SHARED_NAME = "argus-shared"
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_WARNED = False
+
+__all__ = (
+    'ResourcePool',
+    'acquire_keypair',
+    'acquire_security_group',
+    'credentials_key',
+    'get_pool',
+    'is_enabled',
+    'release',
+)
+
+
+def is_enabled():
+    """Check if the resources should be shared between the scenarios."""
+    if not CONFIG.argus.share_resources:
+        return False
+    if tempest_config.CONF.auth.use_dynamic_credentials:
+        global _WARNED    # pylint: disable=global-statement
+        if not _WARNED:
+            LOG.warning("The resources can't be shared, since every "
+                        "scenario uses its own dynamic credentials.")
+            _WARNED = True
+        return False
+    return True
+
+
+def credentials_key(manager):
+    """Get the user and the project of the credentials of a manager."""
+    credentials = manager.primary_credentials()
+    project = (getattr(credentials, "project_name", None) or
+               getattr(credentials, "tenant_name", None))
+    return credentials.username, project
+
+
+def _resource_id(kind, resource):
+    if kind == KEYPAIR:
+        return resource.name
+    return resource["id"]
+
+
+def _destroy(kind, manager, resource_id):
+    if kind == KEYPAIR:
+        manager.keypairs_client.delete_keypair(resource_id)
+    else:
+        manager.security_groups_client.delete_security_group(resource_id)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+
+class _Entry(object):
+
+    def __init__(self, kind, manager, resource):
+        self.kind = kind
+        self.manager = manager
+        self.resource = resource
+        self.references = 0
+
+    def record(self):
+        return {
+            "kind": self.kind,
+            "id": _resource_id(self.kind, self.resource),
+            "credentials": list(credentials_key(self.manager)),
+        }
+
+
+class ResourcePool(object):
+    """The resources shared by the scenarios of a run.
+
+    :param directory:
+        The directory of the files which record the created resources.
+        If None is given, the output directory will be used.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = (directory or CONFIG.argus.output_directory or
+                           os.getcwd())
+        self._path = os.path.join(
+            self._directory, "{}{}.json".format(RECORDS_PREFIX, os.getpid()))
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._cleaned = set()
+
+    def _save(self):
+        records = [entry.record() for entry in self._entries.values()]
+        temporary_path = self._path + ".tmp"
+        with open(temporary_path, "w") as stream:
+            json.dump(records, stream, indent=2)
+        os.rename(temporary_path, self._path)
+
+    def _cleanup_leftovers(self, manager):
+        """Destroy the resources left behind by the crashed runs."""
+        credentials = list(credentials_key(manager))
+        for path in glob.glob(os.path.join(self._directory,
+                                           RECORDS_PREFIX + "*.json")):
+            pid = os.path.basename(path)[len(RECORDS_PREFIX):-len(".json")]
+            if not pid.isdigit() or _is_running(int(pid)):
+                continue
+            try:
+                with open(path) as stream:
+                    records = json.load(stream)
+            except (IOError, ValueError) as exc:
+                LOG.warning("Ignoring the invalid records %s: %s", path, exc)
+                continue
+
+            remaining = []
+            for record in records:
+                if record["credentials"] != credentials:
+                    remaining.append(record)
+                    continue
+                LOG.info("Destroying the leftover %s %s.",
+                         record["kind"], record["id"])
+                try:
+                    _destroy(record["kind"], manager, record["id"])
+                except lib_exceptions.NotFound:
+                    pass
+                except Exception as exc:  # pylint: disable=broad-except
+                    LOG.warning("Could not destroy the leftover %s %s: %s",
+                                record["kind"], record["id"], exc)
+                    remaining.append(record)
+            if remaining:
+                with open(path, "w") as stream:
+                    json.dump(remaining, stream, indent=2)
+            else:
+                os.remove(path)
+
+    def acquire(self, kind, manager, create):
+        """Get the shared resource of the given kind.
+
+        The resource is created with `create` on its first use
+        and every call must be paired with a call to :meth:`release`.
+
+        :param kind: Either :data:`KEYPAIR` or :data:`SECURITY_GROUP`.
+        :param manager: The API manager of the scenario.
+        :param create:
+            A callable without arguments, which creates the resource.
+        """
+        key = (kind, ) + credentials_key(manager)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if key[1:] not in self._cleaned:
+                    self._cleanup_leftovers(manager)
+                    self._cleaned.add(key[1:])
+                entry = _Entry(kind, manager, create())
+                self._entries[key] = entry
+                self._save()
+                LOG.info("Created the shared %s %s.", kind,
+                         _resource_id(kind, entry.resource))
+            entry.references += 1
+            return entry.resource
+
+    def release(self, kind, manager):
+        """Stop using the shared resource of the given kind."""
+        key = (kind, ) + credentials_key(manager)
+        with self._lock:
+            self._entries[key].references -= 1
+
+    def teardown(self):
+        """Destroy all the shared resources.
+
+        The resources which can't be destroyed remain recorded,
+        to be destroyed by the next run.
+        """
+        with self._lock:
+            failed = collections.OrderedDict()
+            for key, entry in reversed(list(self._entries.items())):
+                resource_id = _resource_id(entry.kind, entry.resource)
+                if entry.references:
+                    LOG.warning("The shared %s %s is still used by %d "
+                                "scenario(s).", entry.kind, resource_id,
+                                entry.references)
+                try:
+                    _destroy(entry.kind, entry.manager, resource_id)
+                except lib_exceptions.NotFound:
+                    pass
+                except Exception as exc:  # pylint: disable=broad-except
+                    LOG.warning("Could not destroy the shared %s %s: %s",
+                                entry.kind, resource_id, exc)
+                    failed[key] = entry
+
+            self._entries = failed
+            if failed:
+                self._save()
+            elif os.path.exists(self._path):
+                os.remove(self._path)
+
+
+def get_pool():
+    """Get the resource pool of the current run.
+
+    The pool is torn down when the process exits.
+    """
+    global _POOL    # pylint: disable=global-statement
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ResourcePool()
+            atexit.register(_POOL.teardown)
+        return _POOL
+
+
+def acquire_keypair(manager):
+    """Get the keypair shared by the scenarios."""
+    return get_pool().acquire(
+        KEYPAIR, manager,
+        functools.partial(manager.create_keypair,
+                          name=util.rand_name(SHARED_NAME)))
+
+
+def _create_security_group(manager, rulesets):
+    name = util.rand_name(SHARED_NAME)
+    secgroup = manager.security_groups_client.create_security_group(
+        name=name, description=name + " description")['security_group']
+    util.run_concurrently(
+        [functools.partial(manager.create_security_group_rule,
+                           secgroup['id'], **ruleset)
+         for ruleset in rulesets],
+        workers=CONFIG.argus.api_workers,
+        retry_count=CONFIG.argus.retry_count,
+        retry_delay=CONFIG.argus.retry_delay,
+        retry_on=api_manager.TRANSIENT_ERRORS)
+    return secgroup
+
+
+def acquire_security_group(manager, rulesets):
+    """Get the security group shared by the scenarios.
+
+    :param rulesets:
+        The rules of the security group, used when it is created.
+    """
+    return get_pool().acquire(
+        SECURITY_GROUP, manager,
+        functools.partial(_create_security_group, manager, rulesets))
+
+
+def release(kind, manager):
+    """Stop using the shared resource of the given kind."""
+    get_pool().release(kind, manager)
@@ -15,18 +15,24 @@
 
 import abc
 import base64
+import functools
 
 import six
 
 from argus.backends import base as base_backend
+from argus.backends.tempest import golden_image
 from argus.backends.tempest import manager as api_manager
+from argus.backends.tempest import resource_pool
+from argus.backends.tempest import warm_pool
+from argus.backends import waiters
 from argus.backends import windows
+from argus import checkpoint
 from argus import config as argus_config
 from argus import log as argus_log
 from argus import util
 
 with util.restore_excepthook():
-    from tempest.common import waiters
+    from tempest.lib import exceptions as lib_exceptions
 
 
 CONFIG = argus_config.CONFIG
@@ -35,6 +41,44 @@ LOG = argus_log.LOG
 # Starting size as number of lines and tolerance.
 OUTPUT_SIZE = 128
 
+SECURITY_GROUP_RULESETS = (
+    {
+        # HTTP RDP
+        'ip_protocol': 'tcp',
+        'from_port': 3389,
+        'to_port': 3389,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # HTTP WINRM
+        'ip_protocol': 'tcp',
+        'from_port': 5985,
+        'to_port': 5985,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # HTTPS WINRM
+        'ip_protocol': 'tcp',
+        'from_port': 5986,
+        'to_port': 5986,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # ssh
+        'ip_protocol': 'tcp',
+        'from_port': 22,
+        'to_port': 22,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # ping
+        'ip_protocol': 'icmp',
+        'from_port': -1,
+        'to_port': -1,
+        'cidr': '0.0.0.0/0',
+    },
+)
+
 
 # pylint: disable=abstract-method
 @six.add_metaclass(abc.ABCMeta)
@@ -71,6 +115,7 @@ class BaseTempestBackend(base_backend.CloudBackend):
         self._keypair = None
         self._security_group = None
         self._security_groups_rules = []
+        self._shared_resources = []
         self._subnets = []
         self._routers = []
         self._floating_ip = None
@@ -100,6 +145,26 @@ class BaseTempestBackend(base_backend.CloudBackend):
             self._manager.servers_client, server['server']['id'], wait_until)
         return server['server']
 
+    def _get_warm_server(self):
+        """Get an instance booted ahead by the warm pool, if possible."""
+        if (not warm_pool.is_enabled() or self.userdata or
+                self.metadata or self._networks):
+            return None
+
+        boot_kwargs = {
+            "imageRef": self.image_ref,
+            "flavorRef": self.flavor_ref,
+            "key_name": self._keypair.name,
+            "disk_config": "AUTO",
+            "networks": [{"uuid": self.__get_id_tenant_network}],
+        }
+        if self._availability_zone:
+            boot_kwargs["availability_zone"] = self._availability_zone
+        server = warm_pool.get_pool(self._manager, boot_kwargs).get()
+        if server:
+            LOG.info("Using the warm instance %s.", server['id'])
+        return server
+
     def _assign_floating_ip(self):
         floating_ip = self._manager.floating_ips_client.create_floating_ip()
         floating_ip = floating_ip['floating_ip']
@@ -118,61 +183,72 @@ class BaseTempestBackend(base_backend.CloudBackend):
         return self._manager.primary_credentials().network["id"]
 
     def _add_security_group_exceptions(self, secgroup_id):
-        _client = self._manager.security_group_rules_client
-        rulesets = [
-            {
-                # HTTP RDP
-                'ip_protocol': 'tcp',
-                'from_port': 3389,
-                'to_port': 3389,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # HTTP WINRM
-                'ip_protocol': 'tcp',
-                'from_port': 5985,
-                'to_port': 5985,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # HTTPS WINRM
-                'ip_protocol': 'tcp',
-                'from_port': 5986,
-                'to_port': 5986,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # ssh
-                'ip_protocol': 'tcp',
-                'from_port': 22,
-                'to_port': 22,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # ping
-                'ip_protocol': 'icmp',
-                'from_port': -1,
-                'to_port': -1,
-                'cidr': '0.0.0.0/0',
-            },
-        ]
-        for ruleset in rulesets:
-            sg_rule = _client.create_security_group_rule(
-                parent_group_id=secgroup_id, **ruleset)['security_group_rule']
-            yield sg_rule
+        """Get the actions which create the security group rules."""
+        return [functools.partial(self._manager.create_security_group_rule,
+                                  secgroup_id, **ruleset)
+                for ruleset in SECURITY_GROUP_RULESETS]
+
+    @staticmethod
+    def _run_api_calls(actions):
+        """Run the given API calls concurrently.
+
+        Each call is retried only for the transient errors.
+        """
+        return util.run_concurrently(
+            actions, workers=CONFIG.argus.api_workers,
+            retry_count=CONFIG.argus.retry_count,
+            retry_delay=CONFIG.argus.retry_delay,
+            retry_on=api_manager.TRANSIENT_ERRORS)
+
+    @staticmethod
+    def _ignore_not_found(action):
+        """Make a deletion succeed when the resource is already gone.
+
+        A retried deletion might find out that the previous
+        attempt succeeded after all.
+        """
+        def _action():
+            try:
+                return action()
+            except lib_exceptions.NotFound:
+                LOG.debug("The resource was already deleted by %r.", action)
+        return _action
+
+    def _create_keypair(self):
+        if resource_pool.is_enabled():
+            keypair = resource_pool.acquire_keypair(self._manager)
+            self._shared_resources.append(resource_pool.KEYPAIR)
+            return keypair
+        return self._manager.create_keypair(name=self.__class__.__name__)
+
+    def _use_shared_security_group(self):
+        secgroup = resource_pool.acquire_security_group(
+            self._manager, SECURITY_GROUP_RULESETS)
+        self._shared_resources.append(resource_pool.SECURITY_GROUP)
+        self._manager.servers_client.add_security_group(
+            server_id=self.internal_instance_id(),
+            name=secgroup['name'])
+        return secgroup
 
     def _create_security_groups(self):
+        if resource_pool.is_enabled():
+            return self._use_shared_security_group()
+
         sg_name = util.rand_name(self.__class__.__name__)
         sg_desc = sg_name + " description"
         secgroup = self._manager.security_groups_client.create_security_group(
             name=sg_name, description=sg_desc)['security_group']
 
-        # Add rules to the security group.
-        for rule in self._add_security_group_exceptions(secgroup['id']):
-            self._security_groups_rules.append(rule['id'])
-        self._manager.servers_client.add_security_group(
+        # Add rules to the security group and the group to the server,
+        # at the same time.
+        actions = self._add_security_group_exceptions(secgroup['id'])
+        actions.append(functools.partial(
+            self._manager.servers_client.add_security_group,
             server_id=self.internal_instance_id(),
-            name=secgroup['name'])
+            name=secgroup['name']))
+        results = self._run_api_calls(actions)
+        for rule in results[:-1]:
+            self._security_groups_rules.append(rule['id'])
         return secgroup
 
     def cleanup(self):
@@ -185,15 +261,24 @@ class BaseTempestBackend(base_backend.CloudBackend):
 
         LOG.info("Cleaning up...")
 
-        if self._security_groups_rules:
-            for rule in self._security_groups_rules:
-                (self._manager.security_group_rules_client.
-                 delete_security_group_rule(rule))
-
+        actions = [
+            self._ignore_not_found(functools.partial(
+                self._manager.security_group_rules_client.
+                delete_security_group_rule, rule))
+            for rule in self._security_groups_rules
+        ]
         if self._security_group:
-            self._manager.servers_client.remove_security_group(
+            actions.append(functools.partial(
+                self._manager.servers_client.remove_security_group,
                 server_id=self.internal_instance_id(),
-                name=self._security_group['name'])
+                name=self._security_group['name']))
+        try:
+            self._run_api_calls(actions)
+        except Exception as exc:  # pylint: disable=broad-except
+            # The rules don't outlive their security group, so
+            # they shouldn't prevent deleting the instance.
+            LOG.warning("Could not delete the security group rules: %s",
+                        exc)
 
         if self._server:
             self._manager.servers_client.delete_server(
@@ -206,19 +291,92 @@ class BaseTempestBackend(base_backend.CloudBackend):
             self._manager.floating_ips_client.delete_floating_ip(
                 self._floating_ip['id'])
 
-        if self._keypair:
+        # The back-ends which don't call __init__ share nothing.
+        shared_resources = getattr(self, "_shared_resources", ())
+        if (self._keypair and
+                resource_pool.KEYPAIR not in shared_resources):
             self._keypair.destroy()
+        for kind in shared_resources:
+            resource_pool.release(kind, self._manager)
+        self._shared_resources = []
 
         self._manager.cleanup_credentials()
 
+    def _reuse_instance(self):
+        """Try to reuse the instance preserved by a previous run.
+
+        The instance is found in the checkpoints journal of the current
+        scenario and it is reused only if it is still active.
+        """
+        journal = checkpoint.get_journal()
+        resources = journal.resources
+        if not journal.instance or not resources.get("floating_ip"):
+            return False
+
+        try:
+            server = self._manager.servers_client.show_server(
+                journal.instance)['server']
+        except lib_exceptions.NotFound:
+            LOG.info("The preserved instance %s no longer exists.",
+                     journal.instance)
+            return False
+        if server['status'] != 'ACTIVE':
+            LOG.info("The preserved instance %s is %s, it can't be reused.",
+                     journal.instance, server['status'])
+            return False
+
+        LOG.info("Reusing the preserved instance %s.", server['id'])
+        self._server = server
+        self._floating_ip = resources["floating_ip"]
+        if resources.get("keypair"):
+            self._keypair = api_manager.Keypair(manager=self._manager,
+                                                **resources["keypair"])
+        return True
+
+    def _record_instance(self):
+        """Start the checkpoints journal for the new instance."""
+        resources = {"floating_ip": self._floating_ip}
+        if self._keypair:
+            resources["keypair"] = {
+                "name": self._keypair.name,
+                "public_key": self._keypair.public_key,
+                "private_key": self._keypair.private_key,
+            }
+        checkpoint.get_journal().start(self.internal_instance_id(),
+                                       resources=resources)
+
+    def _golden_image_cache(self):
+        return golden_image.GoldenImageCache(
+            self._manager.compute_images_client,
+            self._manager.servers_client)
+
+    def _use_golden_image(self):
+        """Boot from the golden image of the current installation, if any."""
+        name = golden_image.golden_image_name(CONFIG.openstack.image_ref)
+        image_id = self._golden_image_cache().find(name)
+        if image_id:
+            LOG.info("Booting from the golden image %s.", name)
+            self.image_ref = image_id
+            self.from_golden_image = True
+
+    def create_golden_image(self):
+        """Snapshot the instance into the golden image of its installation."""
+        name = golden_image.golden_image_name(CONFIG.openstack.image_ref)
+        return self._golden_image_cache().create(
+            self.internal_instance_id(), name)
+
     def setup_instance(self):
         # pylint: disable=attribute-defined-outside-init
+        if checkpoint.is_enabled() and self._reuse_instance():
+            return
+        if CONFIG.argus.golden_image:
+            self._use_golden_image()
+
         LOG.info("Creating server...")
 
         self._configure_networking()
-        self._keypair = self._manager.create_keypair(
-            name=self.__class__.__name__)
-        self._server = self._create_server(
+        self._keypair = self._create_keypair()
+        self._server = self._get_warm_server() or self._create_server(
             wait_until='ACTIVE',
             key_name=self._keypair.name,
             disk_config='AUTO',
@@ -229,6 +387,8 @@ class BaseTempestBackend(base_backend.CloudBackend):
             availability_zone=self._availability_zone)
         self._floating_ip = self._assign_floating_ip()
         self._security_group = self._create_security_groups()
+        if checkpoint.is_enabled():
+            self._record_instance()
 
     def reboot_instance(self):
         # Delegate to the manager to reboot the instance
@@ -248,6 +408,11 @@ class BaseTempestBackend(base_backend.CloudBackend):
             self.internal_instance_id(),
             limit)
 
+    def follow_instance_output(self):
+        """Get the console output written since the previous call."""
+        return self._manager.follow_instance_output(
+            self.internal_instance_id())
+
     def instance_server(self):
         """Get the instance server object."""
         return self._manager.instance_server(self.internal_instance_id())
@@ -0,0 +1,310 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Boot instances ahead of the scenarios which need them.
+
+A warm pool keeps a number of instances booted from the same image and
+flavor, ready to be handed to the scenarios as they start, so that the
+scenarios don't wait for their instances to boot. Since the user-data,
+the metadata and the networks are given when an instance is booted,
+only the scenarios without their own can use these instances.
+
+The instances are booted with the keypair shared by the scenarios,
+which means that the warm pool requires the shared resources.
+
+When the number of scenarios is known, such as when they are run
+by the scenario scheduler, the pools stop booting instances once
+every scenario claimed its instance.
+"""
+
+import atexit
+import collections
+import threading
+import time
+
+from argus.backends.tempest import resource_pool
+from argus.backends import waiters
+from argus import config as argus_config
+from argus import log as argus_log
+from argus import util
+
+with util.restore_excepthook():
+    from tempest.lib import exceptions as lib_exceptions
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+WARM_NAME = "argus-warm"
+# The number of seconds between two checks for expired instances.
+CHECK_INTERVAL = 30
+# The number of seconds the shutdown waits for the instances
+# which are still booting.
+SHUTDOWN_TIMEOUT = 60
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+# The number of instances which will still be claimed,
+# or None if it isn't known.
+_EXPECTED_CLAIMS = None
+
+__all__ = (
+    'WarmPool',
+    'expect_claims',
+    'get_pool',
+    'is_enabled',
+)
+
+
+def is_enabled():
+    """Check if the instances should be booted ahead."""
+    return CONFIG.argus.warm_pool_size > 0 and resource_pool.is_enabled()
+
+
+class WarmPool(object):
+    """Instances booted ahead of the demand.
+
+    A background thread boots new instances whenever there are fewer
+    than `size` of them, either ready or booting. The instances which
+    were ready for more than `ttl` seconds are deleted and replaced.
+    No more instances are booted than the ones which will be claimed,
+    when their number is known.
+
+    :param servers_client: The compute client for the servers.
+    :param boot_kwargs:
+        The arguments for creating the servers, such as the image,
+        the flavor and the keypair.
+    :param size: The number of instances kept ready.
+    :param ttl: The number of seconds an instance is kept ready.
+    :param claims:
+        The number of instances which will be claimed at most,
+        or None if it isn't known.
+    """
+
+    def __init__(self, servers_client, boot_kwargs, size, ttl, claims=None):
+        self._servers_client = servers_client
+        self._boot_kwargs = boot_kwargs
+        self._size = size
+        self._ttl = ttl
+        self._claims = claims
+        self._ready = collections.deque()
+        self._booting = 0
+        # The servers which were created, but which aren't ready yet.
+        self._pending = {}
+        self._boot_threads = []
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def ready(self):
+        """The number of instances ready to be handed out."""
+        with self._condition:
+            return len(self._ready)
+
+    def expect_claims(self, claims):
+        """Set the number of instances which will be claimed at most.
+
+        :param claims: The number of claims, or None if it isn't known.
+        """
+        with self._condition:
+            self._claims = claims
+            self._condition.notify_all()
+
+    def start(self):
+        """Start booting the instances in the background."""
+        self._thread = threading.Thread(target=self._refill)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _delete(self, server):
+        try:
+            self._servers_client.delete_server(server["id"])
+        except lib_exceptions.NotFound:
+            pass
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.warning("Could not delete the warm instance %s: %s",
+                        server["id"], exc)
+
+    def _boot(self):
+        server = self._servers_client.create_server(
+            name=util.rand_name(WARM_NAME) + "-instance",
+            **self._boot_kwargs)["server"]
+        with self._condition:
+            stopped = self._stopped
+            if not stopped:
+                # The shutdown deletes the servers which are still booting.
+                self._pending[server["id"]] = server
+        if stopped:
+            self._delete(server)
+            return None
+        try:
+            waiters.wait_for_server_status(
+                self._servers_client, server["id"], "ACTIVE")
+        except Exception:
+            with self._condition:
+                # Unless the shutdown already deleted it.
+                owned = self._pending.pop(server["id"], None)
+            if owned:
+                self._delete(server)
+            raise
+        with self._condition:
+            self._pending.pop(server["id"], None)
+        return server
+
+    def _boot_one(self):
+        try:
+            server = self._boot()
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.warning("Could not boot a warm instance: %s", exc)
+            server = None
+            if not self._stopped:
+                # Don't retry right away, the failure might persist.
+                time.sleep(CONFIG.argus.retry_delay)
+
+        with self._condition:
+            self._booting -= 1
+            if server and not self._stopped:
+                LOG.debug("The warm instance %s is ready.", server["id"])
+                self._ready.append((time.time(), server))
+                server = None
+            self._condition.notify_all()
+        if server:
+            self._delete(server)
+
+    def _pop_expired(self):
+        deadline = time.time() - self._ttl
+        expired = []
+        while self._ready and self._ready[0][0] < deadline:
+            expired.append(self._ready.popleft()[1])
+        return expired
+
+    def _refill(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                expired = self._pop_expired()
+                size = self._size
+                if self._claims is not None:
+                    size = min(size, self._claims)
+                missing = size - len(self._ready) - self._booting
+                if not expired and missing <= 0:
+                    self._condition.wait(CHECK_INTERVAL)
+                    continue
+                missing = max(missing, 0)
+                self._booting += missing
+
+            for server in expired:
+                LOG.debug("The warm instance %s expired.", server["id"])
+                self._delete(server)
+            for _ in range(missing):
+                thread = threading.Thread(target=self._boot_one)
+                thread.daemon = True
+                with self._condition:
+                    self._boot_threads = [
+                        boot_thread for boot_thread in self._boot_threads
+                        if boot_thread.is_alive()]
+                    self._boot_threads.append(thread)
+                thread.start()
+
+    def get(self):
+        """Get a ready instance, if any.
+
+        If no instance is ready, but some are booting, the first one
+        which becomes ready is returned.
+
+        :returns: The server of the instance or None.
+        """
+        expired = []
+        with self._condition:
+            while True:
+                expired.extend(self._pop_expired())
+                if self._ready or not self._booting:
+                    break
+                self._condition.wait()
+            server = self._ready.popleft()[1] if self._ready else None
+            if server and self._claims is not None:
+                self._claims = max(self._claims - 1, 0)
+            self._condition.notify_all()
+
+        for expired_server in expired:
+            self._delete(expired_server)
+        return server
+
+    def shutdown(self):
+        """Stop booting instances and delete the unclaimed ones.
+
+        The instances which are still booting are deleted as well,
+        waiting at most `SHUTDOWN_TIMEOUT` seconds for the ones
+        which are being created.
+        """
+        with self._condition:
+            self._stopped = True
+            servers = [server for _, server in self._ready]
+            servers.extend(self._pending.values())
+            self._ready.clear()
+            self._pending.clear()
+            threads = list(self._boot_threads)
+            self._condition.notify_all()
+        for server in servers:
+            self._delete(server)
+
+        # The boot threads delete the servers which they create
+        # after the pool was stopped.
+        deadline = time.time() + SHUTDOWN_TIMEOUT
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+            if thread.is_alive():
+                LOG.warning("A warm instance is still booting, "
+                            "it might not be deleted.")
+                break
+
+
+def expect_claims(claims):
+    """Set the number of instances which will be claimed at most.
+
+    The pools, including the ones created later, don't boot
+    more instances than the ones which will be claimed.
+
+    :param claims: The number of claims, or None if it isn't known.
+    """
+    global _EXPECTED_CLAIMS  # pylint: disable=global-statement
+    with _POOLS_LOCK:
+        _EXPECTED_CLAIMS = claims
+        pools = list(_POOLS.values())
+    for pool in pools:
+        pool.expect_claims(claims)
+
+
+def get_pool(manager, boot_kwargs):
+    """Get the warm pool for the given boot arguments.
+
+    The pool is started on its first use and it is shut down
+    when the process exits.
+    """
+    key = (resource_pool.credentials_key(manager),
+           tuple(sorted((name, repr(value))
+                        for name, value in boot_kwargs.items())))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = WarmPool(manager.servers_client, boot_kwargs,
+                            size=CONFIG.argus.warm_pool_size,
+                            ttl=CONFIG.argus.warm_pool_ttl,
+                            claims=_EXPECTED_CLAIMS)
+            pool.start()
+            atexit.register(pool.shutdown)
+            _POOLS[key] = pool
+        return pool
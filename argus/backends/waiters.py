@@ -0,0 +1,319 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Wait for the instances to reach a given status.
+
+The status of the instances is polled often right after something
+happens to them and less often while nothing changes. The servers
+awaited by a process are watched by a single poller for each compute
+client, which lists all of them with one API call, instead of showing
+each of them separately. After the first listing, only the servers
+changed since the previous one are listed. When the status cache
+is enabled, the listings are shared with the other processes of the
+run as well, see :mod:`argus.backends.status_cache`.
+"""
+
+import collections
+import threading
+import time
+import weakref
+
+from argus.backends import status_cache
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+from argus import util
+
+with util.restore_excepthook():
+    from tempest.lib import exceptions as lib_exceptions
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+DELETED = "DELETED"
+ERROR = "ERROR"
+TASK_STATE = "OS-EXT-STS:task_state"
+
+_POLLERS = weakref.WeakKeyDictionary()
+_POLLERS_LOCK = threading.Lock()
+
+__all__ = (
+    'ServerPoller',
+    'backoff',
+    'get_poller',
+    'wait_for_server_status',
+    'wait_for_server_termination',
+    'wait_until',
+)
+
+
+def backoff(initial=None, maximum=None, factor=2):
+    """Generate the delays between two polls.
+
+    The delays start from `initial` and grow by `factor` every time,
+    up to `maximum` seconds. If not given, the values from the
+    configuration are used.
+    """
+    delay = CONFIG.argus.poll_interval if initial is None else initial
+    if maximum is None:
+        maximum = CONFIG.argus.max_poll_interval
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
+def wait_until(check, timeout, initial=None, maximum=None,
+               message="The operation did not finish in time."):
+    """Call `check` until it returns something else than None.
+
+    The calls are spaced with the delays given by :func:`backoff`.
+
+    :returns: The value returned by `check`.
+    :raises: :class:`argus.exceptions.ArgusTimeoutError`
+        if `check` keeps returning None for `timeout` seconds.
+    """
+    deadline = time.time() + timeout
+    for delay in backoff(initial, maximum):
+        result = check()
+        if result is not None:
+            return result
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise exceptions.ArgusTimeoutError(message)
+        time.sleep(min(delay, remaining))
+
+
+def _newer(first, second):
+    """Get the most recently updated of the given server bodies.
+
+    The bodies without an update time, such as the ones of the
+    deleted servers, are considered the most recent.
+    """
+    if (first is None or "updated" not in second or
+            second["updated"] >= first.get("updated", "")):
+        return second
+    return first
+
+
+class ServerPoller(object):
+    """Watch the status of many servers with a single API call.
+
+    A background thread lists the servers while at least one of them
+    is awaited. The delay between two listings grows while none of
+    the awaited servers changes and it is reset when one of them
+    changes or when a new one is awaited.
+
+    :param servers_client: The compute client for the servers.
+    :param cache:
+        The :class:`argus.backends.status_cache.StatusCache` which
+        shares the listings with the other processes, if any.
+    """
+
+    def __init__(self, servers_client, cache=None):
+        self._servers_client = servers_client
+        self._cache = cache
+        self._condition = threading.Condition()
+        self._servers = {}
+        self._watchers = collections.Counter()
+        self._changes_since = None
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _show(self, server_id):
+        try:
+            return self._servers_client.show_server(server_id)["server"]
+        except lib_exceptions.NotFound:
+            return {"id": server_id, "status": DELETED}
+
+    def _list(self, max_age=None):
+        if self._cache:
+            # The cached listing might be older than the watched
+            # servers, so the missing servers can't be considered
+            # deleted.
+            return self._cache.list_servers(self._servers_client, max_age)
+
+        params = {}
+        if self._changes_since:
+            params["changes-since"] = self._changes_since
+        # Only the servers watched before the listing started
+        # are expected to be listed.
+        with self._condition:
+            watched = set(self._watchers)
+        servers = self._servers_client.list_servers(
+            detail=True, **params)["servers"]
+        if not params:
+            # The servers missing from a full listing were deleted.
+            listed = set(server["id"] for server in servers)
+            servers.extend({"id": server_id, "status": DELETED}
+                           for server_id in watched
+                           if server_id not in listed)
+        return servers
+
+    def _poll(self, max_age=None):
+        """List the servers and check if any awaited server changed.
+
+        :param max_age:
+            The age of a shared listing recent enough to be used.
+        """
+        servers = self._list(max_age)
+        changed = False
+        with self._condition:
+            for server in servers:
+                updated = server.get("updated")
+                if updated and updated > (self._changes_since or ""):
+                    self._changes_since = updated
+                if server["id"] not in self._watchers:
+                    continue
+                previous = self._servers.get(server["id"])
+                current = _newer(previous, server)
+                if previous is None or (
+                        (previous["status"], previous.get(TASK_STATE)) !=
+                        (current["status"], current.get(TASK_STATE))):
+                    changed = True
+                self._servers[server["id"]] = current
+            self._condition.notify_all()
+        return changed
+
+    def _run(self):
+        delays = backoff()
+        delay = CONFIG.argus.poll_interval
+        while True:
+            try:
+                # A listing made since the previous poll is recent
+                # enough, whoever made it.
+                if self._poll(delay):
+                    delays = backoff()
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG.warning("Could not list the servers: %s", exc)
+
+            delay = next(delays)
+            if self._wakeup.wait(delay):
+                self._wakeup.clear()
+                delays = backoff()
+                delay = CONFIG.argus.poll_interval
+            with self._condition:
+                if not self._watchers:
+                    self._thread = None
+                    return
+
+    def _watch(self, server_id):
+        with self._condition:
+            self._watchers[server_id] += 1
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                self._wakeup.clear()
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+        # The changes made before the server is watched might not be
+        # listed anymore, so its current state is shown once.
+        server = self._show(server_id)
+        with self._condition:
+            self._servers[server_id] = _newer(
+                self._servers.get(server_id), server)
+            self._condition.notify_all()
+
+    def _unwatch(self, server_id):
+        with self._condition:
+            self._watchers[server_id] -= 1
+            if self._watchers[server_id] <= 0:
+                del self._watchers[server_id]
+                self._servers.pop(server_id, None)
+                if not self._watchers:
+                    self._wakeup.set()
+            self._condition.notify_all()
+
+    def wait_for(self, server_id, check, timeout):
+        """Wait until `check` accepts the server.
+
+        :param check:
+            A callable which receives the body of the server and
+            returns True when the waiting is over. It can raise an
+            exception for stopping the waiting.
+        :returns: The body of the server.
+        """
+        deadline = time.time() + timeout
+        self._watch(server_id)
+        try:
+            with self._condition:
+                while True:
+                    server = self._servers.get(server_id)
+                    if server is not None and check(server):
+                        return server
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise exceptions.ArgusTimeoutError(
+                            "The server {} is still {} after {} seconds."
+                            .format(server_id, server and server["status"],
+                                    timeout))
+                    self._condition.wait(remaining)
+        finally:
+            self._unwatch(server_id)
+
+
+def get_poller(servers_client):
+    """Get the poller of the given compute client."""
+    with _POLLERS_LOCK:
+        poller = _POLLERS.get(servers_client)
+        if poller is None:
+            cache = None
+            if status_cache.is_enabled():
+                cache = status_cache.get_cache(servers_client)
+            poller = _POLLERS[servers_client] = ServerPoller(
+                servers_client, cache)
+        return poller
+
+
+def wait_for_server_status(servers_client, server_id, status):
+    """Wait for a server to reach the given status.
+
+    The server is ready when it has the given status
+    and no task in progress.
+
+    :returns: The body of the server.
+    :raises: :class:`argus.exceptions.ArgusError`
+        if the server goes in error or if it is deleted.
+    """
+    def _check(server):
+        if server["status"] == status:
+            return server.get(TASK_STATE) is None
+        if server["status"] in (ERROR, DELETED):
+            raise exceptions.ArgusError(
+                "The server {} is {} instead of {}: {}".format(
+                    server_id, server["status"], status,
+                    server.get("fault", "no details")))
+        return False
+
+    return get_poller(servers_client).wait_for(
+        server_id, _check, servers_client.build_timeout)
+
+
+def wait_for_server_termination(servers_client, server_id):
+    """Wait for a server to be deleted.
+
+    :raises: :class:`argus.exceptions.ArgusError`
+        if the server goes in error.
+    """
+    def _check(server):
+        if server["status"] == ERROR:
+            raise exceptions.ArgusError(
+                "The server {} failed to be deleted: {}".format(
+                    server_id, server.get("fault", "no details")))
+        return server["status"] == DELETED
+
+    get_poller(servers_client).wait_for(
+        server_id, _check, servers_client.build_timeout)
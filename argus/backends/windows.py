@@ -33,9 +33,9 @@ class WindowsBackendMixin(object):
             username = CONFIG.openstack.image_username
         if password is None:
             password = CONFIG.openstack.image_password
-        return windows.WinRemoteClient(self.floating_ip(),
-                                       username, password,
-                                       transport_protocol=protocol)
+        return windows.get_remote_client(self.floating_ip(),
+                                         username, password,
+                                         transport_protocol=protocol)
 
     remote_client = util.cached_property(get_remote_client, 'remote_client')
 
@@ -0,0 +1,141 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Keep track of the preparation progress of the preserved instances.
+
+When the instances aren't deleted after a scenario, a local journal
+records the instance used by the scenario and the recipe steps
+which were finished on it. A later run of the same scenario can
+use the journal to reuse the instance and to skip those steps.
+"""
+
+import json
+import os
+import threading
+
+from argus import config as argus_config
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+JOURNAL_EXTENSION = ".checkpoints"
+
+__all__ = (
+    'Journal',
+    'get_journal',
+    'is_enabled',
+    'journal_path',
+)
+
+
+def is_enabled():
+    """Check if the checkpoints should be recorded.
+
+    The checkpoints are useful only for the preserved instances.
+    """
+    return not CONFIG.argus.delete_instance
+
+
+def journal_path(scenario=None):
+    """Get the path of the journal of the given scenario.
+
+    If no scenario is given, the current one will be used.
+    """
+    directory = CONFIG.argus.output_directory or os.getcwd()
+    scenario = scenario or argus_log.get_log_extra_item(LOG, 'scenario')
+    return os.path.join(directory, scenario + JOURNAL_EXTENSION)
+
+
+class Journal(object):
+    """The checkpoints of a scenario, stored as a JSON file.
+
+    Besides the finished steps, the journal holds the identifier of
+    the instance and the resources a back-end needs for reusing it.
+    Since these might include the private key of the instance, the
+    file is readable only by its owner.
+
+    :param path:
+        The file where the journal is stored. If it already exists,
+        its content is loaded.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._data = {"instance": None, "resources": {}, "steps": []}
+        if os.path.isfile(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self._path) as stream:
+                self._data.update(json.load(stream))
+        except ValueError as exc:
+            LOG.warning("Ignoring the invalid journal %s: %s",
+                        self._path, exc)
+
+    def _save(self):
+        temporary_path = self._path + ".tmp"
+        descriptor = os.open(temporary_path,
+                             os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w") as stream:
+            json.dump(self._data, stream, indent=2, sort_keys=True)
+        os.rename(temporary_path, self._path)
+
+    @property
+    def path(self):
+        """The file where the journal is stored."""
+        return self._path
+
+    @property
+    def instance(self):
+        """The identifier of the instance, if any was recorded."""
+        return self._data["instance"]
+
+    @property
+    def resources(self):
+        """The back-end resources recorded with the instance."""
+        return dict(self._data["resources"])
+
+    @property
+    def steps(self):
+        """The finished steps, in the order they were recorded."""
+        return list(self._data["steps"])
+
+    def start(self, instance, resources=None):
+        """Start a new journal for the given instance.
+
+        The previously recorded steps are forgotten.
+        """
+        with self._lock:
+            self._data = {
+                "instance": instance,
+                "resources": resources or {},
+                "steps": [],
+            }
+            self._save()
+
+    def add_step(self, name):
+        """Record that the given step was finished."""
+        with self._lock:
+            if name not in self._data["steps"]:
+                self._data["steps"].append(name)
+                self._save()
+
+
+def get_journal(scenario=None):
+    """Get the journal of the given scenario, or of the current one."""
+    return Journal(journal_path(scenario))
@@ -0,0 +1,234 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Record and replay transcripts of remote commands.
+
+A transcript maps the commands sent to an instance to the output
+they produced, which makes it possible to answer the same commands
+later on, without having a live instance.
+"""
+
+import collections
+import hashlib
+import importlib
+import json
+import os
+import threading
+
+import six
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+RECORD = "record"
+REPLAY = "replay"
+TRANSCRIPT_EXTENSION = ".transcript"
+# The command type under which the values of the back-end are stored.
+VALUE = "value"
+
+# The number of characters from a command kept for debugging purposes.
+PREVIEW_SIZE = 120
+
+_TRANSCRIPTS = {}
+_TRANSCRIPTS_LOCK = threading.Lock()
+
+
+def _to_text(value):
+    if isinstance(value, six.binary_type):
+        return value.decode("utf-8", "replace")
+    return value
+
+
+def command_key(commands, command_type):
+    """Get the key under which the output of `commands` is stored.
+
+    :param commands:
+        A list of commands which are executed in the same shell.
+    :param command_type:
+        The type of the commands, as found in :mod:`argus.util`.
+    """
+    data = u"\x00".join([six.text_type(command_type)] +
+                        [_to_text(command) for command in commands])
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _get_exception_class(name):
+    module_name, _, class_name = name.rpartition(".")
+    try:
+        module = importlib.import_module(module_name)
+        return getattr(module, class_name)
+    except (ImportError, AttributeError, ValueError):
+        return exceptions.ArgusError
+
+
+def _build_exception(name, message):
+    exc_class = _get_exception_class(name)
+    try:
+        return exc_class(message)
+    except TypeError:
+        # Some exceptions have a custom signature, just bypass it.
+        exc = exc_class.__new__(exc_class)
+        exc.args = (message, )
+        return exc
+
+
+class Transcript(object):
+    """An indexed collection of command outputs.
+
+    The transcript is stored as JSON lines, each line holding the
+    output of a batch of commands, keyed by the hash of the commands
+    and of their type. Outputs recorded for the same commands are
+    replayed in their recording order, while the last one is repeated
+    once they are exhausted, so that polling commands still converge.
+
+    :param path:
+        The file where the transcript is stored. If it already exists,
+        its content is loaded.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._index = collections.defaultdict(list)
+        self._cursors = collections.Counter()
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            self._load()
+
+    @property
+    def path(self):
+        """The file where the transcript is stored."""
+        return self._path
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def _load(self):
+        with open(self._path) as stream:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    self._index[entry["key"]].append(entry["output"])
+        LOG.debug("Loaded %d commands from the transcript %s.",
+                  len(self._index), self._path)
+
+    def record(self, commands, command_type, results=None, error=None):
+        """Store the outcome of running the given `commands`.
+
+        :param results:
+            A list of (stdout, stderr, exit_code) tuples, one for
+            each command.
+        :param error:
+            The exception raised while running the commands, if any.
+        """
+        key = command_key(commands, command_type)
+        if error is not None:
+            error_class = type(error)
+            output = {
+                "error": "{}.{}".format(error_class.__module__,
+                                        error_class.__name__),
+                "message": six.text_type(error),
+            }
+        else:
+            output = {
+                "results": [[_to_text(stdout), _to_text(stderr), exit_code]
+                            for stdout, stderr, exit_code in results],
+            }
+        self._append(key, command_type, commands[0], output)
+
+    def record_value(self, name, value):
+        """Store a value of the back-end, such as its floating IP.
+
+        :param value: The value, which must be serializable.
+        """
+        self._append(command_key([name], VALUE), VALUE, name,
+                     {"value": value})
+
+    def _append(self, key, command_type, preview, output):
+        entry = {
+            "key": key,
+            "type": command_type,
+            "preview": _to_text(preview)[:PREVIEW_SIZE],
+            "output": output,
+        }
+
+        with self._lock:
+            self._index[key].append(output)
+            with open(self._path, "a") as stream:
+                stream.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    def _next_output(self, key, preview):
+        with self._lock:
+            outputs = self._index.get(key)
+            if not outputs:
+                raise exceptions.ArgusTranscriptError(
+                    "No output recorded in {!r} for command {!r}."
+                    .format(self._path, preview[:PREVIEW_SIZE]))
+            position = min(self._cursors[key], len(outputs) - 1)
+            self._cursors[key] += 1
+        return outputs[position]
+
+    def replay(self, commands, command_type):
+        """Return the recorded results for the given `commands`.
+
+        If running the commands raised an exception when they
+        were recorded, the same exception will be raised.
+        """
+        output = self._next_output(command_key(commands, command_type),
+                                   commands[0])
+        if "error" in output:
+            raise _build_exception(output["error"], output["message"])
+        return [tuple(result) for result in output["results"]]
+
+    def replay_value(self, name):
+        """Return the recorded value of the back-end with the given name."""
+        return self._next_output(command_key([name], VALUE), name)["value"]
+
+
+def transcript_path(directory, name):
+    """Get the path of the transcript with the given name."""
+    return os.path.join(directory, name + TRANSCRIPT_EXTENSION)
+
+
+def get_scenario_transcript():
+    """Get the transcript of the current scenario.
+
+    The transcripts are found in the `transcript_directory`, or
+    in the output directory, when it isn't given.
+    """
+    directory = (CONFIG.argus.transcript_directory or
+                 CONFIG.argus.output_directory or os.getcwd())
+    scenario = argus_log.get_log_extra_item(LOG, 'scenario')
+    return get_transcript(transcript_path(directory, scenario))
+
+
+def get_transcript(path):
+    """Get the transcript stored at the given path.
+
+    The transcripts are shared in the current process, so that
+    every client of the same instance advances the same replay
+    positions.
+    """
+    with _TRANSCRIPTS_LOCK:
+        if path not in _TRANSCRIPTS:
+            _TRANSCRIPTS[path] = Transcript(path)
+        return _TRANSCRIPTS[path]
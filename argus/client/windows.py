@@ -16,7 +16,9 @@
 #    under the License.
 
 import base64
+import collections
 import functools
+import hashlib
 
 try:
     import StringIO
@@ -25,6 +27,8 @@ except ImportError:
 
 import multiprocessing
 from multiprocessing import pool
+import sys
+import threading
 import time
 
 import six
@@ -32,9 +36,12 @@ from winrm import protocol
 
 from argus.action_manager.windows import get_windows_action_manager
 from argus.client import base
+from argus.client import transcript
 from argus import config as argus_config
 from argus import exceptions
 from argus import log as argus_log
+from argus import metrics
+from argus import profiler
 from argus import util
 
 
@@ -43,6 +50,21 @@ CONFIG = argus_config.CONFIG
 CODEPAGE_UTF8 = 65001
 THREADS = 1
 BUFFER_SIZE = 1024
+# The length of the scripts sent by `write_files`. Since they are passed
+# UTF-16 and base64 encoded on the command line, this keeps them well
+# under the Windows command line limit of 32767 characters.
+MAX_SCRIPT_SIZE = 8192
+WRITE_CHUNK_SIZE = 4096
+TEMPORARY_SUFFIX = ".argus-tmp"
+# The number of characters of a command kept in its profiling span.
+PROFILED_COMMAND_SIZE = 120
+WRITE_STATS = ("skipped_files", "saved_bytes", "saved_round_trips",
+               "digest_round_trips")
+# The modules whose methods are reported as the callers of the commands.
+CALLER_MODULES = ("argus.action_manager.", "argus.introspection.")
+
+_WRITE_STATS = collections.Counter()
+_WRITE_STATS_LOCK = threading.Lock()
 
 
 def _encode(data):
@@ -52,6 +74,52 @@ def _encode(data):
     return encoded
 
 
+def _record_write_stats(**stats):
+    with _WRITE_STATS_LOCK:
+        _WRITE_STATS.update(stats)
+    for name, value in stats.items():
+        metrics.increment("argus_write_{}_total".format(name), value)
+
+
+def _get_caller():
+    """Get the action manager or introspection method running a command."""
+    frame = sys._getframe(1)  # pylint: disable=protected-access
+    while frame is not None:
+        if frame.f_globals.get("__name__", "").startswith(CALLER_MODULES):
+            name = frame.f_code.co_name
+            instance = frame.f_locals.get("self")
+            if instance is not None:
+                name = "{}.{}".format(type(instance).__name__, name)
+            return name
+        frame = frame.f_back
+    return "unknown"
+
+
+def _command_labels(command_type):
+    """Get the labels of the metrics of a remote command."""
+    return {
+        "command_type": command_type,
+        "caller": _get_caller(),
+        "scenario": argus_log.get_log_extra_item(LOG, 'scenario'),
+    }
+
+
+def get_write_stats():
+    """Get the savings of the writes which skipped the unchanged files.
+
+    :returns:
+        A dictionary with the number of `skipped_files`, the number
+        of `saved_bytes` which weren't transferred, the number of
+        `saved_round_trips` of the writes which weren't needed and
+        the number of `digest_round_trips`, made for retrieving the
+        digests of the remote files.
+    """
+    with _WRITE_STATS_LOCK:
+        stats = dict.fromkeys(WRITE_STATS, 0)
+        stats.update(_WRITE_STATS)
+        return stats
+
+
 def _base64_read_file(filepath, size=BUFFER_SIZE):
     with open(filepath, 'rb') as stream:
         reader = functools.partial(stream.read, size)
@@ -127,15 +195,47 @@ class WinRemoteClient(base.BaseClient):
             thread_pool.terminate()
             protocol_client.cleanup_command(shell_id, command_id)
 
+    def _run_measured_command(self, protocol_client, shell_id, command,
+                              command_type, upper_timeout, labels):
+        """Run a command, recording its metrics with the given labels."""
+        metrics.increment("argus_remote_commands_total", **labels)
+        metrics.increment("argus_remote_bytes_sent_total", len(command),
+                          **labels)
+        start = time.time()
+        try:
+            with profiler.span("run_command", "remote",
+                               command_type=command_type,
+                               command=command[:PROFILED_COMMAND_SIZE]):
+                stdout, stderr, exit_code = self._run_command(
+                    protocol_client, shell_id, command,
+                    command_type, upper_timeout)
+        except exceptions.ArgusTimeoutError:
+            metrics.increment("argus_remote_command_timeouts_total",
+                              **labels)
+            raise
+        except Exception:
+            metrics.increment("argus_remote_command_errors_total", **labels)
+            raise
+        finally:
+            metrics.observe("argus_remote_command_seconds",
+                            time.time() - start, **labels)
+        metrics.increment("argus_remote_bytes_received_total",
+                          len(stdout or "") + len(stderr or ""), **labels)
+        return stdout, stderr, exit_code
+
     def _run_commands(self, commands, commands_type=util.POWERSHELL,
                       upper_timeout=CONFIG.argus.upper_timeout):
+        labels = _command_labels(commands_type)
         protocol_client = self._get_protocol()
-        shell_id = self.exec_with_retry(lambda: (protocol_client.open_shell(
-            codepage=CODEPAGE_UTF8)))
+        with profiler.span("open_shell", "remote"):
+            shell_id = self.exec_with_retry(
+                lambda: (protocol_client.open_shell(codepage=CODEPAGE_UTF8)))
+        metrics.increment("argus_remote_shell_opens_total", **labels)
 
         try:
-            results = [self._run_command(protocol_client, shell_id, command,
-                                         commands_type, upper_timeout)
+            results = [self._run_measured_command(protocol_client, shell_id,
+                                                  command, commands_type,
+                                                  upper_timeout, labels)
                        for command in commands]
         finally:
             protocol_client.close_shell(shell_id)
@@ -210,6 +310,95 @@ class WinRemoteClient(base.BaseClient):
         self._run_commands(commands, commands_type=util.POWERSHELL,
                            upper_timeout=CONFIG.argus.io_upper_timeout)
 
+    @staticmethod
+    def _get_write_scripts(files):
+        """Get the scripts which write the given files atomically."""
+        create_command = ("[System.IO.File]::WriteAllBytes('{path}', "
+                          "[System.Convert]::FromBase64String('{content}'))")
+        append_command = ("$bytes = [System.Convert]::FromBase64String("
+                          "'{content}'); $stream = [System.IO.File]::Open("
+                          "'{path}', 'Append'); $stream.Write($bytes, 0, "
+                          "$bytes.Length); $stream.Close()")
+        move_command = ("Move-Item -Force -Path '{source}' "
+                        "-Destination '{destination}'")
+
+        commands = []
+        moves = []
+        for remote_destination in sorted(files):
+            data = files[remote_destination]
+            temporary_path = remote_destination + TEMPORARY_SUFFIX
+            command = create_command
+            for index in range(0, max(len(data), 1), WRITE_CHUNK_SIZE):
+                chunk = data[index:index + WRITE_CHUNK_SIZE]
+                commands.append(command.format(path=temporary_path,
+                                               content=_encode(chunk)))
+                command = append_command
+            moves.append(move_command.format(source=temporary_path,
+                                             destination=remote_destination))
+        commands.append("; ".join(moves))
+
+        scripts = []
+        for command in commands:
+            if scripts and (len(scripts[-1]) + len(command) + 2 <=
+                            MAX_SCRIPT_SIZE):
+                scripts[-1] = "; ".join((scripts[-1], command))
+            else:
+                scripts.append(command)
+        return ["$ErrorActionPreference = 'Stop'; " + script
+                for script in scripts]
+
+    def _skip_unchanged(self, files):
+        """Get the files whose content differs from the remote one."""
+        remote_digests = self.manager.get_files_sha256(sorted(files))
+        changed = {
+            path: data for path, data in files.items()
+            if hashlib.sha256(data).hexdigest() != remote_digests[path]
+        }
+        unchanged = set(files) - set(changed)
+        if unchanged:
+            LOG.debug("Skipping the unchanged files %s.",
+                      ", ".join(sorted(unchanged)))
+
+        saved_commands = len(self._get_write_scripts(files))
+        if changed:
+            saved_commands -= len(self._get_write_scripts(changed))
+        # The digests are retrieved with an additional command, which
+        # is counted on its own, since the counters never decrease.
+        _record_write_stats(
+            skipped_files=len(unchanged),
+            saved_bytes=sum(len(files[path]) for path in unchanged),
+            saved_round_trips=saved_commands,
+            digest_round_trips=1)
+        return changed
+
+    def write_files(self, files, skip_unchanged=False):
+        """Write atomically the given files in the remote instance.
+
+        Every file is written in a temporary file first, which then
+        replaces the destination, so that a destination never holds
+        partial content. The files are renamed at the same time,
+        after all of them were written. Small files, such as the
+        config files, are written with a single command.
+
+        :param files:
+            A mapping between the remote destinations and the binary
+            data which should be written in them.
+        :param skip_unchanged:
+            Compare the SHA-256 digests of the given data with the ones
+            of the remote files first and write only the files which
+            differ. The savings are recorded in :func:`get_write_stats`.
+        """
+        if skip_unchanged:
+            files = self._skip_unchanged(files)
+            if not files:
+                return
+
+        scripts = self._get_write_scripts(files)
+        LOG.debug("Writing the files %s with %d command(s).",
+                  ", ".join(sorted(files)), len(scripts))
+        self._run_commands(scripts, commands_type=util.POWERSHELL,
+                           upper_timeout=CONFIG.argus.io_upper_timeout)
+
     def read_file(self, filepath):
         """Get the content of the given file."""
         cmd = 'Get-Content "{}"'.format(filepath)
@@ -280,7 +469,10 @@ class WinRemoteClient(base.BaseClient):
                         "Command {!r} failed too many times."
                         .format(cmd))
                 LOG.debug("Retrying '%s'", cmd)
-                time.sleep(delay)
+                metrics.increment("argus_remote_command_retries_total",
+                                  **_command_labels(command_type))
+                with profiler.span("retry_delay", "remote"):
+                    time.sleep(delay)
 
     def run_command_until_condition(self, cmd, cond,
                                     retry_count=CONFIG.argus.retry_count,
@@ -325,8 +517,108 @@ class WinRemoteClient(base.BaseClient):
             if retry_count > 0:
                 retry_count -= 1
                 LOG.debug("Retrying '%s'", cmd)
-                time.sleep(delay)
+                metrics.increment("argus_remote_command_retries_total",
+                                  **_command_labels(command_type))
+                with profiler.span("retry_delay", "remote"):
+                    time.sleep(delay)
             else:
                 raise exceptions.ArgusTimeoutError(
                     "Command {!r} failed too many times."
                     .format(cmd))
+
+
+class RecordingWinRemoteClient(WinRemoteClient):
+    """A remote client which records the output of every command.
+
+    :param transcript:
+        A :class:`argus.client.transcript.Transcript` object, where
+        the outputs are recorded.
+    """
+
+    def __init__(self, hostname, username, password, transcript,
+                 **kwargs):
+        # The action manager is obtained by running commands,
+        # so the transcript is needed from the start.
+        self._transcript = transcript
+        super(RecordingWinRemoteClient, self).__init__(
+            hostname, username, password, **kwargs)
+
+    def _run_commands(self, commands, commands_type=util.POWERSHELL,
+                      upper_timeout=CONFIG.argus.upper_timeout):
+        try:
+            results = super(RecordingWinRemoteClient, self)._run_commands(
+                commands, commands_type, upper_timeout)
+        except Exception as exc:
+            self._transcript.record(commands, commands_type, error=exc)
+            raise
+        self._transcript.record(commands, commands_type, results=results)
+        return results
+
+
+class ReplayWinRemoteClient(WinRemoteClient):
+    """A remote client which answers the commands from a transcript.
+
+    No connection is made to the remote instance, every command
+    gets the output it had when the transcript was recorded.
+
+    :param transcript:
+        A :class:`argus.client.transcript.Transcript` object, from
+        where the outputs are replayed.
+    """
+
+    def __init__(self, hostname, username, password, transcript,
+                 **kwargs):
+        self._transcript = transcript
+        super(ReplayWinRemoteClient, self).__init__(
+            hostname, username, password, **kwargs)
+
+    def _run_commands(self, commands, commands_type=util.POWERSHELL,
+                      upper_timeout=CONFIG.argus.upper_timeout):
+        return self._transcript.replay(commands, commands_type)
+
+    def _get_protocol(self):
+        raise exceptions.ArgusError(
+            "The replay client can't connect to {!r}."
+            .format(self._hostname))
+
+    # The recorded outputs are available right away, so there
+    # is no reason for waiting between the retries.
+    def run_command_with_retry(self, cmd, count=CONFIG.argus.retry_count,
+                               delay=CONFIG.argus.retry_delay,
+                               command_type=util.POWERSHELL,
+                               upper_timeout=CONFIG.argus.upper_timeout):
+        return super(ReplayWinRemoteClient, self).run_command_with_retry(
+            cmd, count=count, delay=0, command_type=command_type,
+            upper_timeout=upper_timeout)
+
+    def run_command_until_condition(self, cmd, cond,
+                                    retry_count=CONFIG.argus.retry_count,
+                                    delay=CONFIG.argus.retry_delay,
+                                    command_type=util.POWERSHELL,
+                                    upper_timeout=CONFIG.argus.upper_timeout):
+        return super(ReplayWinRemoteClient, self).run_command_until_condition(
+            cmd, cond, retry_count=retry_count, delay=0,
+            command_type=command_type, upper_timeout=upper_timeout)
+
+
+def get_remote_client(hostname, username, password, **kwargs):
+    """Get a Windows remote client, according to the transcript mode.
+
+    When `transcript_mode` is set in the config file, the commands
+    are either recorded to or replayed from the transcript of the
+    current scenario, found in the `transcript_directory`.
+    """
+    mode = CONFIG.argus.transcript_mode
+    if not mode:
+        return WinRemoteClient(hostname, username, password, **kwargs)
+
+    scenario_transcript = transcript.get_scenario_transcript()
+    LOG.info("Using the transcript %s in %s mode.",
+             scenario_transcript.path, mode)
+
+    client_class = {
+        transcript.RECORD: RecordingWinRemoteClient,
+        transcript.REPLAY: ReplayWinRemoteClient,
+    }[mode]
+    return client_class(hostname, username, password,
+                        scenario_transcript, **kwargs)
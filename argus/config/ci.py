@@ -96,6 +96,88 @@ class ArgusOptions(conf_base.Options):
             cfg.BoolOpt("delete_instance", default=True,
                         help="Delete the instance when the "
                              "scenario is over."),
+            cfg.StrOpt("transcript_mode", default=None,
+                       choices=("record", "replay"),
+                       help="Record the output of every remote command "
+                            "in a transcript, or replay the commands "
+                            "from a previously recorded transcript, "
+                            "without creating or connecting to the "
+                            "instance."),
+            cfg.StrOpt("transcript_directory", default=None,
+                       help="The directory which holds the transcripts, "
+                            "one for each scenario. If None is given, "
+                            "the output directory will be used."),
+            cfg.IntOpt("recipe_workers", default=1, min=1,
+                       help="The maximum number of independent recipe "
+                            "steps which can run at the same time, "
+                            "while preparing an instance. By default, "
+                            "the steps run one after another."),
+            cfg.BoolOpt("golden_image", default=False,
+                        help="Snapshot the first instance which has "
+                             "Cloudbase-Init installed and boot the "
+                             "next scenarios from that snapshot, "
+                             "instead of installing it again."),
+            cfg.BoolOpt("verify_transfers", default=False,
+                        help="Check the SHA-256 digest of the files "
+                             "pulled from the instances."),
+            cfg.IntOpt("api_workers", default=5, min=1,
+                       help="The maximum number of independent cloud API "
+                            "calls, such as the creation of the security "
+                            "group rules, which can run at the same time."),
+            cfg.BoolOpt("share_resources", default=False,
+                        help="Create a single keypair and a single "
+                             "security group for all the scenarios of a "
+                             "run, instead of one for each scenario. It "
+                             "has no effect when Tempest uses dynamic "
+                             "credentials."),
+            cfg.IntOpt("warm_pool_size", default=0, min=0,
+                       help="The number of instances booted ahead of the "
+                            "scenarios which need them. The scenarios "
+                            "with their own user-data, metadata or "
+                            "networks don't use these instances. It "
+                            "requires `share_resources`."),
+            cfg.IntOpt("warm_pool_ttl", default=3600, min=1,
+                       help="The number of seconds an instance booted "
+                            "ahead is kept, before being replaced."),
+            cfg.FloatOpt("poll_interval", default=0.5, min=0,
+                         help="The number of seconds between the first "
+                              "two polls of a cloud resource, such as "
+                              "the status of an instance. The interval "
+                              "doubles while the resource doesn't "
+                              "change."),
+            cfg.FloatOpt("max_poll_interval", default=10, min=0,
+                         help="The maximum number of seconds between two "
+                              "polls of a cloud resource."),
+            cfg.BoolOpt("share_status_polls", default=False,
+                        help="Share the listings of the servers between "
+                             "the processes which run the scenarios in "
+                             "parallel, through a file in the output "
+                             "directory, so that the servers of a "
+                             "project are listed by a single process at "
+                             "a time."),
+            cfg.IntOpt("scenario_concurrency", default=1, min=1,
+                       help="The maximum number of scenarios which are "
+                            "prepared and tested at the same time, when "
+                            "they run in a single process."),
+            cfg.BoolOpt("profile", default=False,
+                        help="Measure the time spent by each scenario in "
+                             "the setup of the back-end, the recipe "
+                             "steps, the remote commands and the tests, "
+                             "and write it in the output directory, as a "
+                             "Chrome trace for each scenario and a "
+                             "summary of the run."),
+            cfg.BoolOpt("metrics", default=False,
+                        help="Write the metrics of the remote commands, "
+                             "such as their number, latency, retries and "
+                             "transferred bytes, in the output directory, "
+                             "in the Prometheus text format and as JSON."),
+            cfg.IntOpt("heat_batch_size", default=0, min=0,
+                       help="The number of instances created by a single "
+                            "Heat stack. The instances of a stack are "
+                            "used by the scenarios with the same image, "
+                            "flavor and user-data, and the stack is "
+                            "deleted after the last of them. It requires "
+                            "`share_resources`."),
         ]
 
     def register(self):
@@ -15,12 +15,14 @@
 
 import abc
 import ntpath
+import threading
+
 import six
 
 try:
     from StringIO import StringIO
 except ImportError:
-    import io as StringIO
+    from io import StringIO
 
 from argus.config_generator import base
 from argus import log as argus_log
@@ -29,6 +31,53 @@ from argus import util
 
 LOG = argus_log.LOG
 
+# The parsed config templates, shared by all the config objects.
+_TEMPLATES = {}
+_TEMPLATES_LOCK = threading.Lock()
+
+
+def _parse_template(config_name):
+    """Parse the given config template into a compact, immutable form.
+
+    :returns:
+        A tuple with the default options and a tuple with the
+        sections and their own options, every option being
+        a tuple of its name and its raw value.
+    """
+    data = util.get_resource(config_name)
+    if isinstance(data, six.binary_type) and not six.PY2:
+        data = data.decode("utf-8")
+    conf = six.moves.configparser.ConfigParser()
+
+    # NOTE(dtoncu): `readfp` is deprecated since Python 3.2,
+    # but it was replaced with `read_file`.
+    # pylint: disable=deprecated-method, maybe-no-member
+    if six.PY2:
+        conf.readfp(StringIO(data))
+    else:
+        conf.read_file(StringIO(data))
+
+    defaults = conf.defaults()
+    sections = tuple(
+        (section, tuple((name, value)
+                        for name, value in conf.items(section, raw=True)
+                        if defaults.get(name) != value))
+        for section in conf.sections())
+    return tuple(defaults.items()), sections
+
+
+def _get_template(config_name):
+    """Get the parsed config template, parsing it on the first use."""
+    template = _TEMPLATES.get(config_name)
+    if template is None:
+        with _TEMPLATES_LOCK:
+            template = _TEMPLATES.get(config_name)
+            if template is None:
+                LOG.debug("Parsing the config template %s.", config_name)
+                template = _parse_template(config_name)
+                _TEMPLATES[config_name] = template
+    return template
+
 
 class BaseWindowsConfig(base.BaseConfig):
     """Class that abstract the config files for windows.
@@ -38,10 +87,16 @@ class BaseWindowsConfig(base.BaseConfig):
        Path to default config relative to `argus/resources`
     :param name:
         Name of the file in the instance
+    :param encoding:
+        The encoding of the file in the instance
+    :param newline:
+        The line ending used in the file in the instance
     """
 
     default_config = None
     config_name = None
+    encoding = "utf-8"
+    newline = "\n"
 
     """An object that holds the Cloudbase-Init config."""
 
@@ -62,19 +117,19 @@ class BaseWindowsConfig(base.BaseConfig):
 
     @staticmethod
     def _get_base_conf(config_name):
-        """Return a ConfigParser object with default values."""
-        base_conf = StringIO(
-            util.get_resource(config_name))
-        conf = six.moves.configparser.ConfigParser()
-
-        # NOTE(dtoncu): `readfp` is deprecated since Python 3.2,
-        # but it was replaced with `read_file`.
-        # pylint: disable=deprecated-method, maybe-no-member
-        if six.PY2:
-            conf.readfp(base_conf)
-        else:
-            conf.read_file(base_conf)
+        """Return a ConfigParser object with default values.
 
+        The template is parsed only once per process, every object
+        gets its own ConfigParser built from the cached template.
+        """
+        defaults, sections = _get_template(config_name)
+        conf = six.moves.configparser.ConfigParser()
+        for name, value in defaults:
+            conf.set("DEFAULT", name, value)
+        for section, options in sections:
+            conf.add_section(section)
+            for name, value in options:
+                conf.set(section, name, value)
         return conf
 
     @abc.abstractmethod
@@ -82,6 +137,20 @@ class BaseWindowsConfig(base.BaseConfig):
         """Populate the ConfigParser object with instance specific values."""
         pass
 
+    def render(self):
+        """Render the config in its final format, as it will be written.
+
+        The config is encoded with `encoding` and its lines end
+        with `newline`.
+        """
+        buff = StringIO()
+        self.conf.write(buff)
+        data = buff.getvalue()
+        if isinstance(data, six.binary_type):
+            data = data.decode("utf-8")
+        data = data.replace("\n", self.newline)
+        return data.encode(self.encoding, "replace")
+
     def apply_config(self, path):
         """Write the configuration values in the right place.
 
@@ -92,14 +161,28 @@ class BaseWindowsConfig(base.BaseConfig):
         :param path:
             Path to the directory in which the config file is created.
         """
-        file_path = ntpath.join(path, self.config_name)
-        if self._client.manager.is_file(file_path):
-            self._client.manager.remove(file_path)
+        apply_configs(self._client, path, [self])
 
-        buff = StringIO()
-        self.conf.write(buff)
-        buff.seek(0)
-        data = buff.read()
 
+def apply_configs(client, path, configs, skip_unchanged=False):
+    """Write the given configs in the same directory, at once.
+
+    The configs are rendered locally and written atomically,
+    with a single transfer.
+
+    :param client:
+        A client connected to the instance.
+    :param path:
+        Path to the directory in which the config files are created.
+    :param configs:
+        A list of :class:`BaseWindowsConfig` objects.
+    :param skip_unchanged:
+        Don't write the configs which are identical to the ones
+        already found in the instance.
+    """
+    files = {}
+    for config in configs:
+        file_path = ntpath.join(path, config.config_name)
+        files[file_path] = config.render()
         LOG.debug("Writing data in file '%s'.", file_path)
-        self._client.write_file(data=data, remote_destination=file_path)
+    client.write_files(files, skip_unchanged=skip_unchanged)
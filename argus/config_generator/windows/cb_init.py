@@ -28,6 +28,11 @@ CONFIG = argus_config.CONFIG
 class BasePopulatedCBInitConfig(base.BaseWindowsConfig):
     """An object that holds the Cloudbase-Init config."""
 
+    # NOTE(mmicu): Because python2.x does not support UTF-8 we need to
+    #              write the config files as ASCII.
+    encoding = "ascii"
+    newline = "\r\n"
+
     SERVICES = {
         util.HTTP_SERVICE: "httpservice.HttpService",
         util.CONFIG_DRIVE_SERVICE: "configdrive.ConfigDriveService",
@@ -120,26 +125,6 @@ class BasePopulatedCBInitConfig(base.BaseWindowsConfig):
         conf_value = ",".join(serv for serv in service_type if serv)
         self.set_conf_value("metadata_services", conf_value)
 
-    def apply_config(self, path):
-        """Write the configuration values in the right place.
-
-            Take the current state of the `self.conf` object and
-            write it to the specific path.The name of the file
-            will be `config_name`.
-
-        :param path:
-            Path to the directory in which the config file is created.
-        """
-        super(BasePopulatedCBInitConfig, self).apply_config(path)
-
-        # NOTE(mmicu): Because python2.x does not support UTF-8 we need to
-        #              convert the config file.
-        file_path = ntpath.join(path, self.config_name)
-        cmd = ("(get-content '{filename}')| "
-               "out-file '{filename}' -encoding ascii")
-        self._client.run_command_with_retry(cmd.format(filename=file_path),
-                                            command_type=util.POWERSHELL)
-
 
 class CBInitConfig(BasePopulatedCBInitConfig):
     """Config object for cloudbase-init.conf."""
@@ -43,3 +43,8 @@ class ArgusEnvironmentError(ArgusError):
 class ArgusInvalidDecoratorError(ArgusError):
     """Exception triggered when a decorator has been improperly used."""
     pass
+
+
+class ArgusTranscriptError(ArgusError):
+    """Exception raised when a command can't be found in a transcript."""
+    pass
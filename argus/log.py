@@ -13,8 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import os
 import logging
+import threading
+
+try:
+    from collections import abc as collections_abc
+except ImportError:
+    import collections as collections_abc
 
 from argus import config as argus_config
 
@@ -25,6 +32,60 @@ DEFAULT_FORMAT = ('%(scenario)s - %(os_type)s - %(asctime)s - %(name)s - '
                   '%(levelname)s - %(message)s')
 
 
+class LogExtra(collections_abc.MutableMapping):
+    """The extra items of the log records, which can differ per thread.
+
+    The items are shared by all the threads, unless a thread
+    calls :meth:`isolate`, after which the changes made by
+    that thread are seen only by it. The threads started by
+    an isolated thread don't inherit its items, unless they
+    run functions wrapped by :func:`with_log_extra`.
+    """
+
+    def __init__(self, items):
+        self._shared = dict(items)
+        self._local = threading.local()
+
+    @property
+    def _items(self):
+        return getattr(self._local, "items", self._shared)
+
+    def isolate(self, items=None):
+        """Give the current thread its own copy of the shared items.
+
+        :param items:
+            The items to copy instead of the shared ones, such as
+            the items of the thread which started the current one.
+        """
+        self._local.items = dict(self._shared if items is None else items)
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        del self._items[key]
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ScenarioFilter(logging.Filter):
+    """Let through only the records of the given scenario."""
+
+    def __init__(self, scenario):
+        super(ScenarioFilter, self).__init__()
+        self._scenario = scenario
+
+    def filter(self, record):
+        return getattr(record, "scenario", None) == self._scenario
+
+
 def get_logger(name="argus",
                format_string=DEFAULT_FORMAT,
                logging_file=CONFIG.argus.argus_log_file):
@@ -34,7 +95,7 @@ def get_logger(name="argus",
     will be the format it will use for logging. `logging_file` is a file
     where the messages will be written.
     """
-    extra = {"scenario": "unknown", "os_type": "unknown"}
+    extra = LogExtra({"scenario": "unknown", "os_type": "unknown"})
 
     logger = logging.getLogger(name)
     formatter = logging.Formatter(format_string)
@@ -61,6 +122,36 @@ def set_scenario_name(log, name):
     log.extra["scenario"] = name
 
 
+def isolate_log_extra(log):
+    """Keep the extra items set by the current thread to this thread.
+
+    This is needed when many scenarios run in the same process,
+    each of them in its own thread.
+
+    :param log: A logging handler.
+    """
+    log.extra.isolate()
+
+
+def with_log_extra(log, function):
+    """Wrap a function to run with the extra items of the current thread.
+
+    The items are copied when the function is wrapped, so the wrapped
+    function can be given to the threads of a pool, which log as
+    the thread that submitted it, with the same scenario name.
+
+    :param log: A logging handler.
+    :param function: The function which will run in another thread.
+    """
+    items = dict(log.extra)
+
+    @functools.wraps(function)
+    def _run(*args, **kwargs):
+        log.extra.isolate(items)
+        return function(*args, **kwargs)
+    return _run
+
+
 def get_log_extra_item(log, item):
     """Returns an extra item from the logging object."""
     return log.extra.get(item, 'unknown')
@@ -81,6 +172,8 @@ def add_new_handler(log, format_string=DEFAULT_FORMAT):
         formatter = logging.Formatter(format_string)
         file_handler = logging.FileHandler(logging_file, delay=True)
         file_handler.setFormatter(formatter)
+        # The other scenarios of the process can log at the same time.
+        file_handler.addFilter(ScenarioFilter(log.extra.get("scenario")))
 
         log.logger.addHandler(file_handler)
 
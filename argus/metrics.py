@@ -0,0 +1,216 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Count what the scenarios do, such as the remote commands they run.
+
+The counters and the histograms are kept in a registry of the process,
+where each value is tagged with a set of labels, such as the type of a
+remote command and the method which ran it. The registry can be written
+in the output directory in the Prometheus text format and as JSON, so
+that the number of remote commands of each scenario can be compared
+between runs.
+"""
+
+import collections
+import json
+import os
+import tempfile
+import threading
+
+from argus import config as argus_config
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+# The upper bounds of the buckets of the histograms, in seconds.
+BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, float("inf"))
+PROMETHEUS_FILE = "argus-metrics-{pid}.prom"
+JSON_FILE = "argus-metrics-{pid}.json"
+
+__all__ = (
+    'Registry',
+    'REGISTRY',
+    'dump',
+    'increment',
+    'is_enabled',
+    'observe',
+)
+
+
+def is_enabled():
+    """Check if the metrics should be written in the output directory."""
+    return CONFIG.argus.metrics
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = [
+        '{}="{}"'.format(key, value.replace("\\", "\\\\")
+                         .replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Registry(object):
+    """The counters and the histograms of a process."""
+
+    def __init__(self, buckets=BUCKETS):
+        self._buckets = buckets
+        self._types = {}
+        self._values = collections.defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def _check_type(self, name, kind):
+        known = self._types.setdefault(name, kind)
+        if known != kind:
+            raise ValueError("The metric {} is a {}, not a {}."
+                             .format(name, known, kind))
+
+    def increment(self, name, value=1, **labels):
+        """Add the given value to a counter."""
+        key = _labels_key(labels)
+        with self._lock:
+            self._check_type(name, COUNTER)
+            values = self._values[name]
+            values[key] = values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Add the given value to a histogram."""
+        key = _labels_key(labels)
+        with self._lock:
+            self._check_type(name, HISTOGRAM)
+            histogram = self._values[name].get(key)
+            if histogram is None:
+                histogram = self._values[name][key] = {
+                    "buckets": [0] * len(self._buckets),
+                    "count": 0,
+                    "sum": 0,
+                }
+            for index, bound in enumerate(self._buckets):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    def get(self, name, **labels):
+        """Get the value of a counter or of a histogram, if any."""
+        with self._lock:
+            value = self._values.get(name, {}).get(_labels_key(labels))
+            if isinstance(value, dict):
+                value = dict(value, buckets=list(value["buckets"]))
+            return value
+
+    def clear(self):
+        """Forget all the metrics."""
+        with self._lock:
+            self._types.clear()
+            self._values.clear()
+
+    def to_prometheus(self):
+        """Get the metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._values):
+                kind = self._types[name]
+                lines.append("# TYPE {} {}".format(name, kind))
+                for key, value in sorted(self._values[name].items()):
+                    if kind == COUNTER:
+                        lines.append("{}{} {}".format(
+                            name, _format_labels(key), value))
+                        continue
+                    for bound, count in zip(self._buckets,
+                                            value["buckets"]):
+                        bucket_key = key + (("le", _format_bound(bound)), )
+                        lines.append("{}_bucket{} {}".format(
+                            name, _format_labels(bucket_key), count))
+                    lines.append("{}_sum{} {}".format(
+                        name, _format_labels(key), value["sum"]))
+                    lines.append("{}_count{} {}".format(
+                        name, _format_labels(key), value["count"]))
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        """Get the metrics as a serializable dictionary."""
+        metrics = {}
+        with self._lock:
+            for name, values in self._values.items():
+                samples = []
+                for key, value in sorted(values.items()):
+                    sample = {"labels": dict(key)}
+                    if self._types[name] == COUNTER:
+                        sample["value"] = value
+                    else:
+                        sample.update(value, buckets=dict(zip(
+                            map(_format_bound, self._buckets),
+                            value["buckets"])))
+                    samples.append(sample)
+                metrics[name] = {"type": self._types[name],
+                                 "samples": samples}
+        return metrics
+
+
+REGISTRY = Registry()
+
+
+def increment(name, value=1, **labels):
+    """Add the given value to a counter of the process."""
+    REGISTRY.increment(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Add the given value to a histogram of the process."""
+    REGISTRY.observe(name, value, **labels)
+
+
+def dump(directory=None, registry=REGISTRY):
+    """Write the metrics of the process in the output directory.
+
+    The metrics are written both in the Prometheus text format and
+    as JSON, in files named after the process, since the scenarios
+    can run in many processes.
+
+    :returns: The paths of the written files.
+    """
+    directory = directory or CONFIG.argus.output_directory or os.getcwd()
+    contents = (
+        (PROMETHEUS_FILE, registry.to_prometheus()),
+        (JSON_FILE, json.dumps(registry.to_json(), indent=2,
+                               sort_keys=True)),
+    )
+    paths = []
+    for file_name, content in contents:
+        file_name = file_name.format(pid=os.getpid())
+        path = os.path.join(directory, file_name)
+        # The scenarios of a process can dump the metrics at once,
+        # so each of them writes its own temporary file.
+        handle, temporary_path = tempfile.mkstemp(
+            dir=directory, prefix=file_name + ".", suffix=".tmp")
+        with os.fdopen(handle, "w") as stream:
+            stream.write(content)
+        os.rename(temporary_path, path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,384 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure where the time of the scenarios goes.
+
+The time of a scenario is split into nested spans, such as the setup
+of the back-end, the steps of the recipe, the remote commands and the
+tests. The spans of each scenario are written in the output directory
+as a trace in the Chrome trace event format, which can be opened with
+``chrome://tracing``, and a summary of all the traces found there is
+kept up to date, with the spans where most of the time was spent and
+with the critical path of each scenario.
+"""
+
+import collections
+import contextlib
+import glob
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+
+from argus import config as argus_config
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+TRACE_EXTENSION = ".trace.json"
+SUMMARY_FILE = "profile-summary.json"
+# The number of the most expensive spans kept in the summary.
+TOP_SPANS = 20
+# Spans which end this close to the start of the next
+# one are considered to be waited for by it.
+EPSILON = 0.001
+
+_PROFILERS = {}
+_PROFILERS_LOCK = threading.Lock()
+# The spans running in the current thread.
+_RUNNING = threading.local()
+
+__all__ = (
+    'Profiler',
+    'critical_path',
+    'get_profiler',
+    'is_enabled',
+    'save',
+    'span',
+    'summarize',
+    'wrap',
+)
+
+
+def is_enabled():
+    """Check if the time of the scenarios should be measured."""
+    return CONFIG.argus.profile
+
+
+def _running():
+    if not hasattr(_RUNNING, "spans"):
+        _RUNNING.spans = []
+    return _RUNNING.spans
+
+
+@contextlib.contextmanager
+def _no_span():
+    yield
+
+
+class Profiler(object):
+    """The spans of a scenario.
+
+    :param scenario: The name of the scenario.
+    """
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self._spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def spans(self):
+        """The finished spans, in the order they finished."""
+        with self._lock:
+            return list(self._spans)
+
+    def current_span(self):
+        """Get the id of the span of this profiler running in this thread."""
+        for profiler, span_id in reversed(_running()):
+            if profiler is self:
+                return span_id
+        return None
+
+    @contextlib.contextmanager
+    def span(self, name, category, parent=None, **args):
+        """Measure the time spent in the given block.
+
+        :param name: The name of the span.
+        :param category: The kind of work done in the span.
+        :param parent:
+            The id of the parent span. By default, this is the span
+            of this profiler which runs in the current thread.
+        :param args: Details about the span, which must be serializable.
+        """
+        if parent is None:
+            parent = self.current_span()
+        with self._lock:
+            span_id = next(self._ids)
+        running = _running()
+        running.append((self, span_id))
+        start = time.time()
+        try:
+            yield
+        except BaseException as exc:
+            args["error"] = type(exc).__name__
+            raise
+        finally:
+            running.pop()
+            record = {
+                "id": span_id,
+                "parent": parent,
+                "name": name,
+                "category": category,
+                "start": start,
+                "duration": time.time() - start,
+                "thread": threading.current_thread().ident,
+                "args": args,
+            }
+            with self._lock:
+                self._spans.append(record)
+
+    def to_chrome_trace(self):
+        """Get the spans in the Chrome trace event format."""
+        events = []
+        for record in sorted(self.spans, key=lambda record: record["start"]):
+            args = dict(record["args"], span_id=record["id"],
+                        parent_id=record["parent"])
+            events.append({
+                "name": record["name"],
+                "cat": record["category"],
+                "ph": "X",
+                "ts": int(record["start"] * 1e6),
+                "dur": int(record["duration"] * 1e6),
+                "pid": os.getpid(),
+                "tid": record["thread"],
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"scenario": self.scenario}}
+
+    def save(self, directory):
+        """Write the trace of the scenario in the given directory.
+
+        :returns: The path of the trace.
+        """
+        path = os.path.join(directory, self.scenario + TRACE_EXTENSION)
+        _dump(self.to_chrome_trace(), path)
+        return path
+
+
+def _dump(data, path):
+    # The scenarios of a process can write the same file at once,
+    # so each of them writes its own temporary file.
+    handle, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or None,
+        prefix=os.path.basename(path) + ".", suffix=".tmp")
+    with os.fdopen(handle, "w") as stream:
+        json.dump(data, stream, indent=2, sort_keys=True)
+    os.rename(temporary_path, path)
+
+
+def get_profiler(scenario=None):
+    """Get the profiler of the given scenario, or of the current one."""
+    scenario = scenario or argus_log.get_log_extra_item(LOG, 'scenario')
+    with _PROFILERS_LOCK:
+        profiler = _PROFILERS.get(scenario)
+        if profiler is None:
+            profiler = _PROFILERS[scenario] = Profiler(scenario)
+        return profiler
+
+
+def _current_profiler():
+    running = _running()
+    if running:
+        return running[-1][0]
+    return get_profiler()
+
+
+def span(name, category, **args):
+    """Measure the time spent in the given block, if profiling is enabled.
+
+    The span belongs to the profiler of the span running in the current
+    thread or, when there is none, to the profiler of the scenario.
+    """
+    if not is_enabled():
+        return _no_span()
+    return _current_profiler().span(name, category, **args)
+
+
+def wrap(func, name, category, **args):
+    """Run the given callable in a span, even from another thread.
+
+    The span will be a child of the span running
+    when the callable is wrapped.
+    """
+    if not is_enabled():
+        return func
+    profiler = _current_profiler()
+    parent = profiler.current_span()
+
+    def _wrapper(*func_args, **func_kwargs):
+        with profiler.span(name, category, parent=parent, **args):
+            return func(*func_args, **func_kwargs)
+    return _wrapper
+
+
+def _end(record):
+    return record["start"] + record["duration"]
+
+
+def critical_path(spans):
+    """Get the spans which determined the duration of a scenario.
+
+    Going back from the span which finished last, each span was
+    waited for by the next one, which started only after it finished.
+    The spans with children are replaced by their own critical path,
+    so the path is made of the innermost spans.
+
+    :param spans: The spans of a scenario, as recorded by a profiler.
+    :returns: The spans of the critical path, in chronological order.
+    """
+    children = collections.defaultdict(list)
+    for record in spans:
+        children[record["parent"]].append(record)
+
+    def _path(parent, end):
+        path = []
+        candidates = children[parent]
+        while True:
+            ready = [record for record in candidates
+                     if _end(record) <= end + EPSILON]
+            if not ready:
+                return path
+            last = max(ready, key=_end)
+            path[0:0] = _path(last["id"], _end(last)) or [last]
+            end = last["start"]
+            candidates = [record for record in ready if record is not last]
+
+    if not spans:
+        return []
+    return _path(None, max(_end(record) for record in spans))
+
+
+def _self_time(record, children):
+    """Get the time of a span which isn't spent in its children."""
+    busy = 0
+    busy_until = record["start"]
+    for child in sorted(children, key=lambda child: child["start"]):
+        start = max(child["start"], busy_until)
+        end = min(_end(child), _end(record))
+        if end > start:
+            busy += end - start
+            busy_until = end
+    return max(0, record["duration"] - busy)
+
+
+def _load_trace(path):
+    with open(path) as stream:
+        trace = json.load(stream)
+    spans = []
+    for event in trace["traceEvents"]:
+        args = dict(event.get("args", {}))
+        spans.append({
+            "id": args.pop("span_id", None),
+            "parent": args.pop("parent_id", None),
+            "name": event["name"],
+            "category": event["cat"],
+            "start": event["ts"] / 1e6,
+            "duration": event["dur"] / 1e6,
+            "thread": event["tid"],
+            "args": args,
+        })
+    return trace["otherData"]["scenario"], spans
+
+
+def summarize(traces, top=TOP_SPANS):
+    """Summarize the traces of many scenarios.
+
+    :param traces: A mapping between the scenarios and their spans.
+    :param top: The number of the most expensive spans which are kept.
+    :returns:
+        A dictionary with the spans where most of the time was spent,
+        excluding the time spent in their children, and with the
+        duration and the critical path of each scenario.
+    """
+    totals = collections.defaultdict(lambda: {"count": 0, "time": 0.0})
+    scenarios = {}
+    for scenario, spans in traces.items():
+        children = collections.defaultdict(list)
+        for record in spans:
+            children[record["parent"]].append(record)
+        for record in spans:
+            total = totals[(record["category"], record["name"])]
+            total["count"] += 1
+            total["time"] += _self_time(record, children[record["id"]])
+
+        duration = 0
+        if spans:
+            duration = (max(_end(record) for record in spans) -
+                        min(record["start"] for record in spans))
+        scenarios[scenario] = {
+            "duration": duration,
+            "critical_path": [
+                {"name": record["name"], "category": record["category"],
+                 "duration": record["duration"]}
+                for record in critical_path(spans)],
+        }
+
+    sinks = sorted(totals.items(), key=lambda item: item[1]["time"],
+                   reverse=True)[:top]
+    return {
+        "top": [{"category": category, "name": name,
+                 "count": total["count"], "time": total["time"]}
+                for (category, name), total in sinks],
+        "scenarios": scenarios,
+    }
+
+
+def write_summary(directory):
+    """Write the summary of all the traces found in the given directory.
+
+    :returns: The path of the summary.
+    """
+    traces = {}
+    for path in sorted(glob.glob(os.path.join(directory,
+                                              "*" + TRACE_EXTENSION))):
+        try:
+            scenario, spans = _load_trace(path)
+        except (IOError, KeyError, ValueError) as exc:
+            LOG.warning("Ignoring the invalid trace %s: %s", path, exc)
+            continue
+        traces[scenario] = spans
+
+    path = os.path.join(directory, SUMMARY_FILE)
+    _dump(summarize(traces), path)
+    return path
+
+
+def save(scenario=None):
+    """Write the trace of a scenario and update the summary of the run.
+
+    The profiler of the scenario is discarded afterwards.
+    """
+    if not is_enabled():
+        return
+    scenario = scenario or argus_log.get_log_extra_item(LOG, 'scenario')
+    with _PROFILERS_LOCK:
+        profiler = _PROFILERS.pop(scenario, None)
+    if profiler is None:
+        return
+
+    directory = CONFIG.argus.output_directory or os.getcwd()
+    try:
+        path = profiler.save(directory)
+        write_summary(directory)
+    except (IOError, OSError) as exc:
+        LOG.warning("Could not write the trace of %s: %s", scenario, exc)
+    else:
+        LOG.info("The trace of the scenario was written to %s.", path)
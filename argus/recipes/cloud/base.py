@@ -16,12 +16,17 @@
 """Base recipe for preparing instances for Cloudbase-Init testing."""
 
 import abc
+import functools
+import time
 
 import six
 
+from argus import checkpoint
 from argus import config as argus_config
 from argus import log as argus_log
+from argus import profiler
 from argus.recipes import base
+from argus.recipes import scheduler
 from argus import util
 
 __all__ = ('BaseCloudbaseinitRecipe', )
@@ -74,14 +79,64 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
     * get an install script for CloudbaseInit
     * installs CloudbaseInit
     * waits for the finalization of the installation.
+
+    The steps are declared in :attr:`PREPARE_STEPS`, together with
+    the steps they depend on, and the independent ones are executed
+    concurrently.
     """
     RECIPES = None
     METHODS = None
 
+    # The steps executed by :meth:`prepare`, each one with the
+    # steps which must be finished before it can start.
+    PREPARE_STEPS = (
+        ("wait_for_boot_completion", ()),
+        ("create_mock_metadata", ()),
+        ("set_mtu", ("wait_for_boot_completion", )),
+        ("execution_prologue", ("wait_for_boot_completion", )),
+        ("get_installation_script", ("execution_prologue", )),
+        ("install_cbinit", ("set_mtu", "get_installation_script")),
+        ("replace_install", ("install_cbinit", )),
+        ("replace_code", ("replace_install", )),
+        ("create_golden_image", ("replace_code", )),
+        # The configs are read from the installed cloudbaseinit
+        # package, which is replaced by the previous steps.
+        ("prepare_cbinit_config", ("create_mock_metadata",
+                                   "replace_code")),
+        ("inject_cbinit_config", ("prepare_cbinit_config",
+                                  "create_golden_image")),
+        ("pre_sysprep", ("inject_cbinit_config", )),
+        ("sysprep", ("pre_sysprep", )),
+        ("wait_cbinit_finalization", ("sysprep", )),
+        ("get_cb_init_artifacts", ("wait_cbinit_finalization", )),
+    )
+    # The steps which receive the service type as argument.
+    SERVICE_TYPE_STEPS = ("create_mock_metadata", "prepare_cbinit_config")
+    # The steps which are executed again when resuming the preparation
+    # of a preserved instance, since they only build in-memory state
+    # or their effects don't survive a reboot.
+    VOLATILE_STEPS = (
+        "wait_for_boot_completion",
+        "create_mock_metadata",
+        "set_mtu",
+        "prepare_cbinit_config",
+        "get_cb_init_artifacts",
+    )
+    # The steps whose effects are already part of a golden image,
+    # which are skipped for the instances booted from one.
+    GOLDEN_IMAGE_STEPS = (
+        "get_installation_script",
+        "install_cbinit",
+        "replace_install",
+        "replace_code",
+        "create_golden_image",
+    )
+
     def __init__(self, backend):
         super(BaseCloudbaseinitRecipe, self).__init__(backend)
         self._cbinit_conf = None
         self._cbinit_unattend_conf = None
+        self._journal = None
 
     @abc.abstractmethod
     def wait_for_boot_completion(self):
@@ -135,6 +190,15 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
     def replace_code(self):
         """Do whatever is necessary to replace the code for Cloudbase-Init."""
 
+    def create_golden_image(self):
+        """Snapshot the instance, once Cloudbase-Init is installed.
+
+        The next scenarios sharing the same installation can boot
+        from this snapshot, instead of installing Cloudbase-Init.
+        """
+        if CONFIG.argus.golden_image:
+            self._backend.create_golden_image()
+
     @abc.abstractmethod
     def prepare_cbinit_config(self, service_type):
         """Prepare the config objects.
@@ -160,6 +224,11 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
         """Get the Cloudbase-Init configs from the instance."""
         pass
 
+    def get_cb_init_artifacts(self):
+        """Get the Cloudbase-Init logs and configs from the instance."""
+        self.get_cb_init_logs()
+        self.get_cb_init_confs()
+
     @abc.abstractmethod
     def create_mock_metadata(self, service_type):
         """Create the mocked metadata."""
@@ -170,6 +239,52 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
         """Delete the mocked metadata."""
         pass
 
+    def _get_prepare_steps(self, service_type):
+        """Build the scheduler steps out of :attr:`PREPARE_STEPS`."""
+        steps = []
+        for name, requires in self.PREPARE_STEPS:
+            action = getattr(self, name)
+            if name in self.SERVICE_TYPE_STEPS:
+                action = functools.partial(action, service_type)
+            # The steps run in the threads of the scheduler.
+            action = profiler.wrap(action, name, "step")
+            steps.append(scheduler.Step(name, action, requires))
+        return steps
+
+    def _load_checkpoints(self):
+        """Get the steps finished on the instance by a previous run.
+
+        A step is considered finished only if it is recorded both
+        in the local journal and on the instance itself.
+        """
+        self._journal = None
+        if not checkpoint.is_enabled():
+            return set()
+
+        journal = checkpoint.get_journal()
+        if journal.instance != self._backend.internal_instance_id():
+            return set()
+        self._journal = journal
+
+        recorded = set(journal.steps) - set(self.VOLATILE_STEPS)
+        if not recorded:
+            return set()
+        self.wait_for_boot_completion()
+        completed = recorded & set(
+            self._backend.remote_client.manager.get_checkpoints())
+        if completed:
+            LOG.info("Resuming the preparation, skipping the finished "
+                     "steps: %s.", ", ".join(sorted(completed)))
+        return completed
+
+    # pylint: disable=unused-argument
+    def _add_checkpoint(self, name, duration):
+        """Record that the given step was finished."""
+        if self._journal is None or name in self.VOLATILE_STEPS:
+            return
+        self._backend.remote_client.manager.add_checkpoint(name)
+        self._journal.add_step(name)
+
     def prepare(self, service_type=None, **kwargs):
         """Prepare the underlying instance.
 
@@ -179,25 +294,33 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
         * get an installation script for CloudbaseInit
         * install CloudbaseInit by running the previously downloaded file.
         * wait until the instance is up and running.
+
+        The steps which don't depend on each other, such as creating
+        the metadata, setting the MTU or downloading the installer,
+        are executed at the same time, by at most
+        `CONFIG.argus.recipe_workers` threads.
+
+        When the instance is preserved after the scenario, each
+        finished step is recorded, so that preparing the same instance
+        again resumes after the last finished steps.
         """
         LOG.info("Preparing instance...")
-        self.wait_for_boot_completion()
-        self.create_mock_metadata(service_type)
-        self.set_mtu()
-        self.execution_prologue()
-        self.get_installation_script()
-        self.install_cbinit()
-        self.replace_install()
-        self.replace_code()
-        self.prepare_cbinit_config(service_type)
-        self.inject_cbinit_config()
-        self.pre_sysprep()
-
-        self.sysprep()
-        self.wait_cbinit_finalization()
+        start = time.time()
+        step_scheduler = scheduler.StepScheduler(
+            self._get_prepare_steps(service_type),
+            workers=CONFIG.argus.recipe_workers)
+        completed = self._load_checkpoints()
+        if CONFIG.argus.golden_image and self._backend.from_golden_image:
+            LOG.info("The instance was booted from a golden image, "
+                     "Cloudbase-Init is already installed.")
+            completed.update(self.GOLDEN_IMAGE_STEPS)
+        timings = step_scheduler.run(completed=completed,
+                                     on_finished=self._add_checkpoint)
         LOG.info("Finished preparing instance.")
-        self.get_cb_init_logs()
-        self.get_cb_init_confs()
+        LOG.debug("Preparing the instance took %.2f seconds, "
+                  "spent in the steps: %s.", time.time() - start,
+                  ", ".join("{} ({:.2f}s)".format(name, duration)
+                            for name, duration in timings.items()))
 
     def cleanup(self, **kwargs):
         """Cleanup the allocated resources."""
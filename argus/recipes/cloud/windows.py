@@ -15,12 +15,12 @@
 
 """Windows Cloudbase-Init recipes."""
 
-import base64
 import ntpath
 import os
 import zipfile
 
 from argus import config as argus_config
+from argus.config_generator.windows import base as config_windows
 from argus.config_generator.windows import cb_init as cbinit_config
 from argus import exceptions
 from argus.introspection.cloud import windows as introspection
@@ -42,6 +42,9 @@ _CBINIT_TARGET_LOCATION = r"C:\cloudbaseinit"
 class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
     """Recipe for preparing a Windows instance."""
 
+    CB_INIT_LOGS = ("cloudbase-init.log", "cloudbase-init-unattend.log")
+    CB_INIT_CONFS = ("cloudbase-init.conf", "cloudbase-init-unattend.conf")
+
     def __init__(self, backend):
         super(CloudbaseinitRecipe, self).__init__(backend)
         self.metadata_provider = None
@@ -104,18 +107,59 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
             zip_ref.extractall(destination_path)
         os.remove(archive_path)
 
+    def _save_encoded_file(self, encoded_content, remote_path, local_path,
+                           archive=False):
+        """Decode a file pulled from the instance and save it locally.
+
+        The content is decoded chunk by chunk and, when `archive` is
+        given, the archive is extracted in the output directory from
+        the same file handle and removed afterwards.
+        """
+        with open(local_path, 'w+b') as file_result:
+            digest = util.decode_base64_to_file(encoded_content, file_result)
+            if CONFIG.argus.verify_transfers:
+                expected = (self._backend.remote_client.manager.
+                            get_file_sha256(remote_path))
+                if digest != expected:
+                    raise exceptions.ArgusError(
+                        "The file {!r} was corrupted during the transfer, "
+                        "expected the SHA-256 digest {}, got {}."
+                        .format(remote_path, expected, digest))
+            if archive:
+                file_result.seek(0)
+                with zipfile.ZipFile(file_result, "r") as zip_ref:
+                    zip_ref.extractall(CONFIG.argus.output_directory)
+        if archive:
+            os.remove(local_path)
+
     def transfer_encoded_file_b64(self, file_source, destination_path,
                                   archive=False):
         """Creates a new file to the path by decoding a base64 string."""
         encoded_content = (self._backend.remote_client.manager.
                            encode_file_to_base64_str(
                                file_path=file_source))
-        file_64_decoded = base64.standard_b64decode(encoded_content[0])
-        with open(destination_path, 'wb') as file_result:
-            file_result.write(file_64_decoded)
-        if archive:
-            self.extract_files_from_archive(destination_path,
-                                            CONFIG.argus.output_directory)
+        self._save_encoded_file(encoded_content[0], file_source,
+                                destination_path, archive=archive)
+
+    def pull_files(self, members, archive_name):
+        """Pull the given files from the instance, in a single transfer.
+
+        The files are packed in an archive on the instance, which is
+        sent back and extracted in the output directory.
+
+        :param members:
+            A list of (remote file path, local file name) pairs.
+        :param archive_name:
+            The name used for the archive, both on the instance
+            and locally.
+        """
+        archive_path = ntpath.join("C:\\", archive_name)
+        encoded_content = self._backend.remote_client.manager.pack_files(
+            members, archive_path)
+        local_path = os.path.join(CONFIG.argus.output_directory,
+                                  archive_name)
+        self._save_encoded_file(encoded_content, archive_path, local_path,
+                                archive=True)
 
     def _grab_cbinit_installation_log(self):
         """Obtain the installation logs."""
@@ -124,21 +168,11 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
             LOG.warning("The output directory wasn't given, "
                         "the log will not be grabbed.")
             return
-        # Rename the installation log and archive it.
-        installation_log = r"C:\installation.log"
-        renamed_log = (r"C:\{0}-installation-{1}.log".format(
-            argus_log.get_log_extra_item(LOG, 'scenario'),
-            self._backend.instance_server()['id']))
-        self._backend.remote_client.manager.copy_file(installation_log,
-                                                      renamed_log)
-        zip_source = r"C:\installation.zip"
-        self._backend.remote_client.manager.archive_file(
-            file_path=renamed_log,
-            destination_path=zip_source)
-        log_template = "installation-{}.zip".format(
-            self._backend.instance_server()['id'])
-        path = os.path.join(CONFIG.argus.output_directory, log_template)
-        self.transfer_encoded_file_b64(zip_source, path, archive=True)
+        instance_id = self._backend.instance_server()['id']
+        renamed_log = "{0}-installation-{1}.log".format(
+            argus_log.get_log_extra_item(LOG, 'scenario'), instance_id)
+        self.pull_files([(r"C:\installation.log", renamed_log)],
+                        "installation-{}.zip".format(instance_id))
 
     def replace_install(self):
         """Replace the Cloudbase-Init installed files with the downloaded ones.
@@ -346,8 +380,21 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
         for directory in needed_directories:
             self._make_dir_if_needed(directory)
 
-        self._cbinit_conf.apply_config(conf_dir)
-        self._cbinit_unattend_conf.apply_config(conf_dir)
+        config_windows.apply_configs(
+            self._backend.remote_client, conf_dir,
+            [self._cbinit_conf, self._cbinit_unattend_conf],
+            skip_unchanged=True)
+
+    def _get_files_prefix(self):
+        """Get the prefix of the files pulled from the instance."""
+        return "{}-{}-".format(argus_log.get_log_extra_item(LOG, 'scenario'),
+                               self._backend.instance_server()['id'])
+
+    def _get_cb_init_members(self, prefix, location, files):
+        """Get the archive members for the given Cloudbase-Init files."""
+        cbdir = introspection.get_cbinit_dir(self._execute)
+        return [(ntpath.join(cbdir, location, cb_file), prefix + cb_file)
+                for cb_file in files]
 
     def get_cb_init_files(self, location, files):
         LOG.info("Obtaining Cloudbase-Init files from %s" % location)
@@ -356,51 +403,29 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
                         "the files will not be grabbed.")
             return
 
-        instance_id = self._backend.instance_server()['id']
-        scenario_name = argus_log.get_log_extra_item(LOG, 'scenario')
-        cbdir = introspection.get_cbinit_dir(self._execute)
-        cb_files = files
-        renamed_cb_files = []
-        cb_files_path = []
-        renamed_cb_files_path = []
-        for cb_file in cb_files:
-            renamed_cb_files.append(scenario_name + "-" + instance_id +
-                                    "-" + cb_file)
-
-        for cb_file in cb_files:
-            file_path = os.path.join(cbdir, r"{location}\{file}".format(
-                location=location, file=cb_file))
-            renamed_path = (os.path.join(cbdir,
-                                         (r"{location}\{scenario}-{instance}-"
-                                          "-{file}".
-                                          format(location=location,
-                                                 scenario=scenario_name,
-                                                 instance=instance_id,
-                                                 file=cb_file))))
-            cb_files_path.append(file_path)
-            renamed_cb_files_path.append(renamed_path)
-
-        files_to_rename = list(zip(cb_files_path,
-                                   renamed_cb_files_path))
-        for current_name, renamed in files_to_rename:
-            self._backend.remote_client.manager.copy_file(current_name,
-                                                          renamed)
-
-        source_destination = list(zip(renamed_cb_files_path,
-                                      renamed_cb_files))
-        for source, destination in source_destination:
-            path = os.path.join(CONFIG.argus.output_directory, destination)
-            self.transfer_encoded_file_b64(source, path)
+        prefix = self._get_files_prefix()
+        members = self._get_cb_init_members(prefix, location, files)
+        self.pull_files(members, prefix + location + ".zip")
 
     def get_cb_init_logs(self):
-        self.get_cb_init_files(
-            location="log",
-            files=["cloudbase-init.log", "cloudbase-init-unattend.log"])
+        self.get_cb_init_files(location="log", files=self.CB_INIT_LOGS)
 
     def get_cb_init_confs(self):
-        self.get_cb_init_files(
-            location="conf",
-            files=["cloudbase-init.conf", "cloudbase-init-unattend.conf"])
+        self.get_cb_init_files(location="conf", files=self.CB_INIT_CONFS)
+
+    def get_cb_init_artifacts(self):
+        """Get the Cloudbase-Init logs and configs, in a single transfer."""
+        LOG.info("Obtaining the Cloudbase-Init logs and configs.")
+        if not CONFIG.argus.output_directory:
+            LOG.warning("The output directory wasn't given, "
+                        "the files will not be grabbed.")
+            return
+
+        prefix = self._get_files_prefix()
+        members = (
+            self._get_cb_init_members(prefix, "log", self.CB_INIT_LOGS) +
+            self._get_cb_init_members(prefix, "conf", self.CB_INIT_CONFS))
+        self.pull_files(members, prefix + "artifacts.zip")
 
 
 class CloudbaseinitScriptRecipe(CloudbaseinitRecipe):
@@ -0,0 +1,160 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run the steps of a recipe according to their dependencies."""
+
+import collections
+from multiprocessing import pool
+import sys
+import time
+
+import six
+from six.moves import queue
+
+from argus import exceptions
+from argus import log as argus_log
+
+LOG = argus_log.LOG
+
+__all__ = (
+    'Step',
+    'StepScheduler',
+)
+
+Step = collections.namedtuple("Step", "name action requires")
+"""A step which can be scheduled.
+
+:param name: The unique name of the step.
+:param action: A callable without arguments, which executes the step.
+:param requires: The names of the steps which must finish first.
+"""
+
+
+class StepScheduler(object):
+    """Run the given steps as soon as their requirements are finished.
+
+    Independent steps are executed concurrently, but no more than
+    `workers` steps will run at the same time. Among the steps ready
+    to run, the ones given first are started first, which means that
+    with a single worker the steps run in the order they were given.
+
+    :param steps: A list of :class:`Step` objects.
+    :param workers: The maximum number of steps running at once.
+    """
+
+    def __init__(self, steps, workers=1):
+        self._steps = collections.OrderedDict(
+            (step.name, step) for step in steps)
+        self._workers = max(1, workers or 1)
+        self._check_requirements()
+
+    def _check_requirements(self):
+        """Check that the requirements are known and free of cycles."""
+        for step in self._steps.values():
+            unknown = set(step.requires) - set(self._steps)
+            if unknown:
+                raise exceptions.ArgusError(
+                    "Step {!r} requires unknown steps: {}."
+                    .format(step.name, ", ".join(sorted(unknown))))
+
+        resolved = set()
+        remaining = list(self._steps)
+        while remaining:
+            ready = [name for name in remaining
+                     if set(self._steps[name].requires) <= resolved]
+            if not ready:
+                raise exceptions.ArgusError(
+                    "Circular requirements between the steps: {}."
+                    .format(", ".join(remaining)))
+            resolved.update(ready)
+            remaining = [name for name in remaining if name not in ready]
+
+    @property
+    def steps(self):
+        """The names of the steps, in the order they were given."""
+        return list(self._steps)
+
+    @staticmethod
+    def _run_step(step, results):
+        LOG.debug("Starting step %s.", step.name)
+        start = time.time()
+        try:
+            step.action()
+        except Exception:  # pylint: disable=broad-except
+            results.put((step.name, time.time() - start, sys.exc_info()))
+        else:
+            duration = time.time() - start
+            LOG.info("Step %s finished in %.2f seconds.", step.name, duration)
+            results.put((step.name, duration, None))
+
+    def run(self, completed=(), on_finished=None):
+        """Run every step which wasn't already completed.
+
+        When a step fails, no other step is started, the running
+        ones are waited for and then the first error is raised.
+
+        :param completed:
+            Names of the steps which are considered already finished.
+        :param on_finished:
+            A callable, which is called with the name and the duration
+            of each step, after the step finished successfully.
+        :returns: An ordered mapping between the step names and
+                  the number of seconds each of them took.
+        """
+        done = set(completed) & set(self._steps)
+        pending = [name for name in self._steps if name not in done]
+        running = set()
+        timings = collections.OrderedDict()
+        results = queue.Queue()
+        error = None
+        # The steps log as the scenario which runs them.
+        run_step = argus_log.with_log_extra(LOG, self._run_step)
+
+        thread_pool = pool.ThreadPool(processes=self._workers)
+        try:
+            while pending or running:
+                if error is None:
+                    for name in list(pending):
+                        if len(running) >= self._workers:
+                            break
+                        if set(self._steps[name].requires) <= done:
+                            pending.remove(name)
+                            running.add(name)
+                            thread_pool.apply_async(
+                                run_step, (self._steps[name], results))
+                if not running:
+                    break
+
+                name, duration, exc_info = results.get()
+                running.discard(name)
+                if exc_info is None and on_finished:
+                    try:
+                        on_finished(name, duration)
+                    except Exception:  # pylint: disable=broad-except
+                        exc_info = sys.exc_info()
+                if exc_info is not None:
+                    LOG.error("Step %s failed after %.2f seconds.",
+                              name, duration)
+                    error = error or exc_info
+                    continue
+                done.add(name)
+                timings[name] = duration
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+        if error is not None:
+            six.reraise(*error)
+        return timings
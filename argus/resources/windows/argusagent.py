@@ -16,6 +16,7 @@
 from __future__ import print_function
 import argparse
 import base64
+import os
 import sys
 import zipfile
 
@@ -32,6 +33,10 @@ def initialize_parser_args():
                         help="return an encoded base64 string")
     parser.add_argument("--archive", type=str, nargs="*",
                         help="archive given file")
+    parser.add_argument("--pack", type=str, nargs="*",
+                        help="archive the given pairs of file and archive "
+                             "name and return the archive as a base64 "
+                             "string")
     parser.add_argument("--get_user_flags", type=str, nargs="*",
                         help="Get information regarding the given user")
     parser_args = parser.parse_args()
@@ -66,6 +71,20 @@ def archive_file(filepath, archivepath):
         archive.write(filepath)
 
 
+def pack_files(archivepath, members):
+    """Archives the given files and writes the archive as a base64 string.
+
+    :param archivepath: The path of the created archive.
+    :param members: A list of (file path, name in the archive) pairs.
+                    The missing files are skipped.
+    """
+    with zipfile.ZipFile(archivepath, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filepath, name in members:
+            if os.path.isfile(filepath):
+                archive.write(filepath, name)
+    base64_read_file(archivepath)
+
+
 def get_user_flags(user_name):
     """Gets the user flags and password expiry status for the given user."""
     user_info = _get_user_info(user_name, 4)
@@ -80,5 +99,7 @@ if __name__ == "__main__":
         base64_read_file(args.encode[0])
     if args.archive:
         archive_file(args.archive[0], args.archive[1])
+    if args.pack:
+        pack_files(args.pack[0], list(zip(args.pack[1::2], args.pack[2::2])))
     if args.get_user_flags:
         get_user_flags(args.get_user_flags[0])
@@ -18,8 +18,12 @@ import unittest
 
 import six
 
+from argus.backends.replay import replay_backend
+from argus.client import transcript
 from argus import config as argus_config
 from argus import log as argus_log
+from argus import metrics
+from argus import profiler
 from argus import util
 
 LOG = argus_log.LOG
@@ -49,9 +53,10 @@ class ScenarioMeta(type):
 
                 def delegator(self, class_name=test_class,
                               test_name=test_name):
-                    getattr(class_name(self.backend, self.recipe,
-                                       self.introspection, test_name),
-                            test_name)()
+                    with profiler.span(test_name, "test",
+                                       test_class=class_name.__name__):
+                        getattr(self.get_test_instance(class_name, test_name),
+                                test_name)()
 
                 if hasattr(cls, test_name):
                     old_function = getattr(cls, test_name)
@@ -110,6 +115,25 @@ class BaseScenario(unittest.TestCase):
     introspection = None
     recipe = None
 
+    _test_instances = None
+    """The instances of the merged test classes, built by the scenario."""
+
+    @classmethod
+    def get_test_instance(cls, test_class, test_name):
+        """Get the instance of a merged test class for this scenario.
+
+        The instance is built the first time one of its tests runs
+        and then it is reused by the other tests of the same class,
+        until the scenario is prepared again.
+        """
+        if cls._test_instances is None:
+            cls._test_instances = {}
+        instance = cls._test_instances.get(test_class)
+        if instance is None:
+            instance = cls._test_instances[test_class] = test_class(
+                cls.backend, cls.recipe, cls.introspection, test_name)
+        return instance
+
     @classmethod
     def setUpClass(cls):
         """Prepare the scenario for running
@@ -124,6 +148,7 @@ class BaseScenario(unittest.TestCase):
         # so we're just disabling the errors for now.
 
         LOG.info("Running scenario %s", cls.__name__)
+        cls._test_instances = {}
 
         # Populate the LOG handler
         argus_log.set_scenario_name(LOG, cls.__name__)
@@ -135,16 +160,28 @@ class BaseScenario(unittest.TestCase):
             except OSError:
                 LOG.warning("Could not create the output directory.")
 
+        # No instance is created when replaying the transcripts.
+        backend_type = cls.backend_type
+        if CONFIG.argus.transcript_mode == transcript.REPLAY:
+            backend_type = replay_backend.ReplayBackend
+
         try:
-            cls.backend = cls.backend_type(cls.__name__,
+            with profiler.span("setUpClass", "scenario"):
+                cls.backend = backend_type(cls.__name__,
                                            cls.userdata, cls.metadata,
                                            cls.availability_zone)
-            cls.backend.setup_instance()
+                with profiler.span("setup_instance", "backend"):
+                    cls.backend.setup_instance()
+
+                with profiler.span("prepare_instance", "recipe"):
+                    cls.prepare_instance()
 
-            cls.prepare_instance()
+                if CONFIG.argus.transcript_mode == transcript.RECORD:
+                    replay_backend.record_backend(
+                        cls.backend, transcript.get_scenario_transcript())
 
-            cls.introspection = cls.introspection_type(
-                cls.backend.remote_client)
+                cls.introspection = cls.introspection_type(
+                    cls.backend.remote_client)
         except Exception as exc:
             LOG.exception("Building scenario %r failed with %s",
                           cls.__name__, exc)
@@ -178,11 +215,16 @@ class BaseScenario(unittest.TestCase):
         This usually means that any resource that was created in
         :meth:`setUpClass` needs to be destroyed here.
         """
-        if cls.backend and CONFIG.argus.delete_instance:
-            LOG.info("Delete the instance.")
-            cls.backend.cleanup()
-        else:
-            LOG.info("The instance was preserved.")
-
-        if cls.recipe:
-            cls.recipe.cleanup()
+        with profiler.span("tearDownClass", "scenario"):
+            if cls.backend and CONFIG.argus.delete_instance:
+                LOG.info("Delete the instance.")
+                cls.backend.cleanup()
+            else:
+                LOG.info("The instance was preserved.")
+
+            if cls.recipe:
+                cls.recipe.cleanup()
+        cls._test_instances = None
+        profiler.save(cls.__name__)
+        if metrics.is_enabled():
+            metrics.dump()
@@ -0,0 +1,175 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run many scenarios at the same time, in a single process.
+
+Each scenario is prepared, tested and cleaned up by a thread of its
+own, so the instances of different scenarios are provisioned at the
+same time, without a process for each of them. The results of the
+tests are written as a subunit stream, as with ``testr``.
+
+Usage::
+
+    python -m argus.scenarios.scheduler --concurrency 4 ci
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+from multiprocessing import pool
+import re
+import sys
+import threading
+import unittest
+
+import subunit.v2
+import testtools
+
+from argus.backends.tempest import warm_pool
+from argus import config as argus_config
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+__all__ = (
+    'ScenarioScheduler',
+    'group_by_scenario',
+    'filter_tests',
+)
+
+
+def group_by_scenario(suite):
+    """Split a test suite into a suite for each scenario.
+
+    The tests of a scenario are the tests of the same class,
+    in the order they were given.
+    """
+    groups = collections.OrderedDict()
+    for test in testtools.iterate_tests(suite):
+        groups.setdefault(type(test), []).append(test)
+    return [unittest.TestSuite(tests) for tests in groups.values()]
+
+
+def filter_tests(suite, patterns):
+    """Keep only the tests whose id matches one of the patterns.
+
+    All the tests are kept when no pattern is given.
+    """
+    if not patterns:
+        return suite
+    patterns = [re.compile(pattern) for pattern in patterns]
+    return unittest.TestSuite(
+        test for test in testtools.iterate_tests(suite)
+        if any(pattern.search(test.id()) for pattern in patterns))
+
+
+class ScenarioScheduler(object):
+    """Run the scenarios of a test suite concurrently.
+
+    No more than `concurrency` scenarios are prepared and tested
+    at the same time. The scenarios given first are started first.
+
+    :param suite: The test suite with the tests of the scenarios.
+    :param concurrency: The maximum number of scenarios running at once.
+    """
+
+    def __init__(self, suite, concurrency=1):
+        self._suites = group_by_scenario(suite)
+        self._concurrency = max(1, concurrency or 1)
+
+    @property
+    def scenarios(self):
+        """The number of scenarios which will run."""
+        return len(self._suites)
+
+    @staticmethod
+    def _run_scenario(suite, result, semaphore):
+        # The scenario name of the log records is set by each scenario.
+        argus_log.isolate_log_extra(LOG)
+        # The results of a test are forwarded all at once, so that
+        # the results of different tests don't interleave.
+        suite.run(testtools.ThreadsafeForwardingResult(result, semaphore))
+
+    def run(self, result):
+        """Run every scenario, reporting its tests to the given result.
+
+        :param result:
+            A :class:`unittest.TestResult`, which doesn't need
+            to be thread-safe.
+        """
+        if not self._suites:
+            return
+        # Each scenario claims at most one warm instance.
+        warm_pool.expect_claims(len(self._suites))
+        semaphore = threading.Semaphore(1)
+        workers = min(self._concurrency, len(self._suites))
+        thread_pool = pool.ThreadPool(processes=workers)
+        try:
+            thread_pool.map(
+                lambda suite: self._run_scenario(suite, result, semaphore),
+                self._suites, chunksize=1)
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+
+def _prepare_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Run the scenarios concurrently, in a single process.")
+    parser.add_argument("start_directory",
+                        help="The directory where the tests are found.")
+    parser.add_argument("patterns", nargs="*",
+                        help="Run only the tests which match one of "
+                             "these regular expressions.")
+    parser.add_argument("-c", "--concurrency", type=int,
+                        default=CONFIG.argus.scenario_concurrency,
+                        help="The maximum number of scenarios "
+                             "running at once.")
+    parser.add_argument("-o", "--output",
+                        help="The file where the subunit stream is written, "
+                             "instead of the standard output.")
+    return parser
+
+
+def main(argv=None):
+    """Run the scenarios and write their results as a subunit stream."""
+    args = _prepare_argument_parser().parse_args(argv)
+    suite = unittest.TestLoader().discover(args.start_directory)
+    scheduler = ScenarioScheduler(filter_tests(suite, args.patterns),
+                                  args.concurrency)
+    LOG.info("Running %d scenarios, at most %d at once.",
+             scheduler.scenarios, args.concurrency)
+
+    if args.output:
+        stream = open(args.output, "wb")
+    else:
+        stream = getattr(sys.stdout, "buffer", sys.stdout)
+    summary = testtools.StreamSummary()
+    result = testtools.ExtendedToStreamDecorator(testtools.CopyStreamResult(
+        [subunit.v2.StreamResultToBytes(stream), summary]))
+    result.startTestRun()
+    try:
+        scheduler.run(result)
+    finally:
+        result.stopTestRun()
+        if args.output:
+            stream.close()
+    return 0 if summary.wasSuccessful() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
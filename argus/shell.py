@@ -16,23 +16,120 @@
 from __future__ import print_function
 
 import argparse
+import hashlib
+import itertools
 import os
 import shutil
 import subprocess
 import sys
 import tempfile
+import time
+
 import requests
 import six
 from six.moves import urllib_parse as urlparse
+import subunit
+import testtools
 
 from argus.backends.tempest import manager
 from argus import config as argus_config
 from argus.config import ci
 from argus import exceptions
+from argus import util
 from os_testr import subunit2html
 
+try:
+    from testrepository.repository import file as testr_repository
+except ImportError:
+    testr_repository = None
+
 CONFIG = argus_config.CONFIG
 
+MATRIX_RESULTS = "argus-results-matrix"
+
+
+def _get_cache_directory():
+    """Return the directory where the downloaded resources are cached."""
+    cache_home = (os.environ.get("XDG_CACHE_HOME") or
+                  os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "argus")
+
+
+def _get_cached_paths(url):
+    """Return the paths of the cached content and ETag of the given url."""
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    path = os.path.join(_get_cache_directory(), key)
+    return path, path + ".etag"
+
+
+def _read_file(path):
+    try:
+        with open(path, "rb") as file_handle:
+            return file_handle.read()
+    except (IOError, OSError):
+        return None
+
+
+def _write_file(path, content):
+    temporary_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary_path, "wb") as file_handle:
+        file_handle.write(content)
+    os.rename(temporary_path, path)
+
+
+def _cache_resource(url, content, etag):
+    """Keep the downloaded resource, along with its ETag."""
+    content_path, etag_path = _get_cached_paths(url)
+    try:
+        if not os.path.isdir(_get_cache_directory()):
+            os.makedirs(_get_cache_directory())
+        _write_file(content_path, content)
+        _write_file(etag_path, etag.encode("utf-8"))
+    except (IOError, OSError) as exc:
+        print("Could not cache {}: {}".format(url, exc))
+
+
+def _fetch_resource(url):
+    """Get the content of a remote url, using the cached copy if possible.
+
+    The ETag of the cached copy is sent to the server, which
+    answers with no content when the copy is still up to date.
+    The cached copy is used as well when the server can't be reached.
+    """
+    content_path, etag_path = _get_cached_paths(url)
+    cached = _read_file(content_path)
+    etag = _read_file(etag_path)
+    headers = {}
+    if cached is not None and etag:
+        headers["If-None-Match"] = etag.decode("utf-8")
+
+    error = None
+    for attempt in range(CONFIG.argus.retry_count):
+        if attempt:
+            time.sleep(CONFIG.argus.retry_delay)
+        try:
+            response = requests.get(url, headers=headers)
+            if response.status_code == requests.codes.not_modified:
+                return cached
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            error = exc
+            if cached is not None:
+                # Don't wait for the server, since there is a copy.
+                break
+        else:
+            if response.headers.get("ETag"):
+                _cache_resource(url, response.content,
+                                response.headers["ETag"])
+            return response.content
+
+    if cached is not None:
+        print("Using the cached copy of {}, since the download "
+              "failed with {}".format(url, error))
+        return cached
+    raise exceptions.ArgusEnvironmentError(
+        "Download failed from {} with {}.".format(url, error))
+
 
 def _download_resource(url, location):
     """Download a file from a remote url.
@@ -40,16 +137,9 @@ def _download_resource(url, location):
     :param url: The URL that points to the resource
     :param location: Where to save the resource
     """
-    for _ in range(CONFIG.argus.retry_count):
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except (requests.RequestException, requests.HTTPError) as ex:
-            raise exceptions.ArgusEnvironmentError(
-                "Download failed from %s to %s with %s .", url, location, ex)
-
+    content = _fetch_resource(url)
     with open(location, 'wb') as file_handle:
-        file_handle.write(response.text)
+        file_handle.write(content)
 
 
 def download_argus_resource(resource_path, location, resources_link):
@@ -65,33 +155,62 @@ def download_argus_resource(resource_path, location, resources_link):
     _download_resource(url_resource, location)
 
 
-def _get_image_name(image_ref):
-    """Return the image name.
+def _copy_bundled_resource(resource_path, location):
+    """Write a resource bundled with Argus at the given location."""
+    with open(location, 'wb') as file_handle:
+        file_handle.write(util.get_resource(resource_path))
 
-    :param image_ref: The id of the image.
+
+def _init_repository(directory):
+    """Create a new testr repository in the given directory."""
+    if testr_repository is None:
+        subprocess.Popen(["testr", "init"], cwd=directory,
+                         close_fds=True).wait()
+        return
+    testr_repository.RepositoryFactory().initialise(directory)
+
+
+def _get_image_names(image_refs):
+    """Return the names of the given images, from a single listing.
+
+    :param image_refs: The ids of the images.
     """
-    image_name = None
+    mng = manager.APIManager()
     try:
-        mng = manager.APIManager()
         images = mng.image_client.list_images()["images"]
-        for img_ref in images:
-            if img_ref["id"].lower() == image_ref.lower():
-                image_name = img_ref["name"]
     finally:
         mng.cleanup_credentials()
 
-    return image_name
+    names = {image["id"].lower(): image["name"] for image in images}
+    unknown = [image_ref for image_ref in image_refs
+               if image_ref.lower() not in names]
+    if unknown:
+        raise exceptions.ArgusEnvironmentError(
+            "Unknown images: {}.".format(", ".join(unknown)))
+    return {image_ref: names[image_ref.lower()] for image_ref in image_refs}
 
 
-def _get_base_directory(directory, image_name, image_ref):
-    """Return the path to the root directory for this run."""
+def _get_image_name(image_ref):
+    """Return the image name.
+
+    :param image_ref: The id of the image.
+    """
+    return _get_image_names([image_ref])[image_ref]
+
+
+def _get_root_directory(directory):
+    """Return the path to the directory which holds all the runs."""
     if directory:
         if not os.path.isdir(directory):
             os.mkdir(directory)
     else:
         directory = tempfile.mkdtemp(prefix="argus-", dir="/tmp")
+    return os.path.abspath(directory)
+
 
-    base_directory = os.path.abspath(directory)
+def _get_base_directory(directory, image_name, image_ref):
+    """Return the path to the root directory for this run."""
+    base_directory = _get_root_directory(directory)
     image_ref_directory = os.path.join(base_directory, image_ref)
     image_name_link = os.path.join(base_directory, image_name)
 
@@ -107,14 +226,21 @@ def _prepare_argument_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--directory",
                         help="Directory that will hold the required files.")
-    parser.add_argument("-i", "--image_ref",
-                        help="Glance image-id to use for this run.")
-    parser.add_argument("-f", "--flavor_ref",
+    parser.add_argument("-i", "--image_ref", nargs="+",
+                        help="Glance image-id to use for this run. When "
+                             "more images, flavors, architectures or "
+                             "builds are given, every combination of "
+                             "them is run.")
+    parser.add_argument("-f", "--flavor_ref", nargs="+",
                         help="The flavor id.")
     parser.add_argument("-t", "--tests", default="",
                         help="The tests you want to run.")
     parser.add_argument("-r", "--resources", default=ci.RESOURCES_LINK,
                         help="URL to Argus resources.")
+    parser.add_argument("--download", action="store_true",
+                        help="Download the files needed for running the "
+                             "tests from the resources URL, instead of "
+                             "using the ones bundled with Argus.")
     parser.add_argument("-p", "--parallel", type=int,
                         help="many processes to use in parallel.")
     parser.add_argument("-l", "--local",
@@ -129,16 +255,31 @@ def _prepare_argument_parser():
     parser.add_argument("-c", "--config_file", default=None,
                         help="A config file that will be used when running"
                              " a scenario.")
-    parser.add_argument("-a", "--architecture", default="x64",
+    parser.add_argument("-a", "--architecture", nargs="+", default=["x64"],
                         help="The OS architecture.")
+    parser.add_argument("-b", "--build", nargs="+",
+                        help="The build of the Cloudbase-Init installer.")
+    parser.add_argument("--concurrency", type=int,
+                        help="The maximum number of scenarios running at "
+                             "once, over all the runs of a matrix.")
     parser.add_argument("--use_arestor", dest="use_arestor",
                         action='store_true',
                         help="Use arestor metadata.")
+    parser.add_argument("--in_process", dest="in_process",
+                        action='store_true',
+                        help="Run the scenarios in a single process, "
+                             "instead of a testr worker for each of them.")
     return parser
 
 
-def _prepare_environment(local, directory, resources_link, config_file):
-    """Prepare the temp environment."""
+def _prepare_environment(local, directory, resources_link, config_file,
+                         download=False, init_repository=True):
+    """Prepare the temp environment.
+
+    The files needed for running the tests are taken from the local
+    repository, if any, from the resources link, when `download` is
+    given, or else from the ones bundled with Argus.
+    """
     os.mkdir(os.path.join(directory, "ci"))
 
     testr_conf = os.path.join(directory, ".testr.conf")
@@ -153,23 +294,28 @@ def _prepare_environment(local, directory, resources_link, config_file):
         local = os.path.abspath(local)
         os.link(os.path.join(local, ".testr.conf"), testr_conf)
         os.link(os.path.join(local, "ci", "tests.py"), tests)
-    else:
+    elif download:
         # Download the necessary items
         download_argus_resource(".testr.conf", testr_conf, resources_link)
         download_argus_resource("ci/tests.py", tests, resources_link)
+    else:
+        _copy_bundled_resource("bootstrap/testr.conf", testr_conf)
+        _copy_bundled_resource("bootstrap/tests.py", tests)
 
     if config_file:
         if not os.path.isabs(config_file):
             config_file = os.path.abspath(config_file)
         shutil.copyfile(config_file, config_file_path)
 
-    # Create a new repository
-    subprocess.Popen(["testr", "init"], cwd=directory, close_fds=True).wait()
+    if init_repository:
+        # Create a new repository
+        _init_repository(directory)
 
 
 def _prepare_config(separate, resources, flavor_ref,
                     git_command, zip_patch,
-                    directory, image_ref, architecture, use_arestor):
+                    directory, image_ref, architecture, use_arestor,
+                    build=None):
     """Prepare the Argus config file."""
 
     conf = six.moves.configparser.SafeConfigParser()
@@ -191,6 +337,9 @@ def _prepare_config(separate, resources, flavor_ref,
     if flavor_ref:
         conf.set("openstack", "flavor_ref", str(flavor_ref))
 
+    if build:
+        conf.set("argus", "build", str(build))
+
     config_path = os.path.join(directory, "argus.conf")
     with open(config_path, 'w') as file_handle:
         conf.write(file_handle)
@@ -210,38 +359,174 @@ def _start_testr(parallel, tests, directory):
     return process
 
 
+def _start_scheduler(parallel, tests, directory, stream):
+    """Start running the tests with the in-process scenario scheduler."""
+
+    cmd = [sys.executable, "-m", "argus.scenarios.scheduler",
+           "ci", "--output", stream]
+    if tests:
+        cmd.append(str(tests))
+    if parallel:
+        cmd.append("--concurrency={}".format(parallel))
+
+    process = subprocess.Popen(cmd, cwd=directory, close_fds=True)
+    return process
+
+
+def _start_run(args, directory):
+    """Start the tests of a run in the given directory.
+
+    :returns: The process running the tests and its subunit stream.
+    """
+    if args.in_process:
+        stream = os.path.join(directory, "argus-results.subunit")
+        process = _start_scheduler(args.parallel, args.tests,
+                                   directory, stream)
+    else:
+        stream = os.path.join(directory, ".testrepository", "0")
+        process = _start_testr(args.parallel, args.tests, directory)
+    return process, stream
+
+
+def _generate_report(stream, output):
+    """Generate the HTML report of the given subunit stream."""
+    sys.argv[1:] = [stream, output]
+    subunit2html.main()
+
+
+class _LabelledResult(testtools.StreamResult):
+    """Forward the test results, with the test ids prefixed by a label."""
+
+    def __init__(self, target, label):
+        super(_LabelledResult, self).__init__()
+        self._target = target
+        self._label = label
+
+    def status(self, test_id=None, **kwargs):
+        if test_id is not None:
+            test_id = "{}.{}".format(self._label, test_id)
+        self._target.status(test_id=test_id, **kwargs)
+
+
+def _combine_streams(streams, output):
+    """Write the results of many runs as a single subunit stream.
+
+    :param streams:
+        Pairs of labels and subunit streams. The tests of each
+        stream are prefixed by the label of the stream.
+    """
+    with open(output, "wb") as destination:
+        writer = subunit.StreamResultToBytes(destination)
+        for label, stream in streams:
+            if not stream or not os.path.isfile(stream):
+                print("No results were found for {}.".format(label))
+                continue
+            with open(stream, "rb") as source:
+                subunit.ByteStreamToStreamResult(source).run(
+                    _LabelledResult(writer, label))
+
+
+def _get_runs(args):
+    """Return the combinations of images, flavors, architectures and builds.
+    """
+    return list(itertools.product(args.image_ref, args.flavor_ref or [None],
+                                  args.architecture, args.build or [None]))
+
+
+def _run_label(image_name, flavor_ref, architecture, build):
+    """Return a label for a run of a matrix, usable in test ids."""
+    parts = (image_name, flavor_ref or "default-flavor", architecture,
+             build or "default-build")
+    return "-".join(str(part).replace(".", "_").replace(" ", "_")
+                    for part in parts)
+
+
+def _run_matrix(args, runs, image_names, root_directory):
+    """Run every combination of the matrix and combine their results."""
+    image_directories = {}
+    for image_ref in set(run[0] for run in runs):
+        image_directories[image_ref] = _get_base_directory(
+            root_directory, image_names[image_ref], image_ref)
+
+    def _run(run):
+        image_ref, flavor_ref, architecture, build = run
+        label = _run_label(image_names[image_ref], flavor_ref,
+                           architecture, build)
+        directory = os.path.join(image_directories[image_ref], label)
+        stream = None
+        try:
+            os.mkdir(directory)
+            _prepare_environment(args.local, directory, args.resources,
+                                 args.config_file, args.download,
+                                 not args.in_process)
+            _prepare_config(args.separate, args.resources,
+                            flavor_ref, args.git_command,
+                            args.zip_patch, directory,
+                            image_ref, architecture,
+                            args.use_arestor, build)
+            print("Running {} at {}".format(label, directory))
+            process, stream = _start_run(args, directory)
+            return label, stream, process.wait()
+        except Exception as exc:  # pylint: disable=broad-except
+            # The other runs are still combined in the results.
+            print("The run {} failed: {}".format(label, exc))
+            return label, stream, 1
+
+    # Each run has `parallel` scenarios running at once.
+    budget = args.concurrency or len(runs) * (args.parallel or 1)
+    workers = max(1, budget // (args.parallel or 1))
+    results = util.run_concurrently([lambda run=run: _run(run)
+                                     for run in runs], workers)
+
+    stream = os.path.join(root_directory, MATRIX_RESULTS + ".subunit")
+    _combine_streams([(label, run_stream)
+                      for label, run_stream, _ in results], stream)
+    _generate_report(stream, os.path.join(root_directory,
+                                          MATRIX_RESULTS + ".html"))
+
+    return max(exit_code for _, _, exit_code in results)
+
+
 def main():
     """The main entry point."""
     parser = _prepare_argument_parser()
     args = parser.parse_args(sys.argv[1:])
-    image_name = _get_image_name(args.image_ref)
-
+    if args.concurrency and (args.parallel or 1) > args.concurrency:
+        parser.error("--concurrency can't be lower than --parallel, "
+                     "since a run has --parallel scenarios at once.")
+    runs = _get_runs(args)
+    image_names = _get_image_names(args.image_ref)
+
+    if len(runs) > 1:
+        root_directory = _get_root_directory(args.directory)
+        print("Starting a matrix of {} runs at {}".format(
+            len(runs), root_directory))
+        return _run_matrix(args, runs, image_names, root_directory)
+
+    image_ref, flavor_ref, architecture, build = runs[0]
+    image_name = image_names[image_ref]
     base_directory = _get_base_directory(args.directory, image_name,
-                                         args.image_ref)
+                                         image_ref)
 
     print("Starting at {}".format(base_directory))
 
     _prepare_environment(args.local, base_directory, args.resources,
-                         args.config_file)
+                         args.config_file, args.download,
+                         not args.in_process)
 
     _prepare_config(args.separate, args.resources,
-                    args.flavor_ref, args.git_command,
+                    flavor_ref, args.git_command,
                     args.zip_patch, base_directory,
-                    args.image_ref, args.architecture,
-                    args.use_arestor)
+                    image_ref, architecture,
+                    args.use_arestor, build)
 
-    process = _start_testr(args.parallel, args.tests, base_directory)
+    process, stream = _start_run(args, base_directory)
     exit_code = process.wait()
 
     # generate subunit
-    stream = os.path.join(base_directory,
-                          ".testrepository", "0")
     output = os.path.join(base_directory,
                           "argus-results-{}.html".format(image_name))
-    sys.argv[1] = stream
-    sys.argv[2] = output
-
-    subunit2html.main()
+    _generate_report(stream, output)
 
     return exit_code
 
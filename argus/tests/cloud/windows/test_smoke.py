@@ -49,14 +49,13 @@ def _parse_licenses(output):
 class TestSmoke(smoke.TestsBaseSmoke):
     """Test additional Windows specific behaviour."""
 
-    def __init__(self, conf, backend, recipe, introspection, *args, **kwargs):
-        super(TestSmoke, self).__init__(conf, backend, recipe, introspection,
-                                        *args, **kwargs)
+    @util.cached_property
+    def _cmdlet(self):
         # TODO(mmicu): We have to go through a lot of layers
         # to accomplish our goal, we need to find a way to structure
         # our resources better
-        self._cmdlet = (self._backend.remote_client.manager
-                        .WINDOWS_MANAGEMENT_CMDLET)
+        return (self._backend.remote_client.manager
+                .WINDOWS_MANAGEMENT_CMDLET)
 
     def test_service_display_name(self):
         cmd = ('(Get-Service | where {$_.Name '
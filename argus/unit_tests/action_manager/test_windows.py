@@ -1080,6 +1080,72 @@ class WindowsActionManagerTest(unittest.TestCase):
                              ["Config Cloudbase-Init"
                               " for {}".format(self._os_type)])
 
+    @mock.patch('argus.introspection.cloud.windows.get_python_dir')
+    def test_pack_files(self, mock_get_python_dir):
+        mock_get_python_dir.return_value = test_utils.PYTHON_DIR
+        self._client.run_remote_cmd.return_value = ("encoded", "", 0)
+        members = [(r"C:\first.log", "first.log"),
+                   (r"C:\second.log", "second.log")]
+
+        result = self._action_manager.pack_files(members, r"C:\files.zip")
+
+        self.assertEqual(result, "encoded")
+        cmd = (r'& "{}\python.exe" {} --pack "C:\files.zip" '
+               r'"C:\first.log" "first.log" "C:\second.log" "second.log"'
+               .format(test_utils.PYTHON_DIR,
+                       test_utils.ARGUS_AGENT_LOCATION))
+        self._client.run_remote_cmd.assert_called_once_with(
+            cmd, command_type=util.POWERSHELL,
+            upper_timeout=CONFIG.argus.io_upper_timeout)
+
+    def test_get_file_sha256(self):
+        self._client.run_command_with_retry.return_value = (
+            "ABCDEF\r\n", "", 0)
+
+        digest = self._action_manager.get_file_sha256(r"C:\fake.log")
+
+        self.assertEqual(digest, "abcdef")
+        cmd = self._client.run_command_with_retry.call_args[0][0]
+        self.assertIn(r"[System.IO.File]::OpenRead('C:\fake.log')", cmd)
+
+    def test_get_files_sha256(self):
+        self._client.run_command_with_retry.return_value = (
+            "ABCDEF\r\n-\r\n", "", 0)
+
+        digests = self._action_manager.get_files_sha256(
+            [r"C:\first.conf", r"C:\second.conf"])
+
+        self.assertEqual(digests, {r"C:\first.conf": "abcdef",
+                                   r"C:\second.conf": None})
+        cmd = self._client.run_command_with_retry.call_args[0][0]
+        self.assertIn(r"@('C:\first.conf', 'C:\second.conf')", cmd)
+
+    def test_get_files_sha256_unexpected_output(self):
+        self._client.run_command_with_retry.return_value = ("ABCDEF", "", 0)
+
+        self.assertRaises(exceptions.ArgusError,
+                          self._action_manager.get_files_sha256,
+                          [r"C:\first.conf", r"C:\second.conf"])
+
+    def test_get_checkpoints(self):
+        self._client.run_command_with_retry.return_value = (
+            "first\r\n\r\nsecond\r\n", "", 0)
+
+        checkpoints = self._action_manager.get_checkpoints()
+
+        self.assertEqual(checkpoints, ["first", "second"])
+        self.assertEqual(
+            self._client.run_command_with_retry.call_args[1]["command_type"],
+            util.POWERSHELL)
+
+    def test_add_checkpoint(self):
+        self._action_manager.add_checkpoint("fake step")
+
+        cmd = "Add-Content -Path '{}' -Value 'fake step'".format(
+            self._action_manager._CHECKPOINTS_FILE)
+        self._client.run_command_with_retry.assert_called_once_with(
+            cmd, command_type=util.POWERSHELL)
+
 
 class WindowsNanoActionManagerTest(unittest.TestCase):
     """Tests for windows nano action manager class."""
@@ -31,8 +31,24 @@ except ImportError:
     import mock
 
 
+class Credentials(object):
+    def __init__(self, username="fake username"):
+        self.username = username
+        self.user_id = "fake user id"
+        self.password = "fake password"
+        self.tenant_id = "fake tenant id"
+        self.tenant_name = "fake tenant name"
+
+
 class TestHeatClient(unittest.TestCase):
 
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            'argus.backends.heat.client', _SESSION=None,
+            _AUTH_VERSIONS={}, _AUTHS={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @mock.patch('six.moves.urllib_parse.urlparse')
     @mock.patch('keystoneclient.discover.Discover')
     def _test_discover_auth_versions_exception(
@@ -240,16 +256,39 @@ class TestHeatClient(unittest.TestCase):
         mock_get_endpoint.get_endpoint.return_value = mock.sentinel
         mock_get_ks_auth.return_value = mock_get_endpoint
 
-        class Credentials(object):
-            def __init__(self):
-                self.username = "fake username"
-                self.user_id = "fake user id"
-                self.password = "fake password"
-                self.tenant_id = "fake tenant id"
-                self.tenant_name = "fake tenant name"
-
         credentials = Credentials()
         result = client.heat_client(credentials)
         self.assertTrue(result, heatclient_client.Client)
         mock_kssession.assert_called_once_with(verify=True)
         mock_env.assert_called_once_with('OS_AUTH_URL')
+
+    @mock.patch('heatclient.client.Client')
+    @mock.patch('argus.backends.heat.client._get_keystone_auth')
+    @mock.patch('heatclient.common.utils.env')
+    @mock.patch('keystoneclient.session.Session')
+    def test_heat_client_cached(self, mock_kssession, mock_env,
+                                mock_get_ks_auth, mock_client):
+        mock_env.return_value = "fake auth url"
+        mock_get_ks_auth.side_effect = lambda *args, **kwargs: mock.Mock()
+
+        client.heat_client(Credentials())
+        client.heat_client(Credentials())
+        client.heat_client(Credentials("other username"))
+
+        mock_kssession.assert_called_once_with(verify=True)
+        self.assertEqual(mock_get_ks_auth.call_count, 2)
+        first, second, third = mock_client.call_args_list
+        self.assertIs(first[1]["auth"], second[1]["auth"])
+        self.assertIsNot(first[1]["auth"], third[1]["auth"])
+        self.assertIs(first[1]["session"], third[1]["session"])
+
+    @mock.patch('argus.backends.heat.client._discover_auth_versions')
+    def test_get_auth_versions_cached(self, mock_discover):
+        mock_discover.return_value = ("fake v2", "fake v3")
+
+        for _ in range(2):
+            result = client._get_auth_versions("fake session", "fake url")
+
+        self.assertEqual(result, ("fake v2", "fake v3"))
+        mock_discover.assert_called_once_with(session="fake session",
+                                              auth_url="fake url")
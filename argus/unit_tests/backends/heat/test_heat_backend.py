@@ -20,6 +20,7 @@ import unittest
 
 from argus.backends.heat import heat_backend
 from argus import exceptions
+from argus.unit_tests import test_utils
 from heatclient import exc
 
 try:
@@ -119,6 +120,116 @@ class TestBaseHeatBackend(unittest.TestCase):
             user_data, floating_network_id, private_net_id)
         self.assertEqual(result, expected_template)
 
+    def test_build_template_shared_security_group(self):
+        result = self._base_heat_backend._build_template(
+            "fake name", "fake key", "fake image", "fake flavor",
+            "fake user data", "fake network", "fake private network",
+            security_group_id="fake security group")
+
+        self.assertNotIn(u'server_security_group', result[u'resources'])
+        self.assertEqual(
+            result[u'resources'][u'server_port'][u'properties']
+            [u'security_groups'], ["fake security group"])
+
+    def test_build_batch_template(self):
+        result = self._base_heat_backend._build_batch_template(
+            2, "fake key", "fake image", "fake flavor", "fake user data",
+            "fake network", "fake private network",
+            security_group_id="fake security group")
+        resources = result[u'resources']
+
+        self.assertEqual(sorted(resources), [
+            u'server_0', u'server_1',
+            u'server_floating_ip_0', u'server_floating_ip_1',
+            u'server_port_0', u'server_port_1'])
+        for index in range(2):
+            port = {u'get_resource': u'server_port_{}'.format(index)}
+            self.assertEqual(
+                resources[u'server_{}'.format(index)][u'properties']
+                [u'networks'], [{u'port': port}])
+            self.assertEqual(
+                resources[u'server_floating_ip_{}'.format(index)]
+                [u'properties'][u'port_id'], port)
+
+    @mock.patch('argus.backends.tempest.resource_pool.credentials_key')
+    @mock.patch('argus.backends.heat.client.heat_client')
+    @mock.patch('argus.backends.tempest.manager.APIManager')
+    def test_claim_batch_instance(self, *_):
+        self._base_heat_backend._keypair = mock.Mock()
+        self.addCleanup(heat_backend._BATCHES.clear)
+        backends = [self._base_heat_backend, FakeBaseHeatBackend()]
+        for backend in backends:
+            backend._heat_client = self._base_heat_backend._heat_client
+            backend._manager = self._base_heat_backend._manager
+            backend._keypair = self._base_heat_backend._keypair
+
+        with test_utils.ConfPatcher('heat_batch_size', 2, 'argus'), \
+                mock.patch('atexit.register') as mock_register:
+            for backend in backends:
+                backend._claim_batch_instance(
+                    "fake image", "fake flavor", "fake network",
+                    "fake private network", "fake security group")
+
+        stacks = self._base_heat_backend._heat_client.stacks
+        self.assertEqual(stacks.create.call_count, 1)
+        self.assertEqual(mock_register.call_count, 1)
+        self.assertIs(backends[0]._batch, backends[1]._batch)
+        self.assertEqual([backend._batch_slot for backend in backends],
+                         [0, 1])
+        self.assertEqual(backends[1]._stack_name, backends[0]._batch.name)
+        self.assertTrue(backends[0]._batch.full)
+
+    @test_utils.ConfPatcher('delete_instance', False, 'argus')
+    @mock.patch('argus.backends.tempest.resource_pool.credentials_key')
+    def test_claim_batch_instance_kept(self, _):
+        self._base_heat_backend._keypair = mock.Mock()
+        self.addCleanup(heat_backend._BATCHES.clear)
+
+        with mock.patch('atexit.register') as mock_register:
+            self._base_heat_backend._claim_batch_instance(
+                "fake image", "fake flavor", "fake network",
+                "fake private network", "fake security group")
+
+        self.assertFalse(mock_register.called)
+
+    def test_stack_batch_release(self):
+        heat_client = mock.Mock()
+        batch = heat_backend.StackBatch(heat_client, "fake batch", 2)
+        batch.claim()
+        batch.claim()
+
+        self.assertFalse(batch.release())
+        self.assertTrue(batch.release())
+        batch.delete()
+        self.assertFalse(heat_client.stacks.delete.called)
+
+    def test_stack_batch_delete_unclaimed(self):
+        heat_client = mock.Mock()
+        heat_client.stacks.get.side_effect = exc.HTTPNotFound()
+        batch = heat_backend.StackBatch(heat_client, "fake batch", 2)
+        batch.claim()
+        batch.release()
+
+        batch.delete()
+
+        heat_client.stacks.delete.assert_called_once_with(
+            stack_id="fake batch")
+
+    def test_cleanup_batch(self):
+        batch = mock.Mock()
+        batch.name = "fake batch"
+        batch.release.return_value = True
+        self._base_heat_backend._batch = batch
+        self._base_heat_backend._wait_stack_deleted = mock.Mock()
+
+        self._base_heat_backend.cleanup()
+
+        stacks = self._base_heat_backend._heat_client.stacks
+        stacks.delete.assert_called_once_with(stack_id="fake batch")
+        self._base_heat_backend._wait_stack_deleted.assert_called_once_with()
+        (self._base_heat_backend._manager.cleanup_credentials.
+         assert_called_once_with())
+
     @mock.patch('argus.config.CONFIG.argus')
     def test_configure_network(self, mock_config):
         mock_config.dns_nameservers = mock.sentinel
@@ -181,7 +292,7 @@ class TestBaseHeatBackend(unittest.TestCase):
             self._base_heat_backend._keypair.name,
             mock_config.image_ref, mock_config.flavor_ref,
             self._base_heat_backend.userdata,
-            mock.sentinel, mock.sentinel)
+            mock.sentinel, mock.sentinel, None)
         fields = {
             'stack_name': self._base_heat_backend._name,
             'disable_rollback': True,
@@ -211,7 +322,7 @@ class TestBaseHeatBackend(unittest.TestCase):
         if fails:
             (self._base_heat_backend._heat_client.stacks.delete.
              side_effect) = Exception
-        self._base_heat_backend._wait_stacks = mock.Mock()
+        self._base_heat_backend._wait_stack_deleted = mock.Mock()
         self._base_heat_backend._manager.cleanup_credentials = mock.Mock()
 
         if fails:
@@ -235,7 +346,7 @@ class TestBaseHeatBackend(unittest.TestCase):
             if fails:
                 count = 0
             (self.assertEqual(self._base_heat_backend.
-                              _wait_stacks.call_count, count))
+                              _wait_stack_deleted.call_count, count))
             (self._base_heat_backend._manager.cleanup_credentials.
              assert_called_once_with())
 
@@ -251,42 +362,77 @@ class TestBaseHeatBackend(unittest.TestCase):
         self._base_heat_backend._keypair = None
         self._test_cleanup(fails=True)
 
-    def test_get_stacks(self):
-        list_ = [1, 2, 3, 4, 5]
-        self._base_heat_backend._heat_client.stacks.list = mock.Mock()
-        (self._base_heat_backend._heat_client.stacks.list.
-         return_value) = list_
-        result = self._base_heat_backend._get_stacks()
-        self.assertEqual(result, len(list_))
-
-    def test_wait_stacks_fails(self):
-        raised_exception = exceptions.ArgusHeatTeardown(
-            "All stacks failed to be deleted in time!")
-        self._base_heat_backend._get_stacks = mock.Mock()
-        self._base_heat_backend._get_stacks.return_value = 0
-        with self.assertRaises(exceptions.ArgusHeatTeardown) as ex:
-            self._base_heat_backend._wait_stacks()
-        self.assertEqual(ex.exception.message, str(raised_exception))
+    def test_stack_exists(self):
+        self._base_heat_backend._name = "fake name"
+        stacks = self._base_heat_backend._heat_client.stacks
+        stacks.list.return_value = iter([mock.sentinel.stack])
+
+        self.assertTrue(self._base_heat_backend._stack_exists())
+        stacks.list.assert_called_once_with(filters={'name': "fake name"},
+                                            limit=1)
+
+        stacks.list.return_value = iter([])
+        self.assertFalse(self._base_heat_backend._stack_exists())
+
+    def _fake_stack(self, status):
+        stack = mock.Mock()
+        stack.stack_status = status
+        return stack
 
     @mock.patch("time.sleep", return_value=None)
-    def test_wait_stacks(self, _):
-        self._base_heat_backend._get_stacks = mock.Mock()
-        self._base_heat_backend._get_stacks.side_effect = [1, 1, 0]
-        result = self._base_heat_backend._wait_stacks(retry_delay=1,
-                                                      retry_count=5)
-        self.assertEqual(result, None)
-        self.assertEqual(self._base_heat_backend._get_stacks.call_count, 3)
-
-    def test_delete_floating_ip_fails(self):
+    def test_wait_stack_deleted(self, mock_sleep):
+        stacks = self._base_heat_backend._heat_client.stacks
+        stacks.get.side_effect = [
+            self._fake_stack("DELETE_IN_PROGRESS"),
+            self._fake_stack("DELETE_IN_PROGRESS"),
+            exc.HTTPNotFound(),
+        ]
+
+        self._base_heat_backend._wait_stack_deleted(retry_count=5,
+                                                    retry_delay=1)
+
+        self.assertEqual(stacks.get.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_wait_stack_deleted_complete(self):
+        stacks = self._base_heat_backend._heat_client.stacks
+        stacks.get.return_value = self._fake_stack(
+            heat_backend.STACK_DELETED_STATUS)
+
+        self._base_heat_backend._wait_stack_deleted()
+
+        stacks.get.assert_called_once_with(self._base_heat_backend._name)
+
+    def test_wait_stack_deleted_fails(self):
+        stacks = self._base_heat_backend._heat_client.stacks
+        stacks.get.return_value = self._fake_stack(
+            heat_backend.STACK_DELETE_FAILED_STATUS)
+
+        self.assertRaises(exceptions.ArgusHeatTeardown,
+                          self._base_heat_backend._wait_stack_deleted)
+
+    @mock.patch("time.sleep", return_value=None)
+    def test_wait_stack_deleted_timeout(self, _):
+        stacks = self._base_heat_backend._heat_client.stacks
+        stacks.get.return_value = self._fake_stack("DELETE_IN_PROGRESS")
+
+        self.assertRaises(exceptions.ArgusHeatTeardown,
+                          self._base_heat_backend._wait_stack_deleted,
+                          retry_count=0, retry_delay=1)
+
+    def test_delete_floating_ip(self):
         (self._base_heat_backend._manager.floating_ips_client.
          delete_floating_ip) = mock.Mock()
         self._base_heat_backend._floating_ip_resource = {"id": mock.sentinel}
         self._base_heat_backend._search_resource_until_status = mock.Mock()
-        (self._base_heat_backend._search_resource_until_status.
-         side_effect) = exceptions.ArgusError
 
         self._base_heat_backend._delete_floating_ip()
 
+        (self._base_heat_backend._manager.floating_ips_client.
+         delete_floating_ip.assert_called_once_with(mock.sentinel))
+        self.assertFalse(
+            self._base_heat_backend._search_resource_until_status.called)
+
     def test_search_resoutce_until_status_http_error(self):
         self._base_heat_backend._name = "fake name"
         raised_exception = exceptions.ArgusError('Stack not found: %s' %
@@ -365,28 +511,83 @@ class TestBaseHeatBackend(unittest.TestCase):
                 resource_name, status=status_completed)
         self.assertEqual(ex.exception.message, str(exp))
 
-    def test_internal_id(self):
-        def fake_function():
-            return mock.sentinel
-        mock_search_until_status = mock.Mock()
-        mock_search_until_status.return_value = fake_function
-        (self._base_heat_backend.
-         _search_resource_until_status) = mock_search_until_status
-        result = self._base_heat_backend._internal_id()
-        self.assertEqual(result, fake_function())
-        (self._base_heat_backend._search_resource_until_status.
-         assert_called_once_with(heat_backend.OS_NOVA_RESOURCE))
+    @staticmethod
+    def _fake_resource(resource_type, status, physical_resource_id=None):
+        resource = mock.Mock()
+        resource.resource_type = resource_type
+        resource.resource_status = status
+        resource.physical_resource_id = physical_resource_id
+        return resource
+
+    @mock.patch("time.sleep", return_value=None)
+    def test_resources(self, mock_sleep):
+        completed = heat_backend.RESOURCE_COMPLETED_STATUS
+        resources = self._base_heat_backend._heat_client.resources
+        resources.list.side_effect = [
+            [self._fake_resource(heat_backend.OS_NOVA_RESOURCE, completed),
+             self._fake_resource(heat_backend.OS_NEUTRON_FLOATING_IP,
+                                 "CREATE_IN_PROGRESS")],
+            [self._fake_resource(heat_backend.OS_NOVA_RESOURCE, completed,
+                                 "fake server id"),
+             self._fake_resource(heat_backend.OS_NEUTRON_FLOATING_IP,
+                                 completed, "fake floating ip id")],
+        ]
+        floating_ips_client = (self._base_heat_backend._manager.
+                               floating_ips_client)
+        floating_ips_client.show_floating_ip.return_value = {
+            "floating_ip": {"ip": "fake ip"}}
+
+        self.assertEqual(self._base_heat_backend.internal_instance_id(),
+                         "fake server id")
+        self.assertEqual(self._base_heat_backend.floating_ip(), "fake ip")
+
+        self.assertEqual(resources.list.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+        floating_ips_client.show_floating_ip.assert_called_once_with(
+            "fake floating ip id")
+
+    def test_list_resources_batch(self):
+        self._base_heat_backend._batch = mock.Mock()
+        self._base_heat_backend._batch_slot = 1
+        resources = []
+        for name in ("server_0", "server_1"):
+            resource = self._fake_resource(
+                heat_backend.OS_NOVA_RESOURCE,
+                heat_backend.RESOURCE_COMPLETED_STATUS, name)
+            resource.resource_name = name
+            resources.append(resource)
+        self._base_heat_backend._heat_client.resources.list.return_value = (
+            resources)
+
+        index = self._base_heat_backend._list_resources()
+
+        self.assertEqual(index[heat_backend.OS_NOVA_RESOURCE],
+                         [resources[1]])
+
+    def test_wait_for_resources_missing(self):
+        self._base_heat_backend._name = "fake name"
+        resources = self._base_heat_backend._heat_client.resources
+        resources.list.return_value = [self._fake_resource(
+            heat_backend.OS_NOVA_RESOURCE,
+            heat_backend.RESOURCE_COMPLETED_STATUS)]
+
+        with self.assertRaises(exceptions.ArgusError) as ex:
+            self._base_heat_backend._wait_for_resources(
+                heat_backend.AWAITED_RESOURCES)
+        self.assertEqual(str(ex.exception),
+                         "No resource %s found with name fake name"
+                         % heat_backend.OS_NEUTRON_FLOATING_IP)
 
     def test_internal_instance_id(self):
         self._base_heat_backend._internal_id = mock.sentinel
         result = self._base_heat_backend.internal_instance_id()
         self.assertEqual(result, self._base_heat_backend._internal_id)
 
-    @mock.patch('argus.backends.heat.heat_backend.BaseHeatBackend.'
-                '_search_resource_until_status')
-    def test_floating_ip_resource(self, _):
+    def test_floating_ip_resource(self):
         def fake_function():
             return mock.sentinel
+        self._base_heat_backend._resources = {
+            heat_backend.OS_NEUTRON_FLOATING_IP: [mock.Mock()]}
         mock_floating = mock.Mock()
         mock_floating.show_floating_ip.return_value = {
             "floating_ip": fake_function
@@ -0,0 +1,94 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import shutil
+import tempfile
+import unittest
+
+from argus.backends.replay import replay_backend
+from argus.client import transcript
+from argus import exceptions
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class FakeBackend(object):
+
+    from_golden_image = True
+
+    def floating_ip(self):
+        return "fake ip"
+
+    def get_mtu(self):
+        return 1450
+
+    def instance_server(self):
+        return {"id": "fake id", "name": "fake name"}
+
+    def public_key(self):
+        raise NotImplementedError()
+
+    def private_key(self):
+        return object()
+
+
+class TestReplayBackend(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._transcript = transcript.Transcript(
+            transcript.transcript_path(directory, "fake"))
+        patcher = mock.patch('argus.client.transcript.'
+                             'get_scenario_transcript',
+                             return_value=self._transcript)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_record_backend(self):
+        replay_backend.record_backend(FakeBackend(), self._transcript)
+
+        backend = replay_backend.ReplayBackend("fake")
+        backend.setup_instance()
+        self.assertTrue(backend.from_golden_image)
+        self.assertEqual(backend.floating_ip(), "fake ip")
+        self.assertEqual(backend.get_mtu(), 1450)
+        self.assertEqual(backend.instance_server()["name"], "fake name")
+        # The failing and the unserializable values aren't recorded.
+        self.assertRaises(exceptions.ArgusTranscriptError,
+                          backend.public_key)
+        self.assertRaises(exceptions.ArgusTranscriptError,
+                          backend.private_key)
+
+    def test_setup_instance_without_values(self):
+        backend = replay_backend.ReplayBackend("fake")
+        backend.setup_instance()
+        self.assertFalse(backend.from_golden_image)
+        backend.reboot_instance()
+        backend.cleanup()
+
+    @mock.patch('argus.client.windows.get_remote_client')
+    def test_get_remote_client(self, mock_get_remote_client):
+        self._transcript.record_value("floating_ip", "fake ip")
+        backend = replay_backend.ReplayBackend("fake")
+
+        backend.get_remote_client("user", "pass")
+        mock_get_remote_client.assert_called_once_with(
+            "fake ip", "user", "pass", transport_protocol="http")
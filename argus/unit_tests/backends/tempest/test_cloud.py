@@ -335,7 +335,7 @@ class TestRescueWindowsBackend(unittest.TestCase):
 
     @mock.patch('argus.backends.tempest.tempest_backend.'
                 'BaseWindowsTempestBackend.internal_instance_id')
-    @mock.patch('tempest.common.waiters.wait_for_server_status')
+    @mock.patch('argus.backends.waiters.wait_for_server_status')
     def test_rescue_server(self, mock_waiters, mock_internal_instance_id):
         self._rescuse_windows_backend._manager.servers_client = mock.Mock()
         mock_internal_instance_id.return_value = "fake id"
@@ -352,7 +352,7 @@ class TestRescueWindowsBackend(unittest.TestCase):
 
     @mock.patch('argus.backends.tempest.tempest_backend.'
                 'BaseWindowsTempestBackend.internal_instance_id')
-    @mock.patch('tempest.common.waiters.wait_for_server_status')
+    @mock.patch('argus.backends.waiters.wait_for_server_status')
     def test_unrescue_server(self, mock_waiters, mock_internal_instance_id):
         self._rescuse_windows_backend._manager.servers_client = mock.Mock()
         mock_internal_instance_id.return_value = "fake id"
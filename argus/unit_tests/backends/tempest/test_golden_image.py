@@ -0,0 +1,164 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import unittest
+
+import requests
+
+from argus.backends.tempest import golden_image
+from argus import exceptions
+from argus.unit_tests import test_utils
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class FakeResponseBody(dict):
+    """A response body, which also holds the response headers."""
+
+    def __init__(self, body, headers):
+        super(FakeResponseBody, self).__init__(body)
+        self.response = headers
+
+
+class FakeComputeClient(object):
+    """Fake compute client, for both the images and the servers API.
+
+    The created images become active after `build_polls` checks.
+    """
+
+    def __init__(self, build_polls=1, final_status="ACTIVE"):
+        self.images = {}
+        self.snapshots = []
+        self._build_polls = build_polls
+        self._final_status = final_status
+        self._polls = 0
+
+    def list_images(self, detail=False, **params):
+        images = [image for image in self.images.values()
+                  if image["name"] == params.get("name")]
+        return {"images": images}
+
+    def show_image(self, image_id):
+        self._polls += 1
+        if self._polls >= self._build_polls:
+            self.images[image_id]["status"] = self._final_status
+        return {"image": self.images[image_id]}
+
+    def create_image(self, server_id, name, metadata=None):
+        image_id = "image-{}".format(len(self.images))
+        self.images[image_id] = {"id": image_id, "name": name,
+                                 "status": "SAVING", "metadata": metadata}
+        self.snapshots.append(server_id)
+        return FakeResponseBody(
+            {}, {"location": "http://compute/images/" + image_id})
+
+
+class TestGoldenImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self._client = FakeComputeClient(build_polls=2)
+        self._cache = golden_image.GoldenImageCache(
+            self._client, self._client, interval=0.01, timeout=5)
+        self.addCleanup(golden_image._IMAGES.clear)
+
+    @mock.patch('requests.head')
+    def test_golden_image_name(self, mock_head):
+        self.addCleanup(golden_image._IDENTITIES.clear)
+        mock_head.return_value.headers = {"ETag": '"v1"'}
+        name = golden_image.golden_image_name("fake image")
+        self.assertTrue(name.startswith(golden_image.GOLDEN_IMAGE_PREFIX))
+        self.assertEqual(name, golden_image.golden_image_name("fake image"))
+        self.assertNotEqual(name,
+                            golden_image.golden_image_name("other image"))
+        with test_utils.ConfPatcher('git_command', 'git fetch', 'argus'):
+            self.assertNotEqual(
+                name, golden_image.golden_image_name("fake image"))
+
+    @mock.patch('requests.head')
+    def test_golden_image_name_installer_changed(self, mock_head):
+        self.addCleanup(golden_image._IDENTITIES.clear)
+        mock_head.return_value.headers = {"ETag": '"v1"'}
+        name = golden_image.golden_image_name("fake image")
+        mock_head.assert_called_once_with(
+            "http://www.cloudbase.it/downloads/"
+            "CloudbaseInitSetup_Beta_x64.msi",
+            allow_redirects=True, timeout=golden_image.IDENTITY_TIMEOUT)
+
+        golden_image._IDENTITIES.clear()
+        mock_head.return_value.headers = {"Last-Modified": "yesterday"}
+        self.assertNotEqual(name,
+                            golden_image.golden_image_name("fake image"))
+
+    @mock.patch('datetime.date')
+    @mock.patch('requests.head')
+    def test_golden_image_name_unknown_installer(self, mock_head,
+                                                 mock_date):
+        self.addCleanup(golden_image._IDENTITIES.clear)
+        mock_head.side_effect = requests.ConnectionError("offline")
+        mock_date.today.return_value.isoformat.return_value = "2017-01-01"
+        url = "http://fake/installer.msi"
+
+        with test_utils.LogSnatcher('argus.backends.tempest.'
+                                    'golden_image') as snatcher:
+            self.assertEqual(golden_image._download_identity(url),
+                             "2017-01-01")
+        self.assertEqual(len(snatcher.output), 2)
+        # The identity is found once per process.
+        self.assertEqual(golden_image._download_identity(url),
+                         "2017-01-01")
+        self.assertEqual(mock_head.call_count, 1)
+
+    def test_find_missing(self):
+        self.assertIsNone(self._cache.find("fake name"))
+
+    def test_create_and_find(self):
+        image_id = self._cache.create("fake server", "fake name")
+
+        self.assertEqual(image_id, "image-0")
+        self.assertEqual(self._client.images[image_id]["status"], "ACTIVE")
+        self.assertEqual(self._cache.find("fake name"), image_id)
+
+    def test_create_once(self):
+        first = self._cache.create("fake server", "fake name")
+        second = self._cache.create("other server", "fake name")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self._client.snapshots, ["fake server"])
+
+    def test_find_existing(self):
+        self._client.images["fake id"] = {
+            "id": "fake id", "name": "fake name", "status": "ACTIVE"}
+
+        self.assertEqual(self._cache.find("fake name"), "fake id")
+
+    def test_create_error(self):
+        client = FakeComputeClient(final_status="ERROR")
+        cache = golden_image.GoldenImageCache(client, client, interval=0.01)
+
+        self.assertRaises(exceptions.ArgusError,
+                          cache.create, "fake server", "fake name")
+
+    def test_create_timeout(self):
+        client = FakeComputeClient(build_polls=1000)
+        cache = golden_image.GoldenImageCache(client, client,
+                                              interval=0.01, timeout=0.05)
+
+        self.assertRaises(exceptions.ArgusTimeoutError,
+                          cache.create, "fake server", "fake name")
@@ -19,6 +19,10 @@
 import unittest
 from argus.backends.tempest import manager
 from argus import exceptions
+from argus import util
+
+with util.restore_excepthook():
+    from tempest.lib import exceptions as lib_exceptions
 
 try:
     import unittest.mock as mock
@@ -29,7 +33,7 @@ except ImportError:
 class TestAPIManager(unittest.TestCase):
 
     @mock.patch('tempest.clients.Manager')
-    @mock.patch('tempest.common.waiters')
+    @mock.patch('argus.backends.waiters')
     @mock.patch('tempest.common.credentials_factory.get_credentials_provider')
     def setUp(self, mock_credentials, mock_waiters, mock_clients):
         self._api_manager = manager.APIManager()
@@ -56,7 +60,48 @@ class TestAPIManager(unittest.TestCase):
         self._api_manager.create_keypair("fake name")
         mock_keypair.assert_called_once()
 
-    @mock.patch('tempest.common.waiters.wait_for_server_status')
+    def test_create_security_group_rule(self):
+        client = self._api_manager.security_group_rules_client = mock.Mock()
+        client.create_security_group_rule.return_value = {
+            "security_group_rule": {"id": "fake rule"}}
+
+        rule = self._api_manager.create_security_group_rule(
+            "fake group", ip_protocol="tcp", from_port=22, to_port=22,
+            cidr="0.0.0.0/0")
+
+        self.assertEqual(rule, {"id": "fake rule"})
+        client.create_security_group_rule.assert_called_once_with(
+            parent_group_id="fake group", ip_protocol="tcp", from_port=22,
+            to_port=22, cidr="0.0.0.0/0")
+
+    def _test_create_existing_security_group_rule(self, rules):
+        client = self._api_manager.security_group_rules_client = mock.Mock()
+        client.create_security_group_rule.side_effect = (
+            lib_exceptions.Conflict())
+        groups_client = self._api_manager.security_groups_client = mock.Mock()
+        groups_client.show_security_group.return_value = {
+            "security_group": {"rules": rules}}
+        return self._api_manager.create_security_group_rule(
+            "fake group", ip_protocol="tcp", from_port=22, to_port=22,
+            cidr="0.0.0.0/0")
+
+    def test_create_existing_security_group_rule(self):
+        existing = {"id": "fake rule", "ip_protocol": "tcp",
+                    "from_port": 22, "to_port": 22,
+                    "ip_range": {"cidr": "0.0.0.0/0"}}
+        other = dict(existing, id="other rule", from_port=3389,
+                     to_port=3389)
+
+        rule = self._test_create_existing_security_group_rule(
+            [other, existing])
+
+        self.assertEqual(rule, existing)
+
+    def test_create_conflicting_security_group_rule(self):
+        self.assertRaises(lib_exceptions.Conflict,
+                          self._test_create_existing_security_group_rule, [])
+
+    @mock.patch('argus.backends.waiters.wait_for_server_status')
     def test_reboot_instance(self, mock_waiters):
         mock_servers_client = mock.Mock()
         mock_servers_client.reboot_server.return_value = None
@@ -104,6 +149,22 @@ class TestAPIManager(unittest.TestCase):
 
         self.assertEqual(2, mock__instance_output.call_count)
 
+    def test_follow_instance_output(self):
+        self._api_manager._instance_output = mock.Mock(
+            return_value="fake line 1\nfake line 2\n")
+
+        first = self._api_manager.follow_instance_output("fake id")
+        second = self._api_manager.follow_instance_output("fake id")
+        other = self._api_manager.follow_instance_output("other id")
+
+        self.assertEqual(first, ["fake line 1\n", "fake line 2\n"])
+        self.assertEqual(second, [])
+        self.assertEqual(other, first)
+        self._api_manager._instance_output.assert_has_calls([
+            mock.call("fake id", manager.OUTPUT_SIZE),
+            mock.call("fake id", manager.OUTPUT_SIZE),
+            mock.call("other id", manager.OUTPUT_SIZE)])
+
     def test_instance_server(self):
         mock_servers_client = mock.Mock()
         mock_servers_client.show_server.return_value = {
@@ -154,3 +215,64 @@ class TestKeypair(unittest.TestCase):
         self._key_pair.destroy()
         (self._key_pair._manager.keypairs_client.delete_keypair.
          assert_called_once_with("fake name"))
+
+
+class TestConsoleTail(unittest.TestCase):
+
+    def setUp(self):
+        self._log = []
+        self._fetch = mock.Mock(side_effect=self._tail)
+        self._console_tail = manager.ConsoleTail(self._fetch, anchor_size=2)
+
+    def _tail(self, limit):
+        return "".join(self._log[-limit:])
+
+    def _write(self, count, start=0):
+        self._log.extend("line {}\n".format(index)
+                         for index in range(start, start + count))
+
+    def test_read_first(self):
+        self._write(300)
+
+        lines = self._console_tail.read(limit=100)
+
+        self.assertEqual(len(lines), 300)
+        self.assertEqual(self._fetch.call_count, 3)
+
+    def test_read_new_lines(self):
+        self._write(10)
+        self._console_tail.read(limit=100)
+        self._fetch.reset_mock()
+        self._write(5, start=10)
+
+        lines = self._console_tail.read(limit=100)
+
+        self.assertEqual(lines, ["line {}\n".format(index)
+                                 for index in range(10, 15)])
+        self._fetch.assert_called_once_with(100)
+
+    def test_read_many_new_lines(self):
+        self._write(10)
+        self._console_tail.read(limit=100)
+        self._write(250, start=10)
+
+        lines = self._console_tail.read(limit=100)
+
+        self.assertEqual(len(lines), 250)
+        self.assertEqual(lines[0], "line 10\n")
+
+    def test_read_incomplete_line(self):
+        self._write(2)
+        self._log.append("partial")
+
+        self.assertEqual(len(self._console_tail.read()), 2)
+
+        self._log[-1] = "partial line\n"
+        self.assertEqual(self._console_tail.read(), ["partial line\n"])
+
+    def test_read_reset_log(self):
+        self._write(5)
+        self._console_tail.read()
+        self._log = ["new line\n"]
+
+        self.assertEqual(self._console_tail.read(), ["new line\n"])
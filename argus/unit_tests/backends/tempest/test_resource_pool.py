@@ -0,0 +1,139 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from argus.backends.tempest import resource_pool
+from argus.unit_tests import test_utils
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+def _fake_manager(username="fake user"):
+    manager = mock.Mock()
+    credentials = manager.primary_credentials.return_value
+    credentials.username = username
+    credentials.project_name = "fake project"
+    return manager
+
+
+class TestResourcePool(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._directory)
+        self._pool = resource_pool.ResourcePool(self._directory)
+        self._manager = _fake_manager()
+
+    def _records(self):
+        with open(self._pool._path) as stream:
+            return json.load(stream)
+
+    @test_utils.ConfPatcher('share_resources', False, 'argus')
+    def test_is_enabled_disabled(self):
+        self.assertFalse(resource_pool.is_enabled())
+
+    @test_utils.ConfPatcher('share_resources', True, 'argus')
+    @mock.patch('argus.backends.tempest.resource_pool.tempest_config')
+    def test_is_enabled_dynamic_credentials(self, mock_tempest_config):
+        mock_tempest_config.CONF.auth.use_dynamic_credentials = True
+        self.assertFalse(resource_pool.is_enabled())
+
+        mock_tempest_config.CONF.auth.use_dynamic_credentials = False
+        self.assertTrue(resource_pool.is_enabled())
+
+    def test_acquire_creates_once(self):
+        create = mock.Mock(return_value={"id": "fake group"})
+
+        first = self._pool.acquire(resource_pool.SECURITY_GROUP,
+                                   self._manager, create)
+        second = self._pool.acquire(resource_pool.SECURITY_GROUP,
+                                    _fake_manager(), create)
+
+        self.assertIs(first, second)
+        create.assert_called_once_with()
+        self.assertEqual(self._records(), [{
+            "kind": resource_pool.SECURITY_GROUP,
+            "id": "fake group",
+            "credentials": ["fake user", "fake project"],
+        }])
+
+    def test_acquire_per_credentials(self):
+        create = mock.Mock(side_effect=[{"id": "first"}, {"id": "second"}])
+
+        self._pool.acquire(resource_pool.SECURITY_GROUP,
+                           self._manager, create)
+        self._pool.acquire(resource_pool.SECURITY_GROUP,
+                           _fake_manager("other user"), create)
+
+        self.assertEqual(create.call_count, 2)
+
+    def test_teardown(self):
+        keypair = mock.Mock()
+        keypair.name = "fake keypair"
+        self._pool.acquire(resource_pool.KEYPAIR, self._manager,
+                           mock.Mock(return_value=keypair))
+        self._pool.acquire(resource_pool.SECURITY_GROUP, self._manager,
+                           mock.Mock(return_value={"id": "fake group"}))
+        self._pool.release(resource_pool.KEYPAIR, self._manager)
+        self._pool.release(resource_pool.SECURITY_GROUP, self._manager)
+
+        self._pool.teardown()
+
+        self._manager.keypairs_client.delete_keypair.assert_called_once_with(
+            "fake keypair")
+        (self._manager.security_groups_client.delete_security_group.
+         assert_called_once_with("fake group"))
+        self.assertFalse(os.path.exists(self._pool._path))
+
+    def test_teardown_failure_keeps_records(self):
+        self._pool.acquire(resource_pool.SECURITY_GROUP, self._manager,
+                           mock.Mock(return_value={"id": "fake group"}))
+        (self._manager.security_groups_client.delete_security_group.
+         side_effect) = ValueError("fake error")
+
+        self._pool.teardown()
+
+        self.assertEqual([record["id"] for record in self._records()],
+                         ["fake group"])
+
+    @mock.patch('argus.backends.tempest.resource_pool._is_running')
+    def test_cleanup_leftovers(self, mock_is_running):
+        mock_is_running.return_value = False
+        leftovers = os.path.join(
+            self._directory, resource_pool.RECORDS_PREFIX + "1234.json")
+        other = {"kind": resource_pool.KEYPAIR, "id": "other keypair",
+                 "credentials": ["other user", "fake project"]}
+        with open(leftovers, "w") as stream:
+            json.dump([{"kind": resource_pool.KEYPAIR, "id": "old keypair",
+                        "credentials": ["fake user", "fake project"]},
+                       other], stream)
+
+        self._pool.acquire(resource_pool.SECURITY_GROUP, self._manager,
+                           mock.Mock(return_value={"id": "fake group"}))
+
+        self._manager.keypairs_client.delete_keypair.assert_called_once_with(
+            "old keypair")
+        with open(leftovers) as stream:
+            self.assertEqual(json.load(stream), [other])
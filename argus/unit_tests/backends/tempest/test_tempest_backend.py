@@ -18,10 +18,13 @@
 
 import copy
 import unittest
+from argus.backends.tempest import resource_pool
 from argus.backends.tempest import tempest_backend
+from argus import exceptions
 from argus.unit_tests import test_utils
 from argus import util
 
+from tempest.lib import exceptions as lib_exceptions
 
 try:
     import unittest.mock as mock
@@ -85,7 +88,7 @@ class TestBaseTempestBackend(unittest.TestCase):
          update_subnet.assert_called_once())
 
     @mock.patch('argus.util.rand_name', return_value="fake-server")
-    @mock.patch('tempest.common.waiters.wait_for_server_status')
+    @mock.patch('argus.backends.waiters.wait_for_server_status')
     def _test_create_server(self, mock_waiters, mock_util,
                             kwargs, wait_until=None):
         fake_server = {
@@ -171,27 +174,26 @@ class TestBaseTempestBackend(unittest.TestCase):
         self._base_tempest_backend._manager.get_mtu.assert_called_once()
 
     def test__add_security_group_exceptions(self):
-        mock_security_group_rules_client = mock.Mock()
-        (mock_security_group_rules_client.create_security_group_rule
-         .return_value) = {"security_group_rule": "fake sg_rule"}
+        mock_create_rule = mock.Mock()
         (self._base_tempest_backend._manager
-         .security_group_rules_client) = mock_security_group_rules_client
+         .create_security_group_rule) = mock_create_rule
 
-        result = (self._base_tempest_backend.
-                  _add_security_group_exceptions("fake secgroup_id"))
-        for item in result:
-            self.assertEqual(item, "fake sg_rule")
+        actions = (self._base_tempest_backend.
+                   _add_security_group_exceptions("fake secgroup_id"))
+        for action in actions:
+            action()
 
+        self.assertEqual(mock_create_rule.call_count,
+                         len(tempest_backend.SECURITY_GROUP_RULESETS))
+        mock_create_rule.assert_any_call(
+            "fake secgroup_id", ip_protocol="icmp", from_port=-1,
+            to_port=-1, cidr="0.0.0.0/0")
+
+    @test_utils.ConfPatcher('api_workers', 3, 'argus')
     def test__create_security_groups(self):
         fake_security_group = {
             "security_group": {
-                "id": [
-                    {"id": 1},
-                    {"id": 2},
-                    {"id": 3},
-                    {"id": 4},
-                    {"id": 5}
-                ],
+                "id": "fake id",
                 "name": "fake name"
             }
         }
@@ -204,7 +206,9 @@ class TestBaseTempestBackend(unittest.TestCase):
         self._base_tempest_backend._security_groups_rules = []
 
         self._base_tempest_backend._add_security_group_exceptions = mock.Mock(
-            return_value=fake_security_group["security_group"]["id"])
+            return_value=[
+                mock.Mock(return_value={"id": index})
+                for index in range(1, 6)])
 
         self._base_tempest_backend._manager.servers_client = mock.Mock()
         self._base_tempest_backend.internal_instance_id = mock.Mock(
@@ -215,13 +219,84 @@ class TestBaseTempestBackend(unittest.TestCase):
         self.assertEqual(result, fake_security_group["security_group"])
         (self._base_tempest_backend._manager.security_groups_client.
          create_security_group.assert_called_once())
+        (self._base_tempest_backend._add_security_group_exceptions.
+         assert_called_once_with("fake id"))
         self._base_tempest_backend.internal_instance_id.assert_called_once()
         (self._base_tempest_backend._manager.servers_client.add_security_group
-         .assert_called_once())
+         .assert_called_once_with(server_id="fake ip", name="fake name"))
         self.assertEqual(self._base_tempest_backend._security_groups_rules,
                          [1, 2, 3, 4, 5])
 
-    @mock.patch('tempest.common.waiters.wait_for_server_termination')
+    @mock.patch('argus.backends.tempest.resource_pool.release')
+    @mock.patch('argus.backends.tempest.resource_pool.'
+                'acquire_security_group')
+    @mock.patch('argus.backends.tempest.resource_pool.acquire_keypair')
+    @mock.patch('argus.backends.tempest.resource_pool.is_enabled')
+    def test_shared_resources(self, mock_is_enabled, mock_acquire_keypair,
+                              mock_acquire_security_group, mock_release):
+        mock_is_enabled.return_value = True
+        mock_acquire_security_group.return_value = {"name": "fake name"}
+        backend = self._base_tempest_backend
+        backend._manager = mock.Mock()
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+
+        backend._keypair = backend._create_keypair()
+        backend._security_group = backend._create_security_groups()
+        backend.cleanup()
+
+        self.assertFalse(backend._manager.create_keypair.called)
+        mock_acquire_security_group.assert_called_once_with(
+            backend._manager, tempest_backend.SECURITY_GROUP_RULESETS)
+        backend._manager.servers_client.add_security_group.\
+            assert_called_once_with(server_id="fake id", name="fake name")
+        self.assertFalse(mock_acquire_keypair.return_value.destroy.called)
+        mock_release.assert_has_calls([
+            mock.call(resource_pool.KEYPAIR, backend._manager),
+            mock.call(resource_pool.SECURITY_GROUP, backend._manager)])
+
+    @mock.patch('argus.backends.tempest.warm_pool.get_pool')
+    @mock.patch('argus.backends.tempest.warm_pool.is_enabled')
+    def test_get_warm_server(self, mock_is_enabled, mock_get_pool):
+        mock_is_enabled.return_value = True
+        backend = self._base_tempest_backend
+        backend.userdata = backend.metadata = None
+        backend._availability_zone = None
+        backend._keypair = mock.Mock()
+        backend._keypair.name = "fake keypair"
+        backend._manager = mock.Mock()
+        (backend._manager.primary_credentials.return_value.
+         network) = {"id": "fake network"}
+        mock_get_pool.return_value.get.return_value = {"id": "fake id"}
+
+        server = backend._get_warm_server()
+
+        self.assertEqual(server, {"id": "fake id"})
+        mock_get_pool.assert_called_once_with(backend._manager, {
+            "imageRef": backend.image_ref,
+            "flavorRef": backend.flavor_ref,
+            "key_name": "fake keypair",
+            "disk_config": "AUTO",
+            "networks": [{"uuid": "fake network"}],
+        })
+
+    @mock.patch('argus.backends.tempest.warm_pool.get_pool')
+    @mock.patch('argus.backends.tempest.warm_pool.is_enabled')
+    def test_get_warm_server_with_userdata(self, mock_is_enabled,
+                                           mock_get_pool):
+        mock_is_enabled.return_value = True
+
+        self.assertIsNone(self._base_tempest_backend._get_warm_server())
+        self.assertFalse(mock_get_pool.called)
+
+    def test_ignore_not_found(self):
+        action = mock.Mock(side_effect=lib_exceptions.NotFound)
+
+        result = self._base_tempest_backend._ignore_not_found(action)()
+
+        self.assertIsNone(result)
+        action.assert_called_once_with()
+
+    @mock.patch('argus.backends.waiters.wait_for_server_termination')
     def _test_cleanup(self, mock_waiters, security_groups_rules=None,
                       security_group=None, server=None, floating_ip=None,
                       keypair=None):
@@ -316,6 +391,41 @@ class TestBaseTempestBackend(unittest.TestCase):
     def test_cleanup_credentials(self):
         self._test_cleanup()
 
+    @mock.patch('argus.backends.waiters.wait_for_server_termination')
+    def test_cleanup_failed_rule(self, _):
+        backend = self._base_tempest_backend
+        backend._security_groups_rules = ["rule 1"]
+        (backend._manager.security_group_rules_client.
+         delete_security_group_rule) = mock.Mock(
+             side_effect=exceptions.ArgusError("fake error"))
+        backend._manager.servers_client = mock.Mock()
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+        backend._server = "fake server"
+        backend._manager.cleanup_credentials = mock.Mock()
+
+        backend.cleanup()
+
+        backend._manager.servers_client.delete_server.assert_called_once_with(
+            "fake id")
+        backend._manager.cleanup_credentials.assert_called_once_with()
+
+    @mock.patch('argus.backends.tempest.resource_pool.release')
+    def test_cleanup_without_shared_resources(self, mock_release):
+        backend = self._base_tempest_backend
+        # As for the back-ends which don't call __init__.
+        del backend._shared_resources
+        backend._security_groups_rules = []
+        backend._security_group = None
+        backend._server = None
+        backend._floating_ip = None
+        backend._keypair = mock.Mock()
+        backend._manager.cleanup_credentials = mock.Mock()
+
+        backend.cleanup()
+
+        backend._keypair.destroy.assert_called_once_with()
+        self.assertFalse(mock_release.called)
+
     def test_instance_setup_create_server(self):
         expected_logging = ["Creating server..."]
         self._base_tempest_backend._configure_networking = mock.Mock()
@@ -337,6 +447,65 @@ class TestBaseTempestBackend(unittest.TestCase):
         self._base_tempest_backend._assign_floating_ip.assert_called_once()
         self._base_tempest_backend._create_security_groups.assert_called_once()
 
+    @test_utils.ConfPatcher('delete_instance', False, 'argus')
+    @mock.patch('argus.checkpoint.get_journal')
+    def test_instance_setup_reuse_instance(self, mock_get_journal):
+        journal = mock_get_journal.return_value
+        journal.instance = "fake id"
+        journal.resources = {
+            "floating_ip": {"id": "fake ip id", "ip": "fake ip"},
+            "keypair": {"name": "fake name", "public_key": "fake public",
+                        "private_key": "fake private"},
+        }
+        servers_client = self._base_tempest_backend._manager.servers_client
+        servers_client.show_server.return_value = {
+            "server": {"id": "fake id", "status": "ACTIVE"}}
+        self._base_tempest_backend._create_server = mock.Mock()
+
+        self._base_tempest_backend.setup_instance()
+
+        self.assertFalse(self._base_tempest_backend._create_server.called)
+        self.assertEqual(self._base_tempest_backend.internal_instance_id(),
+                         "fake id")
+        self.assertEqual(self._base_tempest_backend.floating_ip(), "fake ip")
+        self.assertEqual(self._base_tempest_backend.private_key(),
+                         "fake private")
+
+    @test_utils.ConfPatcher('delete_instance', False, 'argus')
+    @mock.patch('argus.checkpoint.get_journal')
+    def test_instance_setup_record_instance(self, mock_get_journal):
+        journal = mock_get_journal.return_value
+        journal.instance = None
+        self._base_tempest_backend._configure_networking = mock.Mock()
+        self._base_tempest_backend._manager.create_keypair = mock.Mock()
+        self._base_tempest_backend._create_server = mock.Mock(
+            return_value={"id": "fake id"})
+        self._base_tempest_backend._assign_floating_ip = mock.Mock(
+            return_value={"ip": "fake ip"})
+        self._base_tempest_backend._create_security_groups = mock.Mock()
+
+        self._base_tempest_backend.setup_instance()
+
+        self.assertEqual(journal.start.call_args[0], ("fake id", ))
+        resources = journal.start.call_args[1]["resources"]
+        self.assertEqual(resources["floating_ip"], {"ip": "fake ip"})
+
+    @test_utils.ConfPatcher('golden_image', True, 'argus')
+    @mock.patch('argus.backends.tempest.golden_image.golden_image_name')
+    @mock.patch('argus.backends.tempest.golden_image.GoldenImageCache')
+    def test_instance_setup_golden_image(self, mock_cache, _):
+        mock_cache.return_value.find.return_value = "golden id"
+        self._base_tempest_backend._configure_networking = mock.Mock()
+        self._base_tempest_backend._manager.create_keypair = mock.Mock()
+        self._base_tempest_backend._create_server = mock.Mock()
+        self._base_tempest_backend._assign_floating_ip = mock.Mock()
+        self._base_tempest_backend._create_security_groups = mock.Mock()
+
+        self._base_tempest_backend.setup_instance()
+
+        self.assertEqual(self._base_tempest_backend.image_ref, "golden id")
+        self.assertTrue(self._base_tempest_backend.from_golden_image)
+
     def test_reboot_instance(self):
         self._base_tempest_backend._manager.reboot_instance = mock.Mock(
             return_value="fake reboot")
@@ -375,6 +544,18 @@ class TestBaseTempestBackend(unittest.TestCase):
         self._base_tempest_backend.internal_instance_id.assert_called_once()
         self._base_tempest_backend._manager.test_instance_output("fake id", 10)
 
+    def test_follow_instance_output(self):
+        backend = self._base_tempest_backend
+        backend._manager.follow_instance_output = mock.Mock(
+            return_value=["fake line\n"])
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+
+        result = backend.follow_instance_output()
+
+        self.assertEqual(result, ["fake line\n"])
+        backend._manager.follow_instance_output.assert_called_once_with(
+            "fake id")
+
     def test_instance_server(self):
         self._base_tempest_backend._manager.instance_server = mock.Mock(
             return_value="fake instance server")
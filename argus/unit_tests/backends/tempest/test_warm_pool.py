@@ -0,0 +1,199 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import threading
+import time
+import unittest
+
+from argus.backends.tempest import warm_pool
+from argus.unit_tests import test_utils
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class FakeServersClient(object):
+    """Fake compute client for the servers, which boot right away.
+
+    When `booted` is given, the servers boot only after it is set.
+    """
+
+    build_interval = 0
+    build_timeout = 5
+
+    def __init__(self, fail=False, booted=None):
+        self.created = []
+        self.deleted = []
+        self._fail = fail
+        self._booted = booted
+        self._lock = threading.Lock()
+
+    def _status(self):
+        if self._booted and not self._booted.is_set():
+            return "BUILD"
+        return "ACTIVE"
+
+    def create_server(self, **kwargs):
+        if self._fail:
+            raise ValueError("fake error")
+        with self._lock:
+            server = {"id": "server-{}".format(len(self.created)),
+                      "kwargs": kwargs}
+            self.created.append(server["id"])
+        return {"server": server}
+
+    def show_server(self, server_id):
+        return {"server": {"id": server_id, "status": self._status()}}
+
+    def list_servers(self, **kwargs):
+        with self._lock:
+            return {"servers": [{"id": server_id, "status": self._status()}
+                                for server_id in self.created
+                                if server_id not in self.deleted]}
+
+    def delete_server(self, server_id):
+        with self._lock:
+            self.deleted.append(server_id)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("The condition was not met in time.")
+        time.sleep(0.01)
+
+
+class TestWarmPool(unittest.TestCase):
+
+    def setUp(self):
+        patcher = test_utils.ConfPatcher('retry_delay', 0, 'argus')
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+
+    def _get_pool(self, client, size=2, ttl=60, claims=None):
+        pool = warm_pool.WarmPool(client, {"imageRef": "fake image"},
+                                  size=size, ttl=ttl, claims=claims)
+        self.addCleanup(pool.shutdown)
+        pool.start()
+        return pool
+
+    def test_fills_the_pool(self):
+        client = FakeServersClient()
+        pool = self._get_pool(client)
+
+        _wait_for(lambda: pool.ready == 2)
+        self.assertEqual(len(client.created), 2)
+
+    def test_get_refills(self):
+        client = FakeServersClient()
+        pool = self._get_pool(client)
+        _wait_for(lambda: pool.ready == 2)
+
+        server = pool.get()
+
+        self.assertEqual(server["kwargs"]["imageRef"], "fake image")
+        _wait_for(lambda: len(client.created) == 3)
+        _wait_for(lambda: pool.ready == 2)
+
+    def test_get_waits_for_booting(self):
+        client = FakeServersClient()
+        pool = self._get_pool(client, size=1)
+
+        self.assertIsNotNone(pool.get())
+
+    def test_get_boot_failure(self):
+        client = FakeServersClient(fail=True)
+        pool = self._get_pool(client, size=1)
+
+        self.assertIsNone(pool.get())
+
+    @mock.patch('argus.backends.tempest.warm_pool.CHECK_INTERVAL', 0.01)
+    def test_expired_instances(self):
+        client = FakeServersClient()
+        self._get_pool(client, size=1, ttl=0.05)
+
+        _wait_for(lambda: len(client.deleted) >= 2)
+        self.assertEqual(client.deleted[:2], client.created[:2])
+
+    def test_shutdown(self):
+        client = FakeServersClient()
+        pool = self._get_pool(client)
+        _wait_for(lambda: pool.ready == 2)
+
+        pool.shutdown()
+
+        self.assertEqual(sorted(client.deleted), sorted(client.created))
+        self.assertIsNone(pool.get())
+
+    def test_shutdown_booting(self):
+        booted = threading.Event()
+        self.addCleanup(booted.set)
+        client = FakeServersClient(booted=booted)
+        pool = self._get_pool(client, size=1)
+        _wait_for(lambda: pool._pending)
+
+        pool.shutdown()
+
+        self.assertEqual(client.deleted, ["server-0"])
+        self.assertFalse(any(thread.is_alive()
+                             for thread in pool._boot_threads))
+        self.assertEqual(client.created, ["server-0"])
+
+    def test_claims(self):
+        client = FakeServersClient()
+        pool = self._get_pool(client, claims=1)
+        _wait_for(lambda: pool.ready == 1)
+
+        self.assertIsNotNone(pool.get())
+        # Every instance was claimed, so the pool doesn't refill.
+        self.assertIsNone(pool.get())
+        self.assertEqual(client.created, ["server-0"])
+
+    def test_expect_claims(self):
+        client = FakeServersClient()
+        pool = self._get_pool(client, claims=0)
+
+        pool.expect_claims(None)
+
+        _wait_for(lambda: pool.ready == 2)
+
+    @mock.patch('argus.backends.tempest.warm_pool._EXPECTED_CLAIMS', None)
+    def test_expect_claims_all_pools(self):
+        mock_pool = mock.Mock()
+        with mock.patch.dict(warm_pool._POOLS, {"fake key": mock_pool}):
+            warm_pool.expect_claims(3)
+
+        mock_pool.expect_claims.assert_called_once_with(3)
+        self.assertEqual(warm_pool._EXPECTED_CLAIMS, 3)
+
+    @test_utils.ConfPatcher('warm_pool_size', 0, 'argus')
+    @mock.patch('argus.backends.tempest.resource_pool.is_enabled')
+    def test_is_enabled_without_size(self, mock_is_enabled):
+        mock_is_enabled.return_value = True
+        self.assertFalse(warm_pool.is_enabled())
+
+    @test_utils.ConfPatcher('warm_pool_size', 2, 'argus')
+    @mock.patch('argus.backends.tempest.resource_pool.is_enabled')
+    def test_is_enabled(self, mock_is_enabled):
+        mock_is_enabled.return_value = False
+        self.assertFalse(warm_pool.is_enabled())
+
+        mock_is_enabled.return_value = True
+        self.assertTrue(warm_pool.is_enabled())
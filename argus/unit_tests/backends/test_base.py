@@ -15,8 +15,13 @@
 
 # pylint: disable=no-value-for-parameter, protected-access, abstract-method
 
+import os
+import shutil
+import tempfile
 import unittest
+
 from argus.backends import base
+from argus.unit_tests import test_utils
 from argus import util
 
 try:
@@ -176,6 +181,33 @@ class TestCloudBackend(unittest.TestCase):
         self._test_save_instance_output(console_output=True,
                                         output_directory="fake directory")
 
+    def test_save_instance_output_follow(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._cloud_backend.follow_instance_output = mock.Mock(
+            side_effect=[[u"line 1\n"], [u"line 2\n"]])
+
+        with test_utils.ConfPatcher('output_directory', directory, 'argus'):
+            self._cloud_backend.save_instance_output()
+            self._cloud_backend.save_instance_output(suffix="fake")
+            paths = [self._cloud_backend._get_serial_log_path(),
+                     self._cloud_backend._get_serial_log_path("fake")]
+
+        for path in paths:
+            with open(path, "rb") as stream:
+                self.assertEqual(stream.read(), b"line 1\nline 2\n")
+
+    def test_save_instance_output_follow_empty(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._cloud_backend.follow_instance_output = mock.Mock(
+            return_value=[])
+
+        with test_utils.ConfPatcher('output_directory', directory, 'argus'):
+            self._cloud_backend.save_instance_output()
+
+        self.assertEqual(os.listdir(directory), [])
+
     def test_instance_output(self):
         result = self._cloud_backend.instance_output()
         self.assertEqual(result, "fake output")
@@ -0,0 +1,147 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from argus.backends import status_cache
+from argus.backends import waiters
+from argus import config as argus_config
+from argus.unit_tests import test_utils
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+CONFIG = argus_config.CONFIG
+
+
+def _server(server_id, status, updated):
+    return {"id": server_id, "status": status, "updated": updated}
+
+
+class TestStatusCache(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._directory)
+        self._path = os.path.join(self._directory, "cache.json")
+        self._client = mock.Mock()
+        self._client.list_servers.return_value = {"servers": [
+            _server("first", "BUILD", "2017-01-01T00:00:01Z"),
+            _server("second", "ACTIVE", "2017-01-01T00:00:02Z"),
+        ]}
+
+    def test_list_servers_shared(self):
+        # Every cache stands for the cache of another process.
+        caches = [status_cache.StatusCache(self._path, max_age=60)
+                  for _ in range(5)]
+        results = []
+
+        def _list_servers(cache):
+            results.append(cache.list_servers(self._client))
+
+        threads = [threading.Thread(target=_list_servers, args=(cache, ))
+                   for cache in caches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self._client.list_servers.assert_called_once_with(detail=True)
+        self.assertEqual(len(results), 5)
+        for servers in results:
+            self.assertEqual(sorted(server["id"] for server in servers),
+                             ["first", "second"])
+
+    @mock.patch('time.time')
+    def test_list_servers_shared_backed_off(self, mock_time):
+        # The pollers of the workers poll at most every
+        # `max_poll_interval` seconds, each at its own time.
+        mock_time.return_value = 1000
+        caches = [status_cache.StatusCache(
+            self._path, max_age=CONFIG.argus.max_poll_interval)
+            for _ in range(5)]
+
+        for index, cache in enumerate(caches):
+            mock_time.return_value = 1000 + index * (
+                CONFIG.argus.max_poll_interval / len(caches))
+            cache.list_servers(self._client)
+
+        self._client.list_servers.assert_called_once_with(detail=True)
+
+    def test_list_servers_max_age(self):
+        cache = status_cache.StatusCache(self._path, max_age=60)
+        cache.list_servers(self._client)
+
+        cache.list_servers(self._client, max_age=0)
+
+        self.assertEqual(self._client.list_servers.call_count, 2)
+
+    def test_list_servers_refresh(self):
+        cache = status_cache.StatusCache(self._path, max_age=0)
+        cache.list_servers(self._client)
+        self._client.list_servers.return_value = {"servers": [
+            _server("first", "DELETED", "2017-01-01T00:00:03Z"),
+        ]}
+
+        servers = cache.list_servers(self._client)
+
+        self._client.list_servers.assert_called_with(
+            detail=True, **{"changes-since": "2017-01-01T00:00:02Z"})
+        self.assertEqual(
+            sorted((server["id"], server["status"]) for server in servers),
+            [("first", "DELETED"), ("second", "ACTIVE")])
+
+    @test_utils.ConfPatcher('share_status_polls', True, 'argus')
+    def test_get_cache(self):
+        self._client.tenant_id = "fake project"
+        with test_utils.ConfPatcher('output_directory', self._directory,
+                                    'argus'):
+            cache = status_cache.get_cache(self._client)
+
+        self.assertTrue(status_cache.is_enabled())
+        self.assertTrue(cache._path.startswith(
+            os.path.join(self._directory, status_cache.CACHE_PREFIX)))
+        self.assertEqual(cache._max_age, CONFIG.argus.max_poll_interval)
+
+    @test_utils.ConfPatcher('share_status_polls', False, 'argus')
+    def test_is_enabled(self):
+        self.assertFalse(status_cache.is_enabled())
+
+    def test_poller_uses_cache(self):
+        cache = mock.Mock()
+        cache.list_servers.return_value = []
+        poller = waiters.ServerPoller(self._client, cache)
+        poller._watchers["first"] = 1
+
+        self.assertEqual(poller._list(), [])
+        cache.list_servers.assert_called_once_with(self._client, None)
+        self.assertFalse(self._client.list_servers.called)
+
+    def test_poller_max_age(self):
+        cache = mock.Mock()
+        cache.list_servers.return_value = []
+        poller = waiters.ServerPoller(self._client, cache)
+
+        poller._poll(5)
+
+        cache.list_servers.assert_called_once_with(self._client, 5)
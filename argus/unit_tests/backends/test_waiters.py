@@ -0,0 +1,220 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import itertools
+import threading
+import unittest
+
+from argus.backends import waiters
+from argus import exceptions
+from argus.unit_tests import test_utils
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class FakeServersClient(object):
+    """Fake compute client, whose servers change only when told so."""
+
+    build_timeout = 5
+
+    def __init__(self, **statuses):
+        self.statuses = statuses
+        self.task_states = {}
+        self.list_calls = []
+        self.show_calls = 0
+        self._updates = itertools.count(1)
+        self._updated = {server_id: self._timestamp()
+                         for server_id in statuses}
+        self._lock = threading.Lock()
+
+    def _timestamp(self):
+        return "2017-01-01T00:00:{:02d}Z".format(next(self._updates))
+
+    def set_status(self, server_id, status, task_state=None):
+        with self._lock:
+            self.statuses[server_id] = status
+            self.task_states[server_id] = task_state
+            self._updated[server_id] = self._timestamp()
+
+    def _server(self, server_id):
+        return {"id": server_id, "status": self.statuses[server_id],
+                "updated": self._updated[server_id],
+                waiters.TASK_STATE: self.task_states.get(server_id)}
+
+    def show_server(self, server_id):
+        with self._lock:
+            self.show_calls += 1
+            return {"server": self._server(server_id)}
+
+    def list_servers(self, detail=False, **params):
+        with self._lock:
+            self.list_calls.append(params)
+            since = params.get("changes-since", "")
+            return {"servers": [self._server(server_id)
+                                for server_id in self.statuses
+                                if self._updated[server_id] >= since and
+                                self.statuses[server_id] != "GONE"]}
+
+
+class TestBackoff(unittest.TestCase):
+
+    def test_backoff(self):
+        delays = waiters.backoff(initial=1, maximum=5)
+
+        self.assertEqual(list(itertools.islice(delays, 5)), [1, 2, 4, 5, 5])
+
+    @mock.patch('time.sleep')
+    def test_wait_until(self, mock_sleep):
+        check = mock.Mock(side_effect=[None, None, "fake result"])
+
+        result = waiters.wait_until(check, timeout=10, initial=1, maximum=5)
+
+        self.assertEqual(result, "fake result")
+        mock_sleep.assert_has_calls([mock.call(1), mock.call(2)])
+
+    @mock.patch('time.sleep')
+    def test_wait_until_timeout(self, _):
+        check = mock.Mock(return_value=None)
+
+        self.assertRaises(exceptions.ArgusTimeoutError,
+                          waiters.wait_until, check, timeout=0)
+
+
+class TestServerPoller(unittest.TestCase):
+
+    def setUp(self):
+        patcher = test_utils.ConfPatcher('poll_interval', 0.01, 'argus')
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+
+    def _wait_in_background(self, client, server_ids, status):
+        results = {}
+
+        def _wait(server_id):
+            try:
+                results[server_id] = waiters.wait_for_server_status(
+                    client, server_id, status)["status"]
+            except exceptions.ArgusError as exc:
+                results[server_id] = exc
+
+        threads = [threading.Thread(target=_wait, args=(server_id, ))
+                   for server_id in server_ids]
+        for thread in threads:
+            thread.start()
+        return results, threads
+
+    def test_wait_for_many_servers(self):
+        client = FakeServersClient(first="BUILD", second="BUILD",
+                                   third="BUILD")
+        results, threads = self._wait_in_background(
+            client, ["first", "second", "third"], "ACTIVE")
+        # The servers change only after they were all watched and listed.
+        waiters.wait_until(lambda: client.show_calls == 3 or None,
+                           timeout=5, initial=0.01, maximum=0.01)
+        listed = len(client.list_calls)
+        waiters.wait_until(lambda: len(client.list_calls) > listed or None,
+                           timeout=5, initial=0.01, maximum=0.01)
+
+        for server_id in ("first", "second", "third"):
+            client.set_status(server_id, "ACTIVE")
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, {"first": "ACTIVE", "second": "ACTIVE",
+                                   "third": "ACTIVE"})
+        self.assertEqual(client.show_calls, 3)
+        self.assertEqual(client.list_calls[0], {})
+        self.assertIn("changes-since", client.list_calls[-1])
+
+    def test_wait_for_server_status_error(self):
+        client = FakeServersClient(first="BUILD")
+        results, threads = self._wait_in_background(
+            client, ["first"], "ACTIVE")
+
+        client.set_status("first", "ERROR")
+        threads[0].join(5)
+
+        self.assertIsInstance(results["first"], exceptions.ArgusError)
+
+    def test_wait_for_server_status_task_state(self):
+        client = FakeServersClient(first="ACTIVE")
+        client.set_status("first", "ACTIVE", task_state="rebooting")
+        results, threads = self._wait_in_background(
+            client, ["first"], "ACTIVE")
+        threads[0].join(0.1)
+        self.assertEqual(results, {})
+
+        client.set_status("first", "ACTIVE")
+        threads[0].join(5)
+
+        self.assertEqual(results, {"first": "ACTIVE"})
+
+    def test_wait_for_server_status_timeout(self):
+        client = FakeServersClient(first="BUILD")
+        client.build_timeout = 0.05
+
+        self.assertRaises(exceptions.ArgusTimeoutError,
+                          waiters.wait_for_server_status,
+                          client, "first", "ACTIVE")
+
+    def test_wait_for_server_termination(self):
+        client = FakeServersClient(first="ACTIVE")
+        thread = threading.Thread(
+            target=waiters.wait_for_server_termination,
+            args=(client, "first"))
+        thread.start()
+
+        client.set_status("first", "DELETED")
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+
+    def test_wait_for_server_termination_missing(self):
+        client = FakeServersClient(first="GONE")
+
+        waiters.wait_for_server_termination(client, "first")
+
+    def test_list_watched_during_listing(self):
+        client = FakeServersClient(first="GONE", second="ACTIVE")
+        poller = waiters.ServerPoller(client)
+        poller._watchers["first"] += 1
+        list_servers = client.list_servers
+
+        def _list_servers(**params):
+            servers = list_servers(**params)
+            # The server is watched while it is being listed,
+            # after the listing of the API was made.
+            poller._watchers["third"] += 1
+            return servers
+
+        client.list_servers = _list_servers
+        servers = poller._list()
+
+        self.assertEqual(
+            [(server["id"], server["status"]) for server in servers],
+            [("second", "ACTIVE"), ("first", waiters.DELETED)])
+
+    def test_get_poller(self):
+        client = FakeServersClient()
+
+        self.assertIs(waiters.get_poller(client),
+                      waiters.get_poller(client))
+        self.assertIsNot(waiters.get_poller(client),
+                         waiters.get_poller(FakeServersClient()))
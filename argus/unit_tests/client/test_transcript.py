@@ -0,0 +1,124 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from argus.client import transcript
+from argus import exceptions
+from argus import log as argus_log
+from argus.unit_tests import test_utils
+from argus import util
+
+
+class TestTranscript(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = transcript.transcript_path(self._directory, "fake")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_command_key(self):
+        key = transcript.command_key(["fake command"], util.POWERSHELL)
+        self.assertEqual(key, transcript.command_key([u"fake command"],
+                                                     util.POWERSHELL))
+        self.assertNotEqual(key, transcript.command_key(["fake command"],
+                                                        util.CMD))
+        self.assertNotEqual(key, transcript.command_key(["fake", "command"],
+                                                        util.POWERSHELL))
+
+    def test_transcript_path(self):
+        self.assertEqual(self._path,
+                         os.path.join(self._directory, "fake.transcript"))
+
+    def test_record_and_replay(self):
+        recorder = transcript.Transcript(self._path)
+        recorder.record(["first"], util.POWERSHELL,
+                        results=[("out", b"err", 0)])
+        recorder.record(["second", "third"], util.CMD,
+                        results=[("out2", "", 0), ("out3", "", 0)])
+
+        player = transcript.Transcript(self._path)
+        self.assertEqual(len(player), 2)
+        self.assertEqual(player.replay(["first"], util.POWERSHELL),
+                         [("out", "err", 0)])
+        self.assertEqual(player.replay(["second", "third"], util.CMD),
+                         [("out2", "", 0), ("out3", "", 0)])
+
+    def test_replay_order(self):
+        recorder = transcript.Transcript(self._path)
+        for status in ("Running", "Running", "Stopped"):
+            recorder.record(["poll"], util.POWERSHELL,
+                            results=[(status, "", 0)])
+
+        player = transcript.Transcript(self._path)
+        outputs = [player.replay(["poll"], util.POWERSHELL)[0][0]
+                   for _ in range(5)]
+        self.assertEqual(outputs, ["Running", "Running", "Stopped",
+                                   "Stopped", "Stopped"])
+
+    def test_replay_error(self):
+        recorder = transcript.Transcript(self._path)
+        recorder.record(["fail"], util.POWERSHELL,
+                        error=exceptions.ArgusTimeoutError("timed out"))
+
+        player = transcript.Transcript(self._path)
+        with self.assertRaises(exceptions.ArgusTimeoutError) as context:
+            player.replay(["fail"], util.POWERSHELL)
+        self.assertEqual(str(context.exception), "timed out")
+
+    def test_replay_missing(self):
+        player = transcript.Transcript(self._path)
+        self.assertRaises(exceptions.ArgusTranscriptError,
+                          player.replay, ["missing"], util.POWERSHELL)
+
+    def test_record_and_replay_value(self):
+        recorder = transcript.Transcript(self._path)
+        recorder.record_value("floating_ip", "fake ip")
+        recorder.record_value("get_mtu", 1450)
+
+        player = transcript.Transcript(self._path)
+        self.assertEqual(player.replay_value("floating_ip"), "fake ip")
+        self.assertEqual(player.replay_value("get_mtu"), 1450)
+        self.assertRaises(exceptions.ArgusTranscriptError,
+                          player.replay_value, "public_key")
+        # The values don't clash with the commands of the same name.
+        self.assertRaises(exceptions.ArgusTranscriptError,
+                          player.replay, ["floating_ip"], util.POWERSHELL)
+
+    def test_build_exception_unknown_class(self):
+        exc = transcript._build_exception("fake.module.FakeError", "message")
+        self.assertIsInstance(exc, exceptions.ArgusError)
+
+    def test_get_transcript(self):
+        first = transcript.get_transcript(self._path)
+        self.assertIs(first, transcript.get_transcript(self._path))
+        transcript._TRANSCRIPTS.pop(self._path)
+
+    def test_get_scenario_transcript(self):
+        with test_utils.ConfPatcher('transcript_directory', self._directory,
+                                    'argus'):
+            scenario_transcript = transcript.get_scenario_transcript()
+        scenario = argus_log.get_log_extra_item(argus_log.LOG, 'scenario')
+        self.assertEqual(scenario_transcript.path,
+                         transcript.transcript_path(self._directory,
+                                                    scenario))
+        transcript._TRANSCRIPTS.pop(scenario_transcript.path)
@@ -0,0 +1,252 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=no-value-for-parameter, protected-access, unused-argument
+
+import hashlib
+import textwrap
+import unittest
+
+import six
+
+from argus.client import transcript
+from argus.client import windows
+from argus import exceptions
+from argus import log as argus_log
+from argus import metrics
+from argus.unit_tests import test_utils
+from argus import util
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+@mock.patch('argus.client.windows.get_windows_action_manager')
+class TestTranscriptClients(unittest.TestCase):
+
+    def setUp(self):
+        self._transcript = mock.Mock()
+
+    @mock.patch('argus.client.windows.WinRemoteClient._run_commands')
+    def test_recording_client(self, mock_run_commands, _):
+        mock_run_commands.return_value = [("out", "", 0)]
+        client = windows.RecordingWinRemoteClient(
+            "fake ip", "user", "pass", self._transcript)
+
+        result = client.run_remote_cmd("fake cmd", util.CMD)
+
+        self.assertEqual(result, ("out", "", 0))
+        self._transcript.record.assert_called_once_with(
+            ["fake cmd"], util.CMD, results=[("out", "", 0)])
+
+    @mock.patch('argus.client.windows.WinRemoteClient._run_commands')
+    def test_recording_client_error(self, mock_run_commands, _):
+        error = exceptions.ArgusError("fake error")
+        mock_run_commands.side_effect = error
+        client = windows.RecordingWinRemoteClient(
+            "fake ip", "user", "pass", self._transcript)
+
+        self.assertRaises(exceptions.ArgusError,
+                          client.run_remote_cmd, "fake cmd")
+        self._transcript.record.assert_called_once_with(
+            ["fake cmd"], util.POWERSHELL, error=error)
+
+    @mock.patch('time.sleep')
+    def test_replay_client(self, mock_sleep, _):
+        self._transcript.replay.side_effect = [
+            exceptions.ArgusError("fake error"),
+            [("out", "", 0)],
+        ]
+        client = windows.ReplayWinRemoteClient(
+            "fake ip", "user", "pass", self._transcript)
+
+        result = client.run_command_with_retry("fake cmd", delay=10)
+
+        self.assertEqual(result, ("out", "", 0))
+        mock_sleep.assert_called_once_with(0)
+        self.assertRaises(exceptions.ArgusError, client._get_protocol)
+
+    @test_utils.ConfPatcher('transcript_mode', None, 'argus')
+    @mock.patch('argus.client.windows.WinRemoteClient.__init__')
+    def test_get_remote_client_no_transcript(self, mock_init, _):
+        mock_init.return_value = None
+        client = windows.get_remote_client("fake ip", "user", "pass")
+        self.assertIsInstance(client, windows.WinRemoteClient)
+        self.assertNotIsInstance(client, windows.ReplayWinRemoteClient)
+
+    @test_utils.ConfPatcher('transcript_directory', 'fake dir', 'argus')
+    @test_utils.ConfPatcher('transcript_mode', 'replay', 'argus')
+    @mock.patch('argus.client.transcript.get_transcript')
+    def test_get_remote_client_replay(self, mock_get_transcript, _):
+        client = windows.get_remote_client("fake ip", "user", "pass")
+        self.assertIsInstance(client, windows.ReplayWinRemoteClient)
+        scenario = argus_log.get_log_extra_item(argus_log.LOG, 'scenario')
+        mock_get_transcript.assert_called_once_with(
+            transcript.transcript_path("fake dir", scenario))
+
+
+def _fake_action_manager():
+    """Build an action manager class which runs a remote command."""
+    namespace = {"__name__": "argus.action_manager.fake"}
+    six.exec_(textwrap.dedent("""
+        class FakeActionManager(object):
+
+            def __init__(self, client):
+                self._client = client
+
+            def check_something(self):
+                return self._client.run_remote_cmd("fake cmd")
+        """), namespace)
+    return namespace["FakeActionManager"]
+
+
+@mock.patch('argus.client.windows.get_windows_action_manager')
+class TestCommandMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.REGISTRY.clear()
+        self.addCleanup(metrics.REGISTRY.clear)
+
+    @mock.patch('argus.client.windows.WinRemoteClient._get_protocol')
+    def test_run_commands_metrics(self, mock_get_protocol, _):
+        protocol_client = mock_get_protocol.return_value
+        protocol_client.get_command_output.return_value = (b"out", b"err", 0)
+        client = windows.WinRemoteClient("fake ip", "user", "pass")
+
+        with mock.patch.object(windows, "_get_caller",
+                               return_value="FakeManager.check"):
+            client.run_remote_cmd("fake cmd", util.CMD)
+
+        labels = {"command_type": util.CMD, "caller": "FakeManager.check",
+                  "scenario": argus_log.get_log_extra_item(
+                      argus_log.LOG, "scenario")}
+        self.assertEqual(metrics.REGISTRY.get(
+            "argus_remote_commands_total", **labels), 1)
+        self.assertEqual(metrics.REGISTRY.get(
+            "argus_remote_shell_opens_total", **labels), 1)
+        self.assertEqual(metrics.REGISTRY.get(
+            "argus_remote_bytes_sent_total", **labels), len("fake cmd"))
+        self.assertEqual(metrics.REGISTRY.get(
+            "argus_remote_bytes_received_total", **labels), 6)
+        self.assertEqual(metrics.REGISTRY.get(
+            "argus_remote_command_seconds", **labels)["count"], 1)
+
+    @mock.patch('argus.client.windows.WinRemoteClient._get_protocol')
+    def test_run_commands_timeout_metrics(self, mock_get_protocol, _):
+        client = windows.WinRemoteClient("fake ip", "user", "pass")
+        client._run_command = mock.Mock(
+            side_effect=exceptions.ArgusTimeoutError("fake timeout"))
+
+        with mock.patch.object(windows, "_get_caller", return_value="fake"):
+            self.assertRaises(exceptions.ArgusTimeoutError,
+                              client.run_remote_cmd, "fake cmd", util.CMD)
+
+        labels = {"command_type": util.CMD, "caller": "fake",
+                  "scenario": argus_log.get_log_extra_item(
+                      argus_log.LOG, "scenario")}
+        self.assertEqual(metrics.REGISTRY.get(
+            "argus_remote_command_timeouts_total", **labels), 1)
+        self.assertIsNone(metrics.REGISTRY.get(
+            "argus_remote_command_errors_total", **labels))
+
+    def test_get_caller(self, _):
+        client = mock.Mock()
+        client.run_remote_cmd.side_effect = lambda *args: (
+            windows._get_caller())
+
+        manager = _fake_action_manager()(client)
+
+        self.assertEqual(manager.check_something(),
+                         "FakeActionManager.check_something")
+        self.assertEqual(windows._get_caller(), "unknown")
+
+
+@mock.patch('argus.client.windows.get_windows_action_manager')
+@mock.patch('argus.client.windows.WinRemoteClient._run_commands')
+class TestWriteFiles(unittest.TestCase):
+
+    def test_write_files_single_command(self, mock_run_commands, _):
+        client = windows.WinRemoteClient("fake ip", "user", "pass")
+
+        client.write_files({r"C:\b.conf": b"second", r"C:\a.conf": b""})
+
+        (scripts, ), kwargs = mock_run_commands.call_args
+        self.assertEqual(len(scripts), 1)
+        self.assertEqual(kwargs["commands_type"], util.POWERSHELL)
+        script = scripts[0]
+        self.assertTrue(script.startswith("$ErrorActionPreference = 'Stop'"))
+        self.assertIn(r"WriteAllBytes('C:\a.conf.argus-tmp'", script)
+        self.assertIn("FromBase64String('c2Vjb25k')", script)
+        # The files are renamed only after all of them were written.
+        self.assertLess(script.rindex("WriteAllBytes"),
+                        script.index("Move-Item"))
+        self.assertIn(r"-Path 'C:\a.conf.argus-tmp' -Destination 'C:\a.conf'",
+                      script)
+        self.assertEqual(script.count("Move-Item"), 2)
+
+    def test_write_files_chunked(self, mock_run_commands, _):
+        client = windows.WinRemoteClient("fake ip", "user", "pass")
+        data = b"x" * (windows.WRITE_CHUNK_SIZE * 2 + 1)
+
+        client.write_files({r"C:\big.bin": data})
+
+        scripts = mock_run_commands.call_args[0][0]
+        self.assertGreater(len(scripts), 1)
+        for script in scripts:
+            self.assertLessEqual(len(script), windows.MAX_SCRIPT_SIZE + 50)
+        script = "; ".join(scripts)
+        self.assertEqual(script.count("WriteAllBytes"), 1)
+        self.assertEqual(script.count("'Append'"), 2)
+        self.assertIn("Move-Item", scripts[-1])
+
+    @mock.patch.dict('argus.client.windows._WRITE_STATS', clear=True)
+    def test_write_files_skip_unchanged(self, mock_run_commands,
+                                        mock_get_manager):
+        mock_manager = mock_get_manager.return_value
+        mock_manager.get_files_sha256.return_value = {
+            r"C:\a.conf": hashlib.sha256(b"first").hexdigest(),
+            r"C:\b.conf": None,
+        }
+        client = windows.WinRemoteClient("fake ip", "user", "pass")
+
+        client.write_files({r"C:\a.conf": b"first", r"C:\b.conf": b"second"},
+                           skip_unchanged=True)
+
+        mock_manager.get_files_sha256.assert_called_once_with(
+            [r"C:\a.conf", r"C:\b.conf"])
+        scripts = mock_run_commands.call_args[0][0]
+        self.assertNotIn(r"C:\a.conf", "".join(scripts))
+        self.assertIn(r"C:\b.conf", "".join(scripts))
+        self.assertEqual(windows.get_write_stats(), {
+            "skipped_files": 1, "saved_bytes": 5, "saved_round_trips": 0,
+            "digest_round_trips": 1})
+
+    @mock.patch.dict('argus.client.windows._WRITE_STATS', clear=True)
+    def test_write_files_all_unchanged(self, mock_run_commands,
+                                       mock_get_manager):
+        mock_manager = mock_get_manager.return_value
+        mock_manager.get_files_sha256.return_value = {
+            r"C:\a.conf": hashlib.sha256(b"first").hexdigest(),
+        }
+        client = windows.WinRemoteClient("fake ip", "user", "pass")
+
+        client.write_files({r"C:\a.conf": b"first"}, skip_unchanged=True)
+
+        self.assertFalse(mock_run_commands.called)
+        self.assertEqual(windows.get_write_stats(), {
+            "skipped_files": 1, "saved_bytes": 5, "saved_round_trips": 1,
+            "digest_round_trips": 1})
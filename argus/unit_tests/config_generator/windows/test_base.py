@@ -18,6 +18,7 @@
 
 import unittest
 from argus.config_generator.windows import base
+from argus import util
 import six
 
 
@@ -53,77 +54,73 @@ class BaseWindowsConfig(unittest.TestCase):
         result = self._cbinit_config.conf
         self.assertEqual(result, self._cbinit_config._conf)
 
-    @mock.patch('six.moves.configparser.ConfigParser')
+    @mock.patch.dict('argus.config_generator.windows.base._TEMPLATES',
+                     clear=True)
     @mock.patch('argus.util.get_resource')
-    @mock.patch('argus.config_generator.windows.base.StringIO')
-    def _test_get_base_conf(self, mock_string_io, mock_get_resource,
-                            mock_configparser, py_version):
-        mock_string_io.return_value = mock.sentinel
-        mock_get_resource.return_value = mock.sentinel
-        mock_conf = mock.Mock()
-        mock_configparser.return_value = mock_conf
-        if py_version == 2:
-            six.PY2 = True
+    def test_get_base_conf(self, mock_get_resource):
+        mock_get_resource.return_value = (
+            b"[DEFAULT]\nusername=Admin\nverbose=true\n\n"
+            b"[section]\nverbose=false\nlogfile=fake.log\n")
+
+        first = self._cbinit_config._get_base_conf("fake template")
+        second = self._cbinit_config._get_base_conf("fake template")
+        first.set("DEFAULT", "username", "Administrator")
+
+        mock_get_resource.assert_called_once_with("fake template")
+        self.assertIsNot(first, second)
+        self.assertEqual(second.get("DEFAULT", "username"), "Admin")
+        self.assertEqual(second.get("section", "username"), "Admin")
+        self.assertEqual(second.items("section"),
+                         [("username", "Admin"), ("verbose", "false"),
+                          ("logfile", "fake.log")])
+
+    def test_get_base_conf_template(self):
+        conf = self._cbinit_config._get_base_conf(
+            "cloudbase-init.conf-template")
+        expected = six.moves.configparser.ConfigParser()
+        # pylint: disable=deprecated-method, maybe-no-member
+        if six.PY2:
+            expected.readfp(six.StringIO(util.get_resource(
+                "cloudbase-init.conf-template")))
         else:
-            six.PY2 = None
-
-        result = self._cbinit_config._get_base_conf(mock.sentinel)
-        self.assertEqual(result, mock_conf)
-        mock_string_io.assert_called_once_with(mock_get_resource.return_value)
-        mock_get_resource.assert_called_once_with(mock.sentinel)
-        mock_configparser.assert_called_once_with()
-        if py_version == 2:
-            mock_conf.readfp.assert_called_once_with(
-                mock_string_io.return_value)
-        else:
-            mock_conf.read_file.assert_called_once_with(
-                mock_string_io.return_value)
+            expected.read_string(util.get_resource(
+                "cloudbase-init.conf-template").decode("utf-8"))
 
-    def test_get_base_conf_py2(self):
-        self._test_get_base_conf(py_version=2)
+        self.assertEqual(conf.sections(), expected.sections())
+        self.assertEqual(conf.defaults(), expected.defaults())
 
-    def test_get_base_conf_py_not_2(self):
-        self._test_get_base_conf(py_version=3)
+    def test_render(self):
+        conf = six.moves.configparser.ConfigParser()
+        conf.set("DEFAULT", "username", u"Admin\u00eestrator")
+        self._cbinit_config._conf = conf
 
-    @mock.patch('argus.config_generator.windows.base.'
-                'BaseWindowsConfig.conf')
-    @mock.patch('argus.config_generator.windows.base.StringIO')
-    @mock.patch('ntpath.join')
-    def _test_apply_config(self, mock_join, mock_string_io, _, is_file):
-        mock_join.return_value = mock.sentinel.FULL_PATH
-        mock_manager = mock.Mock()
-        mock_manager.is_file.return_value = is_file
-        mock_buff = mock.Mock()
-        mock_data = mock.Mock()
-        mock_buff.read.return_value = mock_data
-        mock_string_io.return_value = mock_buff
+        result = self._cbinit_config.render()
+
+        self.assertEqual(
+            result, u"[DEFAULT]\nusername = Admin\u00eestrator\n\n"
+            .encode("utf-8"))
+
+    @mock.patch('argus.config_generator.windows.base.apply_configs')
+    def test_apply_config(self, mock_apply_configs):
+        self._cbinit_config._client = mock.sentinel.client
+
+        self._cbinit_config.apply_config(mock.sentinel.path)
+
+        mock_apply_configs.assert_called_once_with(
+            mock.sentinel.client, mock.sentinel.path, [self._cbinit_config])
+
+    def test_apply_configs(self):
         mock_client = mock.Mock()
-        mock_client.mock_manager = mock_manager
-        self._cbinit_config._client = mock_client
-        self._cbinit_config.config_name = mock.sentinel.FILE_NAME
-
-        self._cbinit_config.apply_config(mock.sentinel)
-
-        mock_join.assert_called_once_with(mock.sentinel,
-                                          mock.sentinel.FILE_NAME)
-        self._cbinit_config._client.manager.is_file.assert_called_once_with(
-            mock.sentinel.FULL_PATH)
-        if is_file:
-            self._cbinit_config._client.manager.remove.assert_called_once_with(
-                mock.sentinel.FULL_PATH)
-        mock_string_io.assert_called_once_with()
-        self._cbinit_config.conf.write.assert_called_once_with(
-            mock_string_io.return_value)
-        mock_buff.seek.assert_called_once_with(0)
-        mock_buff.read.assert_called_once_with()
-        self._cbinit_config._client.write_file.assert_called_once_with(
-            data=mock_data, remote_destination=mock.sentinel.FULL_PATH)
-
-    def test_apply_config_is_file(self):
-        self._test_apply_config(is_file=True)
-
-    def test_apply_config_is_no_file(self):
-        self._test_apply_config(is_file=None)
+        first, second = mock.Mock(), mock.Mock()
+        first.config_name = "first.conf"
+        second.config_name = "second.conf"
+
+        base.apply_configs(mock_client, r"C:\conf", [first, second])
+
+        mock_client.write_files.assert_called_once_with({
+            r"C:\conf\first.conf": first.render.return_value,
+            r"C:\conf\second.conf": second.render.return_value,
+        }, skip_unchanged=False)
 
     def test_config_specific_paths(self):
         result = (super(FakeBaseWindowsConfig, self._cbinit_config).
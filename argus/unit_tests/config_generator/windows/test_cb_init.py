@@ -18,6 +18,7 @@
 
 import unittest
 from argus.config_generator.windows import cb_init
+import six
 
 import argus
 
@@ -111,23 +112,12 @@ class BasePopulatedCBInitConfig(unittest.TestCase):
     def test_set_service_type_(self):
         self._test_set_service_type(None)
 
-    @mock.patch('ntpath.join')
-    @mock.patch('argus.config_generator.windows.base.'
-                'BaseWindowsConfig.apply_config')
-    def test_apply_config(self, mock_apply_config, mock_join):
-        path = "fake path"
-        self._base.config_name = mock.sentinel
-        mock_client = mock.Mock()
-        self._base._client = mock_client
-        argus.util.POWERSHELL = mock.sentinel
-        cmd = ("(get-content '{filename}')| "
-               "out-file '{filename}' -encoding ascii")
-        mock_join.return_value = "fake path"
-
-        self._base.apply_config(path)
-
-        mock_apply_config.assert_called_once_with(path)
-        mock_join.assert_called_once_with(path, self._base.config_name)
-        self._base._client.run_command_with_retry.assert_called_once_with(
-            cmd.format(filename=mock_join.return_value),
-            command_type=argus.util.POWERSHELL)
+    def test_render(self):
+        conf = six.moves.configparser.ConfigParser()
+        conf.set("DEFAULT", "username", u"Admin\u00eestrator")
+        self._base._conf = conf
+
+        result = self._base.render()
+
+        self.assertEqual(
+            result, b"[DEFAULT]\r\nusername = Admin?strator\r\n\r\n")
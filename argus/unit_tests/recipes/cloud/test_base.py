@@ -82,11 +82,100 @@ class TestBaseCloudbaseinitRecipe(unittest.TestCase):
         self._base = FakeBaseCloudbaseinitRecipe(mock.Mock())
 
     def test_prepare(self):
-        expected_logging = [
-            "Preparing instance...",
-            "Finished preparing instance."
-        ]
-
         with test_utils.LogSnatcher('argus.recipes.cloud.base') as snatcher:
             self._base.prepare(service_type="fake type")
-        self.assertEqual(expected_logging, snatcher.output)
+        self.assertEqual("Preparing instance...", snatcher.output[0])
+        self.assertIn("Finished preparing instance.", snatcher.output)
+        for name, _ in self._base.PREPARE_STEPS:
+            self.assertTrue(any(
+                message.startswith("Step {} finished in".format(name))
+                for message in snatcher.output))
+
+    @test_utils.ConfPatcher('recipe_workers', 1, 'argus')
+    def test_prepare_single_worker(self):
+        calls = []
+
+        def _record(name):
+            return lambda *args: calls.append((name, args))
+
+        for name, _ in self._base.PREPARE_STEPS:
+            setattr(self._base, name, mock.Mock(side_effect=_record(name)))
+
+        self._base.prepare(service_type="fake type")
+
+        expected_calls = [
+            (name, ("fake type", )
+             if name in self._base.SERVICE_TYPE_STEPS else ())
+            for name, _ in self._base.PREPARE_STEPS
+        ]
+        self.assertEqual(expected_calls, calls)
+
+    @test_utils.ConfPatcher('recipe_workers', 3, 'argus')
+    def test_prepare_config_after_code(self):
+        calls = []
+        for name, _ in self._base.PREPARE_STEPS:
+            setattr(self._base, name, mock.Mock())
+        self._base.replace_code.side_effect = (
+            lambda: calls.append("replace_code"))
+        self._base.prepare_cbinit_config.side_effect = (
+            lambda service_type: calls.append("prepare_cbinit_config"))
+
+        self._base.prepare(service_type="fake type")
+
+        self.assertEqual(calls, ["replace_code", "prepare_cbinit_config"])
+
+    @test_utils.ConfPatcher('delete_instance', False, 'argus')
+    @mock.patch('argus.checkpoint.get_journal')
+    def test_prepare_resume(self, mock_get_journal):
+        journal = mock_get_journal.return_value
+        journal.instance = "fake id"
+        journal.steps = ["wait_for_boot_completion", "install_cbinit",
+                         "sysprep"]
+        backend = self._base._backend
+        backend.internal_instance_id.return_value = "fake id"
+        manager = backend.remote_client.manager
+        manager.get_checkpoints.return_value = ["install_cbinit"]
+        self._base.install_cbinit = mock.Mock()
+        self._base.sysprep = mock.Mock()
+
+        self._base.prepare(service_type="fake type")
+
+        self.assertFalse(self._base.install_cbinit.called)
+        self._base.sysprep.assert_called_once_with()
+        manager.add_checkpoint.assert_any_call("sysprep")
+        journal.add_step.assert_any_call("sysprep")
+        self.assertNotIn(mock.call("install_cbinit"),
+                         journal.add_step.call_args_list)
+        self.assertNotIn(mock.call("wait_for_boot_completion"),
+                         journal.add_step.call_args_list)
+
+    @test_utils.ConfPatcher('delete_instance', False, 'argus')
+    @mock.patch('argus.checkpoint.get_journal')
+    def test_prepare_other_instance(self, mock_get_journal):
+        journal = mock_get_journal.return_value
+        journal.instance = "other id"
+        self._base._backend.internal_instance_id.return_value = "fake id"
+
+        self._base.prepare(service_type="fake type")
+
+        self.assertFalse(journal.add_step.called)
+        manager = self._base._backend.remote_client.manager
+        self.assertFalse(manager.add_checkpoint.called)
+
+    @test_utils.ConfPatcher('golden_image', True, 'argus')
+    def test_prepare_from_golden_image(self):
+        self._base._backend.from_golden_image = True
+        for name in self._base.GOLDEN_IMAGE_STEPS:
+            setattr(self._base, name, mock.Mock())
+        self._base.sysprep = mock.Mock()
+
+        self._base.prepare(service_type="fake type")
+
+        for name in self._base.GOLDEN_IMAGE_STEPS:
+            self.assertFalse(getattr(self._base, name).called)
+        self._base.sysprep.assert_called_once_with()
+
+    @test_utils.ConfPatcher('golden_image', True, 'argus')
+    def test_create_golden_image(self):
+        self._base.create_golden_image()
+        self._base._backend.create_golden_image.assert_called_once_with()
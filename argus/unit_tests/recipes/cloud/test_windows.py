@@ -16,8 +16,16 @@
 # pylint: disable=no-value-for-parameter, protected-access, unused-argument
 # pylint: disable=no-member
 
+import base64
+import hashlib
+import io
 import ntpath
+import os
+import shutil
+import tempfile
 import unittest
+import zipfile
+
 from argus import config as argus_config
 from argus import exceptions
 from argus.recipes.cloud import windows
@@ -143,35 +151,48 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
         mock_zipfile.extractall(destination_path)
         mock_os.remove.assert_called_once_with(source_path)
 
-    @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
-                'extract_files_from_archive')
-    @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
-                '_grab_cbinit_installation_log')
-    @mock.patch('argus.recipes.cloud.windows.base64.standard_b64decode')
-    def _test_transfer_encoded_file_b64(self, mock_base64_decode,
-                                        mock_cbinit_install_log,
-                                        mock_extract_archive, archive=False):
-        file_source = mock.sentinel
-        destination_path = mock.sentinel
-        encoded_content = [mock.sentinel]
-        file_64_decoded = mock.sentinel
-        (self._recipe._backend.remote_client.manager.
-         encode_file_to_base64_str.return_value) = encoded_content
-        mock_base64_decode.return_value = file_64_decoded
-
-        with mock.patch('argus.recipes.cloud.windows.open') as mock_open:
-            self._recipe.transfer_encoded_file_b64(
-                file_source, destination_path, archive)
+    def _make_archive(self, name, content):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_ref:
+            zip_ref.writestr(name, content)
+        return base64.standard_b64encode(archive.getvalue()).decode()
 
-        (self._recipe._backend.remote_client.manager.
-         encode_file_to_base64_str.assert_called_once_with(
-             file_path=file_source))
-        mock_base64_decode.assert_called_once_with(encoded_content[0])
-        mock_open.assert_called_once_with(destination_path, 'wb')
-        mock_open.write(file_64_decoded)
-        if archive is True:
-            mock_extract_archive.assert_called_once_with(
-                destination_path, CONFIG.argus.output_directory)
+    def _test_transfer_encoded_file_b64(self, archive=False, verify=False,
+                                        corrupted=False):
+        output_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_directory)
+        CONFIG.argus.output_directory = output_directory
+        CONFIG.argus.verify_transfers = verify
+        self.addCleanup(setattr, CONFIG.argus, "verify_transfers", False)
+        manager = self._recipe._backend.remote_client.manager
+        if archive:
+            encoded_content = self._make_archive("fake.log", b"fake log")
+        else:
+            encoded_content = base64.standard_b64encode(b"fake log").decode()
+        manager.encode_file_to_base64_str.return_value = [encoded_content]
+        digest = hashlib.sha256(
+            base64.standard_b64decode(encoded_content)).hexdigest()
+        manager.get_file_sha256.return_value = (
+            "0" * 64 if corrupted else digest)
+        destination_path = os.path.join(output_directory, "fake.file")
+
+        if corrupted:
+            self.assertRaises(exceptions.ArgusError,
+                              self._recipe.transfer_encoded_file_b64,
+                              "fake source", destination_path, archive)
+            return
+        self._recipe.transfer_encoded_file_b64(
+            "fake source", destination_path, archive)
+
+        manager.encode_file_to_base64_str.assert_called_once_with(
+            file_path="fake source")
+        if verify:
+            manager.get_file_sha256.assert_called_once_with("fake source")
+        if archive:
+            self.assertFalse(os.path.exists(destination_path))
+            destination_path = os.path.join(output_directory, "fake.log")
+        with open(destination_path, "rb") as stream:
+            self.assertEqual(stream.read(), b"fake log")
 
     def test_transfer_encoded_file_b64(self):
         self._test_transfer_encoded_file_b64()
@@ -179,11 +200,30 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
     def test_transfer_encoded_file_b64_archive(self):
         self._test_transfer_encoded_file_b64(archive=True)
 
+    def test_transfer_encoded_file_b64_verify(self):
+        self._test_transfer_encoded_file_b64(verify=True)
+
+    def test_transfer_encoded_file_b64_corrupted(self):
+        self._test_transfer_encoded_file_b64(verify=True, corrupted=True)
+
+    def test_pull_files(self):
+        output_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_directory)
+        CONFIG.argus.output_directory = output_directory
+        members = [(r"C:\fake.log", "fake.log")]
+        manager = self._recipe._backend.remote_client.manager
+        manager.pack_files.return_value = self._make_archive(
+            "fake.log", b"fake log")
+
+        self._recipe.pull_files(members, "fake.zip")
+
+        manager.pack_files.assert_called_once_with(members, r"C:\fake.zip")
+        self.assertEqual(os.listdir(output_directory), ["fake.log"])
+
     @mock.patch('argus.log.get_log_extra_item')
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
-                'transfer_encoded_file_b64')
-    @mock.patch('argus.recipes.cloud.windows.os.path.join')
-    def _test_grab_cbinit_installation_log(self, mock_join, mock_transfer_file,
+                'pull_files')
+    def _test_grab_cbinit_installation_log(self, mock_pull_files,
                                            mock_get_extra_item,
                                            output_directory=True):
         expected_logging = [
@@ -194,31 +234,21 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
             expected_logging.append("The output directory wasn't given, "
                                     "the log will not be grabbed.")
         else:
-            installation_log = r"C:\installation.log"
             self._recipe._backend.instance_server.return_value = {
-                'id': mock.sentinel
+                'id': "fake-id"
             }
             mock_get_extra_item.return_value = "fake-scenario-log"
-            renamed_log = (r"C:\{0}-installation-{1}.log".format(
-                mock_get_extra_item.return_value,
-                self._recipe._backend.instance_server.return_value['id']))
-            zip_source = r"C:\installation.zip"
-            log_template = "installation-{}.zip".format(
-                self._recipe._backend.instance_server.return_value['id'])
-            mock_join.return_value = mock.sentinel
 
         with test_utils.LogSnatcher('argus.recipes.cloud.windows') as snatcher:
             self._recipe._grab_cbinit_installation_log()
         self.assertEqual(expected_logging, snatcher.output)
         if output_directory:
-            (self._recipe._backend.remote_client.manager.copy_file.
-             assert_called_once_with(installation_log, renamed_log))
-            (self._recipe._backend.remote_client.manager.archive_file(
-                file_path=renamed_log, destination_path=zip_source))
-            mock_join.assert_called_once_with(CONFIG.argus.output_directory,
-                                              log_template)
-            mock_transfer_file.assert_called_once_with(
-                zip_source, mock_join.return_value, archive=True)
+            mock_pull_files.assert_called_once_with(
+                [(r"C:\installation.log",
+                  "fake-scenario-log-installation-fake-id.log")],
+                "installation-fake-id.zip")
+        else:
+            self.assertFalse(mock_pull_files.called)
 
     def test_grab_cbinit_installation_log_no_output_directory(self):
         self._test_grab_cbinit_installation_log(output_directory=False)
@@ -414,7 +444,9 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
                 '_make_dir_if_needed')
     @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
-    def test_inject_cbinit_config(self, mock_get_cbinit_dir, mock_make_dir):
+    @mock.patch('argus.config_generator.windows.base.apply_configs')
+    def test_inject_cbinit_config(self, mock_apply_configs,
+                                  mock_get_cbinit_dir, mock_make_dir):
         mock_get_cbinit_dir.return_value = "fake dir"
         self._recipe._cbinit_conf = mock.Mock()
         self._recipe._cbinit_unattend_conf = mock.Mock()
@@ -426,15 +458,17 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
         ]
         self._recipe.inject_cbinit_config()
         self.assertEqual(mock_make_dir.call_count, len(needed_directories))
-        (self._recipe._cbinit_conf.apply_config.
-         assert_called_once_with(conf_dir))
-        (self._recipe._cbinit_unattend_conf.apply_config.
-         assert_called_once_with(conf_dir))
+        mock_apply_configs.assert_called_once_with(
+            self._recipe._backend.remote_client, conf_dir,
+            [self._recipe._cbinit_conf, self._recipe._cbinit_unattend_conf],
+            skip_unchanged=True)
 
+    @mock.patch('argus.log.get_log_extra_item')
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
-                'transfer_encoded_file_b64')
+                'pull_files')
     @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
-    def _test_get_cb_init_files(self, mock_get_dir, mock_encode_file,
+    def _test_get_cb_init_files(self, mock_get_dir, mock_pull_files,
+                                mock_get_extra_item,
                                 output_directory="fake_output_directory"):
         CONFIG.argus.output_directory = output_directory
         fake_location = "fake_logs"
@@ -449,6 +483,7 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
                 'id': "fake_id"
             }
             mock_get_dir.return_value = "fake_dir"
+            mock_get_extra_item.return_value = "fake_scenario"
             cb_fake_files = [
                 "cloudbase-init.log",
                 "cloudbase-init-unattend.log"
@@ -459,11 +494,37 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
         if output_directory:
             self._recipe._backend.instance_server.assert_called_once_with()
             mock_get_dir.assert_called_once_with(self._recipe._execute)
-            self.assertEqual(
-                len(cb_fake_files),
-                (self._recipe._backend.remote_client.
-                 manager.copy_file.call_count))
-            self.assertEqual(mock_encode_file.call_count, len(cb_fake_files))
+            self.assertFalse(
+                self._recipe._backend.remote_client.manager.copy_file.called)
+            expected_members = [
+                (r"fake_dir\fake_logs\{}".format(cb_file),
+                 "fake_scenario-fake_id-{}".format(cb_file))
+                for cb_file in cb_fake_files
+            ]
+            mock_pull_files.assert_called_once_with(
+                expected_members, "fake_scenario-fake_id-fake_logs.zip")
+        else:
+            self.assertFalse(mock_pull_files.called)
+
+    @mock.patch('argus.log.get_log_extra_item')
+    @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
+                'pull_files')
+    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
+    def test_get_cb_init_artifacts(self, mock_get_dir, mock_pull_files,
+                                   mock_get_extra_item):
+        CONFIG.argus.output_directory = "fake_output_directory"
+        self._recipe._backend.instance_server.return_value = {'id': "id"}
+        mock_get_dir.return_value = "fake_dir"
+        mock_get_extra_item.return_value = "scenario"
+
+        self._recipe.get_cb_init_artifacts()
+
+        members, archive_name = mock_pull_files.call_args[0]
+        self.assertEqual(archive_name, "scenario-id-artifacts.zip")
+        self.assertEqual(
+            [name for _, name in members],
+            ["scenario-id-" + name for name in
+             self._recipe.CB_INIT_LOGS + self._recipe.CB_INIT_CONFS])
 
     def test_get_cb_init_files_no_directory(self):
         self._test_get_cb_init_files(output_directory=False)
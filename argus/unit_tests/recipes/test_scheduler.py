@@ -0,0 +1,108 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import unittest
+
+from argus import exceptions
+from argus import log as argus_log
+from argus.recipes import scheduler
+
+
+class TestStepScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self._calls = []
+
+    def _step(self, name, requires=(), action=None):
+        def _action():
+            self._calls.append(name)
+            if action:
+                action()
+        return scheduler.Step(name, _action, requires)
+
+    def test_unknown_requirement(self):
+        self.assertRaises(exceptions.ArgusError, scheduler.StepScheduler,
+                          [self._step("first", ("missing", ))])
+
+    def test_circular_requirements(self):
+        steps = [self._step("first", ("second", )),
+                 self._step("second", ("first", ))]
+        self.assertRaises(exceptions.ArgusError,
+                          scheduler.StepScheduler, steps)
+
+    def test_run_respects_requirements(self):
+        steps = [self._step("last", ("first", "second")),
+                 self._step("first"),
+                 self._step("second", ("first", ))]
+
+        timings = scheduler.StepScheduler(steps, workers=4).run()
+
+        self.assertEqual(self._calls, ["first", "second", "last"])
+        self.assertEqual(sorted(timings), ["first", "last", "second"])
+
+    def test_run_concurrently(self):
+        barrier = threading.Event()
+        steps = [self._step("first", action=lambda: barrier.wait(5)),
+                 self._step("second", action=barrier.set)]
+
+        scheduler.StepScheduler(steps, workers=2).run()
+
+        self.assertTrue(barrier.is_set())
+        self.assertEqual(sorted(self._calls), ["first", "second"])
+
+    def test_run_log_extra(self):
+        scenarios = []
+
+        def _record():
+            scenarios.append(argus_log.get_log_extra_item(argus_log.LOG,
+                                                          "scenario"))
+
+        steps = [self._step("first", action=_record),
+                 self._step("second", action=_record)]
+
+        def _scenario():
+            # The steps log as the scenario which runs them.
+            argus_log.isolate_log_extra(argus_log.LOG)
+            argus_log.set_scenario_name(argus_log.LOG, "fake scenario")
+            scheduler.StepScheduler(steps, workers=2).run()
+
+        thread = threading.Thread(target=_scenario)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(scenarios, ["fake scenario"] * 2)
+
+    def test_run_skips_completed(self):
+        finished = []
+        steps = [self._step("first"), self._step("second", ("first", ))]
+
+        scheduler.StepScheduler(steps).run(
+            completed=["first"],
+            on_finished=lambda name, _: finished.append(name))
+
+        self.assertEqual(self._calls, ["second"])
+        self.assertEqual(finished, ["second"])
+
+    def test_run_stops_on_error(self):
+        def _fail():
+            raise exceptions.ArgusTimeoutError("fake error")
+
+        steps = [self._step("first", action=_fail),
+                 self._step("second", ("first", ))]
+
+        self.assertRaises(exceptions.ArgusTimeoutError,
+                          scheduler.StepScheduler(steps).run)
+        self.assertEqual(self._calls, ["first"])
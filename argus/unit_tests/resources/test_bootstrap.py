@@ -0,0 +1,46 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import unittest
+
+from argus import util
+
+# The root of the repository, when running from it.
+ROOT = os.path.dirname(os.path.dirname(util.__file__))
+
+
+class TestBootstrap(unittest.TestCase):
+    """The bundled files are copies of the ones of the repository.
+
+    They are used instead of the ones of the repository when preparing
+    the environment of a run, so they must run the same tests.
+    """
+
+    def _assert_bundled_copy(self, bundled, path):
+        path = os.path.join(ROOT, path)
+        if not os.path.exists(path):
+            self.skipTest("Not running from the repository.")
+        with open(path, "rb") as stream:
+            self.assertEqual(
+                util.get_resource(bundled), stream.read(),
+                "The bundled {} differs from {}, copy it again."
+                .format(bundled, path))
+
+    def test_tests(self):
+        self._assert_bundled_copy("bootstrap/tests.py", "ci/tests.py")
+
+    def test_testr_conf(self):
+        self._assert_bundled_copy("bootstrap/testr.conf", ".testr.conf")
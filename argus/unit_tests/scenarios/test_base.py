@@ -0,0 +1,126 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import unittest
+
+from argus.scenarios import base
+from argus.tests import base as tests_base
+from argus.unit_tests import test_utils
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+def _scenario(*test_classes):
+    """Build a scenario which merges the given test classes."""
+    return type("FakeScenario", (base.BaseScenario, ), {
+        "backend_type": mock.Mock(),
+        "introspection_type": mock.Mock(),
+        "recipe_type": mock.Mock(),
+        "test_classes": test_classes,
+    })
+
+
+class TestScenarioMeta(unittest.TestCase):
+
+    def setUp(self):
+        self._instances = []
+        self._calls = []
+        instances = self._instances
+        calls = self._calls
+
+        class FakeTest(tests_base.BaseTestCase):
+
+            def __init__(self, *args, **kwargs):
+                super(FakeTest, self).__init__(*args, **kwargs)
+                instances.append(self)
+
+            def test_first(self):
+                calls.append(("test_first", self._backend))
+
+            def test_second(self):
+                calls.append(("test_second", self._backend))
+
+        self._test_class = FakeTest
+
+    def test_test_instance_reused(self):
+        scenario = _scenario(self._test_class)
+        scenario.backend = mock.sentinel.backend
+
+        scenario("test_first").test_first()
+        scenario("test_second").test_second()
+
+        self.assertEqual(len(self._instances), 1)
+        self.assertEqual(self._calls, [
+            ("test_first", mock.sentinel.backend),
+            ("test_second", mock.sentinel.backend),
+        ])
+
+    def test_test_instance_per_scenario(self):
+        first = _scenario(self._test_class)
+        second = _scenario(self._test_class)
+
+        first("test_first").test_first()
+        second("test_first").test_first()
+        first("test_second").test_second()
+
+        self.assertEqual(len(self._instances), 2)
+        self.assertIs(first.get_test_instance(self._test_class, "test_first"),
+                      self._instances[0])
+
+    @mock.patch('argus.config.CONFIG.argus')
+    def test_test_instances_reset(self, mock_config):
+        mock_config.output_directory = None
+        scenario = _scenario(self._test_class)
+        scenario("test_first").test_first()
+
+        scenario.setUpClass()
+        scenario("test_first").test_first()
+
+        self.assertEqual(len(self._instances), 2)
+        self.assertIs(self._instances[1]._backend, scenario.backend)
+
+
+class TestScenarioTranscript(unittest.TestCase):
+
+    def setUp(self):
+        self._scenario = _scenario(mock.Mock())
+
+    @test_utils.ConfPatcher('output_directory', None, 'argus')
+    @test_utils.ConfPatcher('transcript_mode', 'replay', 'argus')
+    @mock.patch('argus.backends.replay.replay_backend.ReplayBackend')
+    def test_replay_no_instance(self, mock_replay_backend):
+        self._scenario.setUpClass()
+
+        self._scenario.backend_type.assert_not_called()
+        self.assertIs(self._scenario.backend,
+                      mock_replay_backend.return_value)
+        self._scenario.backend.setup_instance.assert_called_once_with()
+
+    @test_utils.ConfPatcher('output_directory', None, 'argus')
+    @test_utils.ConfPatcher('transcript_mode', 'record', 'argus')
+    @mock.patch('argus.client.transcript.get_scenario_transcript')
+    @mock.patch('argus.backends.replay.replay_backend.record_backend')
+    def test_record_backend(self, mock_record_backend, mock_get_transcript):
+        self._scenario.setUpClass()
+
+        self._scenario.backend_type.assert_called_once_with(
+            "FakeScenario", None, None, None)
+        mock_record_backend.assert_called_once_with(
+            self._scenario.backend, mock_get_transcript.return_value)
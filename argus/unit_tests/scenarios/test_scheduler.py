@@ -0,0 +1,153 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import unittest
+
+from argus import log as argus_log
+from argus.scenarios import scheduler
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+def _scenario(name, calls, set_up=None):
+    """Build a fake scenario, which records its calls."""
+
+    def setUpClass(cls):
+        argus_log.set_scenario_name(argus_log.LOG, name)
+        calls.append((name, "setUpClass"))
+        if set_up:
+            set_up()
+
+    def tearDownClass(cls):
+        calls.append((name, "tearDownClass"))
+
+    def test_first(self):
+        calls.append((name, argus_log.get_log_extra_item(
+            argus_log.LOG, "scenario")))
+
+    def test_second(self):
+        calls.append((name, "test_second"))
+
+    return type(name, (unittest.TestCase, ), {
+        "setUpClass": classmethod(setUpClass),
+        "tearDownClass": classmethod(tearDownClass),
+        "test_first": test_first,
+        "test_second": test_second,
+    })
+
+
+def _suite(*scenarios):
+    loader = unittest.TestLoader()
+    return unittest.TestSuite(loader.loadTestsFromTestCase(scenario)
+                              for scenario in scenarios)
+
+
+class TestScenarioScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self._calls = []
+        patcher = mock.patch('argus.backends.tempest.warm_pool.expect_claims')
+        self._mock_expect_claims = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_group_by_scenario(self):
+        first = _scenario("First", self._calls)
+        second = _scenario("Second", self._calls)
+        suite = unittest.TestSuite([_suite(first), _suite(second, first)])
+
+        groups = scheduler.group_by_scenario(suite)
+
+        self.assertEqual(
+            [[test.id().split(".")[-2:] for test in group]
+             for group in groups],
+            [[["First", "test_first"], ["First", "test_second"],
+              ["First", "test_first"], ["First", "test_second"]],
+             [["Second", "test_first"], ["Second", "test_second"]]])
+
+    def test_filter_tests(self):
+        suite = _suite(_scenario("First", self._calls),
+                       _scenario("Second", self._calls))
+
+        tests = scheduler.filter_tests(suite, ["Second.test_first",
+                                               "First.test_second"])
+
+        self.assertEqual(
+            sorted(test.id().split(".")[-2] + "." + test.id().split(".")[-1]
+                   for test in tests),
+            ["First.test_second", "Second.test_first"])
+
+    def test_run_one_at_a_time(self):
+        suite = _suite(_scenario("First", self._calls),
+                       _scenario("Second", self._calls))
+        result = unittest.TestResult()
+
+        scheduler.ScenarioScheduler(suite, concurrency=1).run(result)
+
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(result.testsRun, 4)
+        self.assertEqual(self._calls, [
+            ("First", "setUpClass"), ("First", "First"),
+            ("First", "test_second"), ("First", "tearDownClass"),
+            ("Second", "setUpClass"), ("Second", "Second"),
+            ("Second", "test_second"), ("Second", "tearDownClass"),
+        ])
+        self._mock_expect_claims.assert_called_once_with(2)
+
+    def test_run_concurrently(self):
+        first_ready = threading.Event()
+        second_ready = threading.Event()
+
+        def _meet(ready, other):
+            # Each scenario is prepared only if the other one
+            # is prepared at the same time.
+            ready.set()
+            if not other.wait(5):
+                raise AssertionError("The scenarios ran one at a time.")
+
+        suite = _suite(
+            _scenario("First", self._calls,
+                      lambda: _meet(first_ready, second_ready)),
+            _scenario("Second", self._calls,
+                      lambda: _meet(second_ready, first_ready)))
+        result = unittest.TestResult()
+        scenario = argus_log.get_log_extra_item(argus_log.LOG, "scenario")
+
+        scheduler.ScenarioScheduler(suite, concurrency=2).run(result)
+
+        self.assertTrue(result.wasSuccessful(), result.errors)
+        self.assertEqual(result.testsRun, 4)
+        # Every scenario logs with its own name.
+        self.assertIn(("First", "First"), self._calls)
+        self.assertIn(("Second", "Second"), self._calls)
+        self.assertEqual(
+            argus_log.get_log_extra_item(argus_log.LOG, "scenario"),
+            scenario)
+
+    def test_run_set_up_fails(self):
+        def _fail():
+            raise ValueError("fake error")
+
+        suite = _suite(_scenario("First", self._calls, _fail),
+                       _scenario("Second", self._calls))
+        result = unittest.TestResult()
+
+        scheduler.ScenarioScheduler(suite, concurrency=2).run(result)
+
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn(("Second", "tearDownClass"), self._calls)
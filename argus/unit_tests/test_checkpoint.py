@@ -0,0 +1,70 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from argus import checkpoint
+from argus.unit_tests import test_utils
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, "fake.checkpoints")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_start_and_add_step(self):
+        journal = checkpoint.Journal(self._path)
+        journal.start("fake id", resources={"floating_ip": {"ip": "ip"}})
+        journal.add_step("first")
+        journal.add_step("second")
+        journal.add_step("first")
+
+        loaded = checkpoint.Journal(self._path)
+        self.assertEqual(loaded.instance, "fake id")
+        self.assertEqual(loaded.resources, {"floating_ip": {"ip": "ip"}})
+        self.assertEqual(loaded.steps, ["first", "second"])
+        self.assertEqual(stat.S_IMODE(os.stat(self._path).st_mode), 0o600)
+
+    def test_start_forgets_steps(self):
+        journal = checkpoint.Journal(self._path)
+        journal.start("fake id")
+        journal.add_step("first")
+        journal.start("other id")
+
+        self.assertEqual(checkpoint.Journal(self._path).steps, [])
+
+    def test_invalid_journal(self):
+        with open(self._path, "w") as stream:
+            stream.write("not json")
+
+        journal = checkpoint.Journal(self._path)
+
+        self.assertIsNone(journal.instance)
+        self.assertEqual(journal.steps, [])
+
+    @test_utils.ConfPatcher('delete_instance', False, 'argus')
+    @test_utils.ConfPatcher('output_directory', 'fake dir', 'argus')
+    def test_journal_path(self):
+        self.assertTrue(checkpoint.is_enabled())
+        self.assertEqual(checkpoint.journal_path("fake"),
+                         os.path.join("fake dir", "fake.checkpoints"))
@@ -0,0 +1,106 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from argus import metrics
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self._registry = metrics.Registry(buckets=(1, float("inf")))
+
+    def test_increment(self):
+        self._registry.increment("fake_total", command_type="cmd")
+        self._registry.increment("fake_total", 2, command_type="cmd")
+        self._registry.increment("fake_total", command_type="powershell")
+
+        self.assertEqual(self._registry.get("fake_total", command_type="cmd"),
+                         3)
+        self.assertIsNone(self._registry.get("fake_total"))
+
+    def test_observe(self):
+        self._registry.observe("fake_seconds", 0.5)
+        self._registry.observe("fake_seconds", 2)
+
+        self.assertEqual(self._registry.get("fake_seconds"),
+                         {"buckets": [1, 2], "count": 2, "sum": 2.5})
+
+    def test_type_mismatch(self):
+        self._registry.increment("fake_total")
+
+        self.assertRaises(ValueError, self._registry.observe,
+                          "fake_total", 1)
+
+    def test_to_prometheus(self):
+        self._registry.increment("fake_total", caller='Fake."method"')
+        self._registry.observe("fake_seconds", 0.5, caller="other")
+
+        self.assertEqual(self._registry.to_prometheus().splitlines(), [
+            '# TYPE fake_seconds histogram',
+            'fake_seconds_bucket{caller="other",le="1.0"} 1',
+            'fake_seconds_bucket{caller="other",le="+Inf"} 1',
+            'fake_seconds_sum{caller="other"} 0.5',
+            'fake_seconds_count{caller="other"} 1',
+            '# TYPE fake_total counter',
+            'fake_total{caller="Fake.\\"method\\""} 1',
+        ])
+
+    def test_dump(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._registry.increment("fake_total", caller="fake")
+
+        prometheus_path, json_path = metrics.dump(directory, self._registry)
+
+        with open(prometheus_path) as stream:
+            self.assertIn('fake_total{caller="fake"} 1', stream.read())
+        with open(json_path) as stream:
+            self.assertEqual(json.load(stream), {
+                "fake_total": {
+                    "type": "counter",
+                    "samples": [{"labels": {"caller": "fake"}, "value": 1}],
+                },
+            })
+        self.assertEqual(os.path.dirname(json_path), directory)
+
+    def test_dump_concurrently(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._registry.increment("fake_total", caller="fake")
+        errors = []
+
+        def _dump():
+            try:
+                for _ in range(5):
+                    metrics.dump(directory, self._registry)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        # The scenarios of a process dump the metrics at once.
+        threads = [threading.Thread(target=_dump) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(os.listdir(directory)), 2)
@@ -0,0 +1,174 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from argus import profiler
+from argus.unit_tests import test_utils
+
+
+def _span(span_id, name, start, duration, parent=None):
+    return {"id": span_id, "parent": parent, "name": name,
+            "category": "fake", "start": start, "duration": duration,
+            "thread": 1, "args": {}}
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self._profiler = profiler.Profiler("fake scenario")
+
+    def test_span_nesting(self):
+        with self._profiler.span("outer", "scenario"):
+            with self._profiler.span("inner", "backend", detail="fake"):
+                pass
+
+        inner, outer = self._profiler.spans
+        self.assertEqual((inner["name"], outer["name"]), ("inner", "outer"))
+        self.assertEqual(inner["parent"], outer["id"])
+        self.assertIsNone(outer["parent"])
+        self.assertEqual(inner["args"], {"detail": "fake"})
+        self.assertGreaterEqual(outer["duration"], inner["duration"])
+
+    def test_span_error(self):
+        def _fail():
+            with self._profiler.span("failing", "test"):
+                raise ValueError("fake error")
+
+        self.assertRaises(ValueError, _fail)
+        self.assertEqual(self._profiler.spans[0]["args"],
+                         {"error": "ValueError"})
+
+    @test_utils.ConfPatcher('profile', True, 'argus')
+    def test_wrap_in_thread(self):
+        with self._profiler.span("prepare", "recipe"):
+            wrapped = profiler.wrap(lambda value: value * 2, "step", "step")
+            results = []
+            thread = threading.Thread(
+                target=lambda: results.append(wrapped(21)))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(results, [42])
+        step_span, prepare = self._profiler.spans
+        self.assertEqual(step_span["parent"], prepare["id"])
+        self.assertNotEqual(step_span["thread"], prepare["thread"])
+
+    def test_wrap_disabled(self):
+        func = object()
+
+        self.assertIs(profiler.wrap(func, "step", "step"), func)
+
+    def test_chrome_trace(self):
+        with self._profiler.span("outer", "scenario"):
+            pass
+
+        trace = self._profiler.to_chrome_trace()
+
+        event, = trace["traceEvents"]
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["name"], "outer")
+        self.assertEqual(event["cat"], "scenario")
+        self.assertEqual(event["args"], {"span_id": 1, "parent_id": None})
+        self.assertEqual(trace["otherData"], {"scenario": "fake scenario"})
+
+
+class TestSummary(unittest.TestCase):
+
+    def test_critical_path(self):
+        spans = [
+            _span(1, "prepare", 0, 10),
+            _span(2, "boot", 0, 4, parent=1),
+            _span(3, "metadata", 0, 1, parent=1),
+            _span(4, "install", 4, 5, parent=1),
+            _span(5, "download", 1, 2, parent=1),
+            _span(6, "test", 11, 1),
+        ]
+
+        path = profiler.critical_path(spans)
+
+        self.assertEqual([record["name"] for record in path],
+                         ["boot", "install", "test"])
+
+    def test_summarize(self):
+        spans = [
+            _span(1, "prepare", 0, 10),
+            _span(2, "boot", 0, 4, parent=1),
+            _span(3, "download", 1, 2, parent=1),
+            _span(4, "install", 4, 5, parent=1),
+        ]
+
+        summary = profiler.summarize({"fake scenario": spans}, top=2)
+
+        self.assertEqual(
+            [(sink["name"], sink["time"]) for sink in summary["top"]],
+            [("install", 5), ("boot", 4)])
+        scenario = summary["scenarios"]["fake scenario"]
+        self.assertEqual(scenario["duration"], 10)
+        self.assertEqual([record["name"]
+                          for record in scenario["critical_path"]],
+                         ["boot", "install"])
+
+    def test_save(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with test_utils.ConfPatcher('profile', True, 'argus'), \
+                test_utils.ConfPatcher('output_directory', directory,
+                                       'argus'):
+            with profiler.get_profiler("first").span("setUpClass",
+                                                     "scenario"):
+                pass
+            profiler.save("first")
+            with profiler.get_profiler("second").span("setUpClass",
+                                                      "scenario"):
+                pass
+            profiler.save("second")
+
+        self.assertTrue(os.path.isfile(os.path.join(
+            directory, "first" + profiler.TRACE_EXTENSION)))
+        with open(os.path.join(directory, profiler.SUMMARY_FILE)) as stream:
+            summary = json.load(stream)
+        self.assertEqual(sorted(summary["scenarios"]), ["first", "second"])
+        self.assertEqual(summary["top"][0]["count"], 2)
+
+    def test_write_summary_concurrently(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        errors = []
+
+        def _write():
+            try:
+                for _ in range(5):
+                    profiler.write_summary(directory)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        # The scenarios of a process write the summary at once.
+        threads = [threading.Thread(target=_write) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(directory), [profiler.SUMMARY_FILE])
+        with open(os.path.join(directory, profiler.SUMMARY_FILE)) as stream:
+            self.assertEqual(json.load(stream)["scenarios"], {})
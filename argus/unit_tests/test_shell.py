@@ -0,0 +1,271 @@
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import argparse
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+import subunit
+import testtools
+
+from argus import exceptions
+from argus import shell
+from argus.unit_tests import test_utils
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+def _write_stream(path, *test_ids):
+    """Write a subunit stream where the given tests succeeded."""
+    with open(path, "wb") as stream:
+        writer = subunit.StreamResultToBytes(stream)
+        for test_id in test_ids:
+            writer.status(test_id=test_id, test_status="success")
+
+
+def _read_stream(path):
+    """Read the test ids and statuses of a subunit stream."""
+    tests = []
+    result = testtools.StreamToDict(lambda test: tests.append(
+        (test["id"], test["status"])))
+    with open(path, "rb") as stream:
+        result.startTestRun()
+        subunit.ByteStreamToStreamResult(stream).run(result)
+        result.stopTestRun()
+    return tests
+
+
+def _response(status_code, content=b"", etag=None):
+    response = mock.Mock(status_code=status_code, content=content,
+                         headers={"ETag": etag} if etag else {})
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError()
+    return response
+
+
+def _matrix_args(**kwargs):
+    values = dict(image_ref=["fake image"], flavor_ref=None,
+                  architecture=["x64"], build=None, parallel=None,
+                  concurrency=None, local=None, resources="fake resources",
+                  config_file=None, download=False, in_process=True,
+                  separate=False, git_command="", zip_patch="",
+                  use_arestor=False, tests="")
+    values.update(kwargs)
+    return argparse.Namespace(**values)
+
+
+class TestMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._directory)
+
+    def test_get_runs(self):
+        args = _matrix_args(image_ref=["first", "second"],
+                            flavor_ref=["flavor"],
+                            architecture=["x64", "x86"])
+
+        self.assertEqual(shell._get_runs(args), [
+            ("first", "flavor", "x64", None),
+            ("first", "flavor", "x86", None),
+            ("second", "flavor", "x64", None),
+            ("second", "flavor", "x86", None),
+        ])
+
+    def test_get_runs_single(self):
+        self.assertEqual(shell._get_runs(_matrix_args()),
+                         [("fake image", None, "x64", None)])
+
+    def test_run_label(self):
+        self.assertEqual(
+            shell._run_label("Windows 2012 R2", None, "x64", "1.1.0"),
+            "Windows_2012_R2-default-flavor-x64-1_1_0")
+        self.assertEqual(
+            shell._run_label("image", 3, "x86", None),
+            "image-3-x86-default-build")
+
+    def test_labelled_result(self):
+        target = mock.Mock()
+        result = shell._LabelledResult(target, "fake label")
+
+        result.status(test_id="fake test", test_status="success")
+        result.status(file_name="fake file", file_bytes=b"")
+
+        target.status.assert_has_calls([
+            mock.call(test_id="fake label.fake test",
+                      test_status="success"),
+            mock.call(test_id=None, file_name="fake file", file_bytes=b""),
+        ])
+
+    def test_combine_streams(self):
+        first = os.path.join(self._directory, "first")
+        second = os.path.join(self._directory, "second")
+        output = os.path.join(self._directory, "output")
+        _write_stream(first, "test_first")
+        _write_stream(second, "test_first", "test_second")
+
+        shell._combine_streams([("first", first), ("second", second),
+                                ("missing", "missing stream"),
+                                ("failed", None)], output)
+
+        self.assertEqual(_read_stream(output), [
+            ("first.test_first", "success"),
+            ("second.test_first", "success"),
+            ("second.test_second", "success"),
+        ])
+
+    @mock.patch('argus.shell._generate_report')
+    @mock.patch('argus.shell._start_run')
+    @mock.patch('argus.shell._prepare_config')
+    @mock.patch('argus.shell._prepare_environment')
+    @mock.patch('argus.shell._get_base_directory')
+    def test_run_matrix_failed_run(self, mock_base_directory,
+                                   mock_prepare_environment, _,
+                                   mock_start_run, mock_generate_report):
+        mock_base_directory.return_value = self._directory
+        stream = os.path.join(self._directory, "fake stream")
+        _write_stream(stream, "test_first")
+        mock_prepare_environment.side_effect = [None, ValueError("fake")]
+        process = mock.Mock()
+        process.wait.return_value = 0
+        mock_start_run.return_value = process, stream
+        args = _matrix_args(architecture=["x64", "x86"], concurrency=1)
+        runs = shell._get_runs(args)
+
+        exit_code = shell._run_matrix(args, runs, {"fake image": "image"},
+                                      self._directory)
+
+        self.assertEqual(exit_code, 1)
+        output = os.path.join(self._directory,
+                              shell.MATRIX_RESULTS + ".subunit")
+        self.assertEqual(_read_stream(output), [
+            ("image-default-flavor-x64-default-build.test_first",
+             "success")])
+        mock_generate_report.assert_called_once_with(
+            output, os.path.join(self._directory,
+                                 shell.MATRIX_RESULTS + ".html"))
+
+    @mock.patch('argus.shell._get_runs')
+    def test_main_concurrency_lower_than_parallel(self, mock_get_runs):
+        argv = ["argus", "-i", "fake image", "-p", "4", "--concurrency", "2"]
+        with mock.patch('sys.argv', argv), mock.patch('sys.stderr'):
+            self.assertRaises(SystemExit, shell.main)
+        self.assertFalse(mock_get_runs.called)
+
+
+@mock.patch('time.sleep')
+@mock.patch('requests.get')
+class TestFetchResource(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": directory})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for key, value in (('retry_count', 3), ('retry_delay', 5)):
+            conf_patcher = test_utils.ConfPatcher(key, value, 'argus')
+            conf_patcher.__enter__()
+            self.addCleanup(conf_patcher.__exit__, None, None, None)
+        self._url = "http://fake/resource"
+
+    def test_fetch_resource(self, mock_get, _):
+        mock_get.return_value = _response(200, b"fake content", "fake etag")
+
+        self.assertEqual(shell._fetch_resource(self._url), b"fake content")
+
+        mock_get.assert_called_once_with(self._url, headers={})
+        content_path, etag_path = shell._get_cached_paths(self._url)
+        self.assertEqual(shell._read_file(content_path), b"fake content")
+        self.assertEqual(shell._read_file(etag_path), b"fake etag")
+
+    def test_fetch_resource_not_modified(self, mock_get, _):
+        shell._cache_resource(self._url, b"cached content", "fake etag")
+        mock_get.return_value = _response(304)
+
+        self.assertEqual(shell._fetch_resource(self._url), b"cached content")
+
+        mock_get.assert_called_once_with(
+            self._url, headers={"If-None-Match": "fake etag"})
+
+    @mock.patch('argus.shell.print', create=True)
+    def test_fetch_resource_offline(self, _, mock_get, mock_sleep):
+        shell._cache_resource(self._url, b"cached content", "fake etag")
+        mock_get.side_effect = requests.ConnectionError()
+
+        self.assertEqual(shell._fetch_resource(self._url), b"cached content")
+
+        # The server isn't waited for, since there is a cached copy.
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+    def test_fetch_resource_retry(self, mock_get, mock_sleep):
+        mock_get.side_effect = [requests.ConnectionError(),
+                                _response(500),
+                                _response(200, b"fake content")]
+
+        self.assertEqual(shell._fetch_resource(self._url), b"fake content")
+
+        self.assertEqual(mock_get.call_count, 3)
+        mock_sleep.assert_has_calls([mock.call(5), mock.call(5)])
+        # Without an ETag, the resource isn't cached.
+        content_path, _ = shell._get_cached_paths(self._url)
+        self.assertIsNone(shell._read_file(content_path))
+
+    def test_fetch_resource_fails(self, mock_get, _):
+        mock_get.side_effect = requests.ConnectionError()
+
+        self.assertRaises(exceptions.ArgusEnvironmentError,
+                          shell._fetch_resource, self._url)
+        self.assertEqual(mock_get.call_count, 3)
+
+    @mock.patch('argus.shell.print', create=True)
+    @mock.patch('os.makedirs')
+    def test_cache_resource_fails(self, mock_makedirs, mock_print, *_):
+        mock_makedirs.side_effect = OSError("fake error")
+
+        shell._cache_resource(self._url, b"fake content", "fake etag")
+
+        self.assertTrue(mock_print.called)
+        content_path, _ = shell._get_cached_paths(self._url)
+        self.assertIsNone(shell._read_file(content_path))
+
+
+class TestInitRepository(unittest.TestCase):
+
+    @mock.patch('argus.shell.testr_repository')
+    def test_init_repository(self, mock_repository):
+        shell._init_repository("fake directory")
+
+        (mock_repository.RepositoryFactory.return_value.initialise.
+         assert_called_once_with("fake directory"))
+
+    @mock.patch('subprocess.Popen')
+    @mock.patch('argus.shell.testr_repository', None)
+    def test_init_repository_command(self, mock_popen):
+        shell._init_repository("fake directory")
+
+        mock_popen.assert_called_once_with(["testr", "init"],
+                                           cwd="fake directory",
+                                           close_fds=True)
+        mock_popen.return_value.wait.assert_called_once_with()
@@ -13,8 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 # pylint: disable=wrong-import-order
+import base64
+import functools
+import hashlib
+import io
+import threading
 import unittest
 
+from argus import exceptions
+from argus import log as argus_log
 from argus import util
 
 try:
@@ -41,3 +48,110 @@ class TestCreateTempFile(unittest.TestCase):
             "fd", content.encode.return_value)
         mock_close.assert_called_once_with("fd")
         mock_remove.assert_called_once_with("path")
+
+
+class TestDecodeBase64ToFile(unittest.TestCase):
+
+    def setUp(self):
+        self._data = bytes(bytearray(range(256))) * 10
+        self._encoded = base64.standard_b64encode(self._data).decode()
+
+    def test_decode(self):
+        stream = io.BytesIO()
+        encoded = self._encoded[:50] + "\r\n" + self._encoded[50:]
+
+        digest = util.decode_base64_to_file(encoded, stream, chunk_size=7)
+
+        self.assertEqual(stream.getvalue(), self._data)
+        self.assertEqual(digest, hashlib.sha256(self._data).hexdigest())
+
+    def test_decode_bytes(self):
+        stream = io.BytesIO()
+        util.decode_base64_to_file(self._encoded.encode(), stream)
+        self.assertEqual(stream.getvalue(), self._data)
+
+    def test_decode_truncated(self):
+        self.assertRaises(exceptions.ArgusError, util.decode_base64_to_file,
+                          self._encoded[:-1], io.BytesIO())
+
+
+class TestRunConcurrently(unittest.TestCase):
+
+    def test_run_concurrently(self):
+        barrier = threading.Event()
+        started = []
+
+        def _action(index):
+            started.append(index)
+            if len(started) == 3:
+                barrier.set()
+            # The actions finish only if all of them run at once.
+            self.assertTrue(barrier.wait(5))
+            return index
+
+        actions = [functools.partial(_action, index) for index in range(3)]
+
+        self.assertEqual(util.run_concurrently(actions, workers=3), [0, 1, 2])
+
+    @mock.patch('time.sleep')
+    def test_run_concurrently_retry(self, mock_sleep):
+        action = mock.Mock(side_effect=[ValueError, "fake result"])
+
+        result = util.run_concurrently([action], workers=2,
+                                       retry_count=1, retry_delay=5)
+
+        self.assertEqual(result, ["fake result"])
+        mock_sleep.assert_called_once_with(5)
+
+    def test_run_concurrently_error(self):
+        failing = mock.Mock(side_effect=ValueError)
+        succeeding = mock.Mock(return_value="fake result")
+
+        self.assertRaises(ValueError,
+                          util.run_concurrently, [failing, succeeding],
+                          workers=1)
+        succeeding.assert_called_once_with()
+
+    @mock.patch('time.sleep')
+    def test_run_concurrently_retry_on(self, mock_sleep):
+        transient = mock.Mock(side_effect=[IOError, IOError, "fake result"])
+        permanent = mock.Mock(side_effect=ValueError)
+
+        self.assertEqual(util.run_concurrently(
+            [transient], workers=1, retry_count=2, retry_delay=5,
+            retry_on=IOError), ["fake result"])
+        self.assertRaises(ValueError, util.run_concurrently, [permanent],
+                          workers=1, retry_count=2, retry_on=IOError)
+        self.assertEqual(permanent.call_count, 1)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_run_concurrently_log_extra(self):
+        scenarios = []
+
+        def _action():
+            return argus_log.get_log_extra_item(argus_log.LOG, "scenario")
+
+        def _scenario():
+            # The actions log as the scenario which runs them.
+            argus_log.isolate_log_extra(argus_log.LOG)
+            argus_log.set_scenario_name(argus_log.LOG, "fake scenario")
+            scenarios.extend(util.run_concurrently([_action] * 3, workers=3))
+
+        thread = threading.Thread(target=_scenario)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(scenarios, ["fake scenario"] * 3)
+
+    @mock.patch('time.sleep')
+    def test_run_concurrently_retries_exhausted(self, _):
+        action = mock.Mock(side_effect=IOError("fake error"))
+
+        with self.assertRaises(IOError) as context:
+            util.run_concurrently([action], workers=1, retry_count=2,
+                                  retry_on=IOError)
+        self.assertEqual(str(context.exception), "fake error")
+        self.assertEqual(action.call_count, 3)
+
+    def test_run_concurrently_no_actions(self):
+        self.assertEqual(util.run_concurrently([], workers=3), [])
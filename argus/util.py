@@ -16,7 +16,9 @@
 import base64
 import collections
 import contextlib
+import hashlib
 import logging
+from multiprocessing import pool
 import pkgutil
 import random
 import socket
@@ -120,6 +122,9 @@ def check_function_eq(func_a, func_b):
     return all([code_equality, function_equality])
 
 
+# The number of base64 characters decoded at once.
+BASE64_CHUNK_SIZE = 64 * 1024
+
 DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 DEFAULT_LOG_FILE = 'argus.log'
 
@@ -152,6 +157,54 @@ def exec_with_retry(action, retry_count, retry_count_interval):
                     .format(action))
 
 
+def _retry(action, retry_count, retry_delay, retry_on):
+    """Run the given action, retrying it for the expected errors."""
+    for attempt in range(retry_count + 1):
+        try:
+            return action()
+        except retry_on as exc:
+            if attempt == retry_count:
+                raise
+            LOG.debug("Retrying %r, which failed with %r.", action, exc)
+            time.sleep(retry_delay)
+
+
+def run_concurrently(actions, workers, retry_count=0, retry_delay=0,
+                     retry_on=Exception):
+    """Run the given actions concurrently, retrying each of them.
+
+    :param actions: Callables without arguments.
+    :param workers: The maximum number of actions running at once.
+    :param retry_count: The number of retries of each failing action.
+    :param retry_delay: The number of seconds between the retries.
+    :param retry_on:
+        The exception classes for which an action is retried. The
+        other exceptions aren't retried.
+    :returns: The results of the actions, in the order they were given.
+
+    When an action fails, the other ones are still waited for
+    and then the first error is raised, as it was raised by
+    its action.
+    """
+    actions = list(actions)
+    if not actions:
+        return []
+
+    def _run(action):
+        return _retry(action, retry_count, retry_delay, retry_on)
+
+    # The actions log as the scenario which runs them.
+    run = argus_log.with_log_extra(LOG, _run)
+
+    thread_pool = pool.ThreadPool(processes=max(1, min(workers,
+                                                       len(actions))))
+    try:
+        return thread_pool.map(run, actions)
+    finally:
+        thread_pool.close()
+        thread_pool.join()
+
+
 def get_int_from_str(content):
     """Returns only the digits from a given string.
 
@@ -256,6 +309,36 @@ def gzip_data(data):
     return buff.getvalue()
 
 
+def decode_base64_to_file(encoded, stream, chunk_size=BASE64_CHUNK_SIZE):
+    """Decode the given base64 data into a binary stream, chunk by chunk.
+
+    Only a chunk of the decoded data is kept in memory at once.
+    The whitespace from the encoded data is ignored.
+
+    :param encoded: The base64 data, as text or bytes.
+    :param stream: A file-like object, opened for binary writing.
+    :returns: The SHA-256 hexadecimal digest of the decoded data.
+    """
+    digest = hashlib.sha256()
+    pending = b""
+    for start in range(0, len(encoded), chunk_size):
+        chunk = encoded[start:start + chunk_size]
+        if isinstance(chunk, six.text_type):
+            chunk = chunk.encode("ascii")
+        chunk = pending + b"".join(chunk.split())
+        usable = len(chunk) - len(chunk) % 4
+        pending = chunk[usable:]
+        data = base64.standard_b64decode(chunk[:usable])
+        digest.update(data)
+        stream.write(data)
+
+    if pending:
+        raise exceptions.ArgusError(
+            "The base64 data is truncated, {} characters are left over."
+            .format(len(pending)))
+    return digest.hexdigest()
+
+
 class cached_property(object):  # pylint: disable=invalid-name
     """A property which caches the result on access."""
 
@@ -31,6 +31,7 @@ from argus import util
 
 CONFIG = argus_config.CONFIG
 
+
 class BaseWindowsScenario(scenarios.CloudScenario):
 
     backend_type = tempest_backend.BaseWindowsTempestBackend
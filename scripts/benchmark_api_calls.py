@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the security group API calls of the Tempest back-end.
+
+A local fake compute API, which answers every request after a fixed
+latency, is used for creating and deleting the security group of an
+instance, with a different number of concurrent API calls each time.
+
+Usage::
+
+    python scripts/benchmark_api_calls.py --latency 0.2 --workers 1 5
+"""
+
+from __future__ import print_function
+
+import argparse
+import itertools
+import json
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import request
+
+from argus.backends.tempest import tempest_backend
+from argus import config as argus_config
+
+CONFIG = argus_config.CONFIG
+
+
+class FakeComputeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answer every request with a new resource, after a delay."""
+
+    ids = itertools.count(1)
+
+    def _respond(self):
+        time.sleep(self.server.latency)
+        body = json.dumps({"id": next(self.ids)}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_DELETE = _respond
+
+    def log_message(self, *args):    # pylint: disable=arguments-differ
+        pass
+
+
+class FakeComputeServer(socketserver.ThreadingMixIn,
+                        BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ("127.0.0.1", 0), FakeComputeHandler)
+        self.latency = latency
+        self.requests = 0
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(*self.server_address)
+
+
+class FakeClient(object):
+    """A compute client which sends every call to the fake API."""
+
+    def __init__(self, server):
+        self._server = server
+
+    def _call(self, method, path):
+        self._server.requests += 1
+        req = request.Request(self._server.url + path, data=b"{}")
+        req.get_method = lambda: method
+        return json.loads(request.urlopen(req).read().decode("utf-8"))
+
+    def create_security_group(self, **kwargs):
+        group = self._call("POST", "/os-security-groups")
+        return {"security_group": {"id": group["id"],
+                                   "name": kwargs["name"]}}
+
+    def create_security_group_rule(self, **kwargs):
+        rule = self._call("POST", "/os-security-group-rules")
+        return {"security_group_rule": rule}
+
+    def delete_security_group_rule(self, rule_id):
+        self._call("DELETE", "/os-security-group-rules/{}".format(rule_id))
+
+    def add_security_group(self, server_id, name):
+        self._call("POST", "/servers/{}/action".format(server_id))
+
+    def remove_security_group(self, server_id, name):
+        self._call("POST", "/servers/{}/action".format(server_id))
+
+
+class FakeManager(object):
+
+    def __init__(self, server):
+        client = FakeClient(server)
+        self.security_groups_client = client
+        self.security_group_rules_client = client
+        self.servers_client = client
+
+    def create_security_group_rule(self, secgroup_id, **ruleset):
+        return self.security_group_rules_client.create_security_group_rule(
+            parent_group_id=secgroup_id, **ruleset)["security_group_rule"]
+
+    def cleanup_credentials(self):
+        pass
+
+
+class BenchmarkBackend(tempest_backend.BaseTempestBackend):
+    """A Tempest back-end with an already created instance."""
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, server):
+        self._name = "benchmark"
+        self._server = None
+        self._keypair = None
+        self._floating_ip = None
+        self._security_group = None
+        self._security_groups_rules = []
+        self._shared_resources = []
+        self._manager = FakeManager(server)
+
+    def internal_instance_id(self):
+        return "fake-instance"
+
+    def get_remote_client(self, **kwargs):
+        raise NotImplementedError()
+
+    def remote_client(self):
+        raise NotImplementedError()
+
+
+def benchmark(server, workers, rounds):
+    CONFIG.set_override("api_workers", workers, "argus")
+    setup = cleanup = 0
+    for _ in range(rounds):
+        backend = BenchmarkBackend(server)
+        start = time.time()
+        backend._security_group = backend._create_security_groups()
+        setup += time.time() - start
+
+        start = time.time()
+        backend.cleanup()
+        cleanup += time.time() - start
+    return setup / rounds, cleanup / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="The latency of the fake API, in seconds.")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="The number of times each benchmark runs.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 5],
+                        help="The numbers of concurrent API calls.")
+    args = parser.parse_args()
+
+    server = FakeComputeServer(args.latency)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        print("{:>8} {:>10} {:>11} {:>9}".format(
+            "workers", "setup (s)", "cleanup (s)", "requests"))
+        for workers in args.workers:
+            server.requests = 0
+            setup, cleanup = benchmark(server, workers, args.rounds)
+            print("{:>8} {:>10.3f} {:>11.3f} {:>9}".format(
+                workers, setup, cleanup, server.requests // args.rounds))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
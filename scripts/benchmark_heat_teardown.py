@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Copyright 2017 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the stack teardown of the Heat back-end.
+
+A fake Heat client holds a number of unrelated stacks besides the one
+of the back-end, which is deleted after a fixed time. The teardown of
+the back-end is timed for a different number of unrelated stacks each
+time, along with the API calls made and the stacks they returned.
+
+Usage::
+
+    python scripts/benchmark_heat_teardown.py --stacks 10 100 1000
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+from heatclient import exc
+
+from argus.backends.heat import heat_backend
+
+
+class FakeStack(object):
+
+    def __init__(self, name):
+        self.stack_name = name
+        self.stack_status = "CREATE_COMPLETE"
+        self.stack_status_reason = ""
+        self.deleted_at = None
+
+
+class FakeStacks(object):
+    """The stacks manager of a fake Heat client."""
+
+    def __init__(self, stacks, latency, delete_time):
+        self._stacks = {name: FakeStack(name) for name in stacks}
+        self._latency = latency
+        self._delete_time = delete_time
+        self.calls = 0
+        self.returned = 0
+
+    def _call(self):
+        self.calls += 1
+        time.sleep(self._latency)
+        for name, stack in list(self._stacks.items()):
+            if stack.deleted_at and time.time() >= stack.deleted_at:
+                del self._stacks[name]
+
+    def list(self, filters=None, limit=None):
+        self._call()
+        stacks = [stack for stack in self._stacks.values()
+                  if not filters or stack.stack_name == filters["name"]]
+        stacks = stacks[:limit]
+        self.returned += len(stacks)
+        return iter(stacks)
+
+    def get(self, stack_id):
+        self._call()
+        if stack_id not in self._stacks:
+            raise exc.HTTPNotFound()
+        self.returned += 1
+        return self._stacks[stack_id]
+
+    def delete(self, stack_id):
+        self._call()
+        stack = self._stacks[stack_id]
+        stack.stack_status = "DELETE_IN_PROGRESS"
+        stack.deleted_at = time.time() + self._delete_time
+
+
+class FakeHeatClient(object):
+
+    def __init__(self, stacks):
+        self.stacks = stacks
+
+
+class FakeManager(object):
+
+    def cleanup_credentials(self):
+        pass
+
+
+class BenchmarkBackend(heat_backend.BaseHeatBackend):
+    """A Heat back-end with an already created stack."""
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, name, heat_client):
+        self._name = name
+        self._batch = None
+        self._batch_slot = None
+        self._keypair = None
+        self._shared_resources = []
+        self._manager = FakeManager()
+        self._heat_client = heat_client
+
+    def _delete_floating_ip(self):
+        pass
+
+    def get_remote_client(self, **kwargs):
+        raise NotImplementedError()
+
+    def remote_client(self):
+        raise NotImplementedError()
+
+
+def benchmark(unrelated, latency, delete_time):
+    names = ["unrelated-{}".format(index) for index in range(unrelated)]
+    stacks = FakeStacks(names + ["benchmark"], latency, delete_time)
+    backend = BenchmarkBackend("benchmark", FakeHeatClient(stacks))
+
+    start = time.time()
+    backend.cleanup()
+    return time.time() - start, stacks.calls, stacks.returned
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="The latency of the fake API, in seconds.")
+    parser.add_argument("--delete-time", type=float, default=1,
+                        help="The time it takes to delete a stack.")
+    parser.add_argument("--stacks", type=int, nargs="+",
+                        default=[10, 100, 1000],
+                        help="The numbers of unrelated stacks.")
+    args = parser.parse_args()
+
+    print("{:>8} {:>13} {:>9} {:>15}".format(
+        "stacks", "teardown (s)", "requests", "stacks returned"))
+    for unrelated in args.stacks:
+        teardown, calls, returned = benchmark(
+            unrelated, args.latency, args.delete_time)
+        print("{:>8} {:>13.3f} {:>9} {:>15}".format(
+            unrelated, teardown, calls, returned))
+
+
+if __name__ == "__main__":
+    main()